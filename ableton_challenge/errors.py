@@ -7,3 +7,9 @@ class UnprocessableContent(APIException):
     status_code = 422
     default_detail = _('unable to process the contained instructions.')
     default_code = 'unprocessable_content'
+
+
+class ServiceUnavailable(APIException):
+    status_code = 503
+    default_detail = _('service is temporarily unavailable, try again later.')
+    default_code = 'service_unavailable'
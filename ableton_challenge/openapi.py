@@ -0,0 +1,148 @@
+"""
+The OpenAPI schema, generated once rather than on every request (introspecting all the views and serializers
+is slow), either at build time by `generate_openapi_schema` command or lazily on the first request.
+
+It is stored as a gzipped file, named after the fingerprint of the URL configuration, in `OPENAPI_SCHEMA_DIR`,
+so it is generated again only when the URL configuration changes, and served with an ETag, so that the clients
+which already have it get a `304 Not Modified`.
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.urls import get_resolver, URLPattern, URLResolver
+from django.views.decorators.http import condition, require_safe
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.renderers import SwaggerUIRenderer
+
+API_INFO = openapi.Info(
+    title="Ableton challenge API",
+    default_version='',
+    # description="Test description",
+    # terms_of_service="https://www.google.com/policies/terms/",
+    # contact=openapi.Contact(email="contact@snippets.local"),
+    # license=openapi.License(name="BSD License"),
+)
+
+
+@dataclass(frozen=True)
+class SchemaArtifact:
+    fingerprint: str
+    etag: str
+    gzipped: bytes
+
+
+def _walk(patterns, prefix=''):
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from _walk(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            view = getattr(pattern.callback, 'cls', None) or getattr(pattern.callback, 'view_class', pattern.callback)
+            yield f'{route} {pattern.name} {view.__module__}.{view.__qualname__}'
+
+
+def urlconf_fingerprint(urlconf: Optional[str] = None) -> str:
+    """Returns the hash of the routes and their views, which changes whenever the URL configuration changes."""
+    digest = hashlib.sha256()
+    for line in sorted(_walk(get_resolver(urlconf).url_patterns)):
+        digest.update(line.encode())
+        digest.update(b'\n')
+    return digest.hexdigest()[:16]
+
+
+def artifact_path(fingerprint: str, directory: Optional[Path] = None) -> Path:
+    return Path(directory or settings.OPENAPI_SCHEMA_DIR) / f'openapi-{fingerprint}.json.gz'
+
+
+def generate_schema_artifact(directory: Optional[Path] = None) -> SchemaArtifact:
+    """Generates the schema and writes it to the directory, replacing the ones of the other URL configurations."""
+    fingerprint = urlconf_fingerprint()
+    schema = OpenAPISchemaGenerator(API_INFO).get_schema(request=None, public=True)
+    body = OpenAPICodecJson(validators=[]).encode(schema)
+    # mtime=0, so the same schema is always compressed to the same bytes
+    artifact = SchemaArtifact(fingerprint, hashlib.sha256(body).hexdigest()[:32], gzip.compress(body, mtime=0))
+
+    path = artifact_path(fingerprint, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Written to a temporary file first, so the other processes never read it half-written
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as file:
+        file.write(artifact.gzipped)
+    os.chmod(file.name, 0o644)
+    os.replace(file.name, path)
+
+    for stale_path in path.parent.glob('openapi-*.json.gz'):
+        if stale_path != path:
+            stale_path.unlink(missing_ok=True)
+    return artifact
+
+
+def _load_schema_artifact(fingerprint: str) -> Optional[SchemaArtifact]:
+    try:
+        gzipped = artifact_path(fingerprint).read_bytes()
+    except FileNotFoundError:
+        return None
+    return SchemaArtifact(fingerprint, hashlib.sha256(gzip.decompress(gzipped)).hexdigest()[:32], gzipped)
+
+
+_artifact = None
+_artifact_lock = threading.Lock()
+
+
+def get_schema_artifact() -> SchemaArtifact:
+    """Returns the (per process) schema artifact, loaded from `OPENAPI_SCHEMA_DIR`, or generated if it is not there."""
+    global _artifact
+    if _artifact is None:
+        with _artifact_lock:
+            if _artifact is None:
+                fingerprint = urlconf_fingerprint()
+                _artifact = _load_schema_artifact(fingerprint) or generate_schema_artifact()
+    return _artifact
+
+
+@receiver(setting_changed)
+def reset_schema_artifact(setting, **kwargs):
+    global _artifact
+    if setting in ('ROOT_URLCONF', 'OPENAPI_SCHEMA_DIR'):
+        _artifact = None
+
+
+@require_safe
+@condition(etag_func=lambda request: get_schema_artifact().etag)
+def openapi_schema_view(request):
+    artifact = get_schema_artifact()
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(artifact.gzipped, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(artifact.gzipped), content_type='application/json')
+    response['Vary'] = 'Accept-Encoding'
+    # Cached by the clients, but revalidated (by the ETag) on every use
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@require_safe
+def swagger_ui_view(request):
+    """
+    The Swagger UI page, which loads the schema from `openapi_schema_view` (see SWAGGER_SETTINGS["SPEC_URL"]).
+
+    Rendered without the schema, unlike drf-yasg's `with_ui` view, which generates it on every request.
+    """
+    renderer = SwaggerUIRenderer()
+    context = {'request': request}
+    renderer.set_context(context)
+    context['title'] = API_INFO.title
+    return HttpResponse(render_to_string(renderer.template, context, request), content_type=renderer.media_type)
@@ -44,8 +44,13 @@ INSTALLED_APPS = [
     'user_management',
 ]
 
+# The middlewares of user_management are sync and async capable, but WhiteNoiseMiddleware (6.x) is sync only:
+# under ASGI, the async views then make a thread hop through it, and the middlewares above it run in sync mode.
+# When running under ASGI, serve the static files by the reverse proxy (or a CDN) and remove it.
 MIDDLEWARE = [
+    'user_management.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'user_management.middleware.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +58,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'user_management.middleware.QueryBudgetMiddleware',
+    'user_management.middleware.IdempotencyMiddleware',
 ]
 
 ROOT_URLCONF = 'ableton_challenge.urls'
@@ -80,12 +87,50 @@ WSGI_APPLICATION = 'ableton_challenge.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# With several (gunicorn) worker processes writing to the same file:
+# WAL lets the readers and the (single) writer go on at the same time, the transactions take the write lock
+# when they begin (BEGIN IMMEDIATE), and wait up to `timeout` seconds for it, instead of failing with
+# "database is locked". The connections are kept open (and their page cache warm) between the requests.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'ableton_challenge.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                # Durable after a crash of the process, only the last commits may be lost on a power failure
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456;'
+                # In KiB when negative, per connection
+                'PRAGMA cache_size=-65536;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
     }
 }
+# To try the read replica locally, with a second SQLite file (copied from the primary by `sync_sqlite_replicas`):
+# DATABASES['replica'] = {**DATABASES['default'], 'NAME': BASE_DIR / 'db.replica.sqlite3'}
+
+# To try sharding the users locally, over two more SQLite files (see `user_management.sharding`):
+# DATABASES['users_0'] = {**DATABASES['default'], 'NAME': BASE_DIR / 'db.users_0.sqlite3'}
+# DATABASES['users_1'] = {**DATABASES['default'], 'NAME': BASE_DIR / 'db.users_1.sqlite3'}
+USER_SHARDING = {
+    'SHARDS': [alias for alias in DATABASES if alias.startswith('users_')],
+    'ID_BLOCK_SIZE': 100,
+}
+
+# The objects loaded from a shard stay on it, the other reads go to the replicas,
+# except for the clients which have just written (see `user_management.db_router`)
+DATABASE_ROUTERS = ['user_management.sharding.ShardRouter', 'user_management.db_router.PrimaryReplicaRouter']
+REPLICA_ROUTER = {
+    'REPLICAS': [alias for alias in DATABASES if alias != 'default' and alias not in USER_SHARDING['SHARDS']],
+    'STICKINESS_SECONDS': 5,
+    'PIN_CACHE': 'default',
+}
 
 
 # Password validation
@@ -131,6 +176,140 @@ STATIC_ROOT = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Password hashing is CPU-bound, so it runs in a pool of worker processes (one per CPU by default),
+# instead of on the request thread. Once `max_queue_size` hashes are pending, requests fail fast with 503.
+# The metrics of the pool (queue depth, hash durations, rejections) are logged every `metrics_interval` seconds.
+PASSWORD_HASHING_EXECUTOR = {
+    'BACKEND': 'user_management.hashing.ProcessPoolHashingExecutor',
+    'OPTIONS': {
+        'max_workers': None,
+        'max_queue_size': 64,
+        'timeout': 5,
+        'metrics_interval': 60,
+    },
+}
+
+# The first hasher hashes the new passwords, the others only verify the existing hashes, which are upgraded on login.
+# Their parameters are calibrated for the machine by `python manage.py calibrate_hashers` (Django's defaults if unset).
+PASSWORD_HASHERS = [
+    'user_management.hashers.CalibratedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'user_management.hashers.CalibratedArgon2PasswordHasher',
+    'user_management.hashers.CalibratedScryptPasswordHasher',
+]
+PASSWORD_HASHER_PARAMETERS = {}
+
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'user_management.authentication.CachedTokenAuthentication',
+        'user_management.authentication.SignedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '60/min',
+        'login_email': '10/min',
+        'resend_email_confirmation_ip': '30/min',
+        'resend_email_confirmation_email': '3/min',
+    },
+    # The number of the proxies in front of the application (none, gunicorn is exposed by docker-compose), whose
+    # `X-Forwarded-For` addresses are trusted by the IP throttles (and the replica pinning). Unset, DRF would trust
+    # the whole header, sent by the clients, so they could get around the limits by changing it.
+    'NUM_PROXIES': 0,
+}
+
+# Counters of the (sliding window) throttles, use `CacheStore` to share them between multiple workers.
+THROTTLE_STORE = {
+    'BACKEND': 'user_management.throttling.LocalMemoryStore',
+}
+
+# Authenticated tokens are cached per process, (why: to not query the token and user tables on every request).
+# The entries are invalidated on save/delete of the token or the user, but only in the process making the change:
+# the other processes serve their stale entries for up to `TTL` seconds. Set `SHARED_CACHE` to an alias of
+# `CACHES` to share the entries between the processes, and see the invalidations right away in all of them.
+TOKEN_AUTHENTICATION_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 5,
+    'SHARED_CACHE': None,
+}
+
+
+# Responses of the idempotent views, replayed to the retries with the same `Idempotency-Key` header,
+# use `CacheStore` to share them between multiple workers (see `user_management.idempotency`).
+IDEMPOTENCY_STORE = {
+    'BACKEND': 'user_management.idempotency.LocalMemoryStore',
+    'TTL': 24 * 60 * 60,
+    'LOCK_TTL': 60,
+    'WAIT_TIMEOUT': 10,
+}
+
+# Profiles a sample of the requests (and the ones with the `X-Profile-Request: <HEADER_SECRET>` header)
+# to `DIRECTORY`, merge them by `python manage.py profile_report` (see `user_management.profiling`).
+REQUEST_PROFILING = {
+    'SAMPLE_RATE': 0,
+    'HEADER_SECRET': None,
+    'DIRECTORY': BASE_DIR / 'profiles',
+    'MAX_FILES': 500,
+}
+
+# Traces of the services (with their queries, password hashing and email enqueueing), exported by a background thread
+# in batches, to a rotated JSON lines file or an OTLP collector (see `user_management.tracing`).
+TRACING = {
+    'ENABLED': False,
+    'EXPORTER': 'user_management.tracing.JSONLinesExporter',
+    'OPTIONS': {'path': BASE_DIR / 'traces' / 'traces.jsonl', 'max_bytes': 10 * 1024 * 1024, 'backup_count': 5},
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL': 5,
+    'MAX_QUEUE_SIZE': 10000,
+}
+
+# Stateless (HMAC signed) tokens, (why: the login writes no token row, and the requests are authenticated
+# without querying the token table), revoked by bumping `User.token_version` (see `user_management.signed_tokens`).
+SIGNED_TOKENS = {
+    'ENABLED': False,
+    'TTL': 3600,
+    'STATE_CACHE': 'default',
+    'STATE_CACHE_TTL': 60,
+}
+
+
+# Signed confirmation links, (why: confirming by the link needs no lookup of the user and no read of the code,
+# only a conditional UPDATE), sent besides the code when enabled (see `user_management.confirmation_links`).
+CONFIRMATION_LINKS = {
+    'ENABLED': False,
+    'URL': 'http://localhost:8000/confirm-email?token={token}',
+}
+
+
+# Transactional outbox of the domain events, (why: the signup commits the user and its events at once, and its
+# confirmation code and email are done later by `python manage.py process_outbox`, see `user_management.outbox`).
+OUTBOX = {
+    'ENABLED': False,
+}
+
+
+# In-memory Bloom filter of the registered emails, (why: to answer "definitely not registered" without
+# querying the database, for the emails of signup, login and resend-email-confirmation).
+# Run `python manage.py rebuild_email_filter` to write it to `PATH`, so the processes load it at startup.
+# Disabled by default: a user committed later than `PENDING_TIMEOUT` after a user with a higher id is missed
+# (until the filter is rebuilt), and so can not log in (see `user_management.email_filter`).
+EMAIL_EXISTENCE_FILTER = {
+    'ENABLED': False,
+    'CAPACITY': 1_000_000,
+    'ERROR_RATE': 0.01,
+    'REFRESH_INTERVAL': 1,
+    'PATH': None,
+}
+
+
+# The OpenAPI schema is generated once (see `generate_openapi_schema` command) and served from this directory
+OPENAPI_SCHEMA_DIR = BASE_DIR / 'openapi'
+SWAGGER_SETTINGS = {
+    'SPEC_URL': 'openapi-schema',
+}
+
+
 # Use custom user model
 AUTH_USER_MODEL = 'user_management.User'
 
@@ -0,0 +1,46 @@
+"""
+SQLite database backend, with the `init_command` and `transaction_mode` options of Django 5.1, i.e.:
+
+    'OPTIONS': {
+        'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        'transaction_mode': 'IMMEDIATE',
+    }
+
+`init_command` is run on every new connection (the pragmas, except journal_mode, only apply to the connection).
+`transaction_mode` is how the transactions begin: with IMMEDIATE, a transaction takes the write lock when it begins
+(waiting for it up to the `timeout` option), rather than failing right away with "database is locked" when it
+reads first and then tries to write, while another connection is writing.
+
+It can be replaced by Django's own backend, after upgrading to Django 5.1.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'EXCLUSIVE', 'IMMEDIATE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        self.init_commands = conn_params.pop('init_command', '').split(';')
+        self.transaction_mode = conn_params.pop('transaction_mode', None)
+        if self.transaction_mode is not None and self.transaction_mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'settings.DATABASES["{self.alias}"]["OPTIONS"]["transaction_mode"] is improperly configured, '
+                f'use one of {", ".join(TRANSACTION_MODES)} or None.'
+            )
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for init_command in self.init_commands:
+            if init_command := init_command.strip():
+                conn.execute(init_command)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
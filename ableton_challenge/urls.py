@@ -16,27 +16,14 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 
-
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Ableton challenge API",
-      default_version='',
-      # description="Test description",
-      # terms_of_service="https://www.google.com/policies/terms/",
-      # contact=openapi.Contact(email="contact@snippets.local"),
-      # license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=[permissions.AllowAny],
-)
+from ableton_challenge.openapi import openapi_schema_view, swagger_ui_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
+    # The UI loads the schema from `openapi-schema` (see SWAGGER_SETTINGS["SPEC_URL"]), which is pre-generated
+    path('swagger/', swagger_ui_view, name='schema-swagger-ui'),
+    path('swagger.json', openapi_schema_view, name='openapi-schema'),
 
     path('user-management/', include('user_management.urls')),
 ]
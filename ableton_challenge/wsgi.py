@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ableton_challenge.settings')
 
 application = get_wsgi_application()
+
+# Builds the email filter (when enabled) before the first request, instead of on the request thread
+from user_management.email_filter import get_email_filter  # noqa: E402
+
+get_email_filter()
@@ -1,13 +1,23 @@
 from django.contrib import admin
 
+from user_management.admin.pagination import EstimatedCountPaginator
+from user_management.admin.sharding import DefaultDatabaseOnlyAdmin
 from user_management.models.email_confirmation import EmailConfirmation
 
 
 @admin.register(EmailConfirmation)
-class EmailConfirmationAdmin(admin.ModelAdmin):
+class EmailConfirmationAdmin(DefaultDatabaseOnlyAdmin):
     list_display = [
         'user',
         'code',
         'expires_at',
         'confirmed_at',
     ]
+    # Joins the users, instead of a query per row
+    list_select_related = ['user']
+    # A text input instead of a select of all the users
+    raw_id_fields = ['user']
+    # Prefix search, by the (case-insensitive) index of the emails
+    search_fields = ['^user__email']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
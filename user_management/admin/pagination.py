@@ -0,0 +1,61 @@
+"""
+Paginator of the admin changelists, which never counts all the rows of a (big) table.
+
+Django's paginator runs an exact `COUNT(*)` on every changelist page, which scans the whole table (or the whole
+search result). Instead, the rows are counted only up to `exact_count_limit`, beyond that the count is the
+estimate of the database's statistics (PostgreSQL's `pg_class.reltuples`, SQLite's `sqlite_stat1`, which
+is kept by `ANALYZE`), or for the filtered changelists (and without statistics), just `exact_count_limit + 1`.
+"""
+from typing import Optional
+
+from django.core.paginator import Paginator
+from django.db import connections, DatabaseError
+from django.utils.functional import cached_property
+
+
+def estimate_row_count(model, using: str) -> Optional[int]:
+    """Returns the row count of the model's table estimated by the database's statistics, if there are any."""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            elif connection.vendor == 'sqlite':
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+                if cursor.fetchone() is None:
+                    return None
+                # The first number of the stat of each index is the row count of the table
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            elif connection.vendor == 'mysql':
+                cursor.execute(
+                    'SELECT table_rows FROM information_schema.tables '
+                    'WHERE table_schema = DATABASE() AND table_name = %s',
+                    [table],
+                )
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+
+    if row is None or row[0] is None:
+        return None
+    count = int(str(row[0]).split()[0])
+    # PostgreSQL reports -1 for the tables which have never been analyzed
+    return count if count >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        # Counts at most `exact_count_limit + 1` rows, by `SELECT COUNT(*) FROM (SELECT ... LIMIT n)`
+        count = queryset.order_by()[:self.exact_count_limit + 1].count()
+        if count <= self.exact_count_limit or queryset.query.where:
+            return count
+
+        estimate = estimate_row_count(queryset.model, queryset.db)
+        return max(estimate or 0, count)
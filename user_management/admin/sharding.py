@@ -0,0 +1,16 @@
+from django.contrib import admin, messages
+from django.utils.translation import gettext_lazy as _
+
+from user_management.sharding import is_sharded
+
+
+class DefaultDatabaseOnlyAdmin(admin.ModelAdmin):
+    """The changelist of a sharded model, which warns that only the rows of the default database are listed."""
+
+    def changelist_view(self, request, extra_context=None):
+        if is_sharded():
+            messages.warning(request, _(
+                'The users are sharded, only the ones of the default database are listed here. '
+                'Use the export_users command to see all of them.'
+            ))
+        return super().changelist_view(request, extra_context)
@@ -2,11 +2,13 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 from django.utils.translation import gettext_lazy as _
 
+from user_management.admin.pagination import EstimatedCountPaginator
+from user_management.admin.sharding import DefaultDatabaseOnlyAdmin
 from user_management.models.user import User
 
 
 @admin.register(User)
-class UserAdmin(DjangoUserAdmin):
+class UserAdmin(DefaultDatabaseOnlyAdmin, DjangoUserAdmin):
 
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
@@ -22,5 +24,10 @@ class UserAdmin(DjangoUserAdmin):
         }),
     )
     list_display = ('email', 'first_name', 'last_name', 'is_staff')
-    search_fields = ('email', 'first_name', 'last_name')
+    # Prefix search of the emails only, by their (case-insensitive) index, instead of scanning all the users.
+    # Unlike Django's UserAdmin, the first and last names are not searched: their OR with the email would scan
+    # the whole table, on every search
+    search_fields = ('^email',)
     ordering = ('email',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,274 @@
+"""
+DRF authentication classes.
+
+`CachedTokenAuthentication` is a drop-in replacement of `rest_framework.authentication.TokenAuthentication`,
+which caches the authenticated (user, token) pairs, configured by the `TOKEN_AUTHENTICATION_CACHE` setting, i.e.:
+
+    TOKEN_AUTHENTICATION_CACHE = {
+        'MAX_SIZE': 10000,  # Entries of the per process cache
+        'TTL': 60,  # Seconds, 5 by default without a shared cache, 60 with one
+        'SHARED_CACHE': 'default',  # Optional, alias of a Django cache, shared between the processes
+    }
+
+The cached entries are invalidated by the `post_save`/`post_delete` signals of `Token` and `User` models
+(see `user_management.signals`), which run in the process making the change only:
+- With a `SHARED_CACHE`, the invalidation also replaces the generation of the user in the shared cache, and the
+  entries of every process are checked against it on each hit (one shared cache lookup, no query), so the changes
+  are seen by all the processes right away.
+- Without one, the other processes keep serving their entries until they expire: a deactivated user or a deleted
+  token is still authenticated by them for up to `TTL` seconds, hence its short default.
+
+`SignedTokenAuthentication` verifies the stateless tokens of `user_management.signed_tokens` without a query.
+"""
+import copy
+import threading
+import uuid
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from user_management.cache import LRUCache
+from user_management.models.user import User
+from user_management import signed_tokens
+from user_management.sharding import get_shards
+
+
+DEFAULT_TTL = 60
+DEFAULT_LOCAL_TTL = 5  # Without a shared cache, the changes are seen by the other processes after it
+
+
+class TokenCache:
+    """
+    Two-tier cache of the authenticated (user, token) pairs, keyed by the token key.
+
+    The first tier is a per process LRU cache, the optional second tier is a Django cache shared between processes.
+    With the second tier, each entry carries the generation of its user, and is only served while the generation
+    in the shared cache is the same (it is replaced on every invalidation of the user).
+    """
+
+    key_prefix = 'token-auth'
+
+    def __init__(self, max_size: int = 10000, ttl: float = DEFAULT_TTL, shared_cache: Optional[str] = None):
+        self.ttl = ttl
+        self.local = LRUCache(max_size=max_size, ttl=ttl)
+        self.shared = caches[shared_cache] if shared_cache else None
+        # Token key of each user (a user has at most one token), to invalidate the entries by user
+        self._user_keys = LRUCache(max_size=max_size, ttl=ttl)
+        self._lock = threading.Lock()
+        self._shared_hits = 0
+        self._stale_hits = 0
+
+    def get(self, key: str) -> Optional[tuple]:
+        entry = self.local.get(key)
+        if entry is not None and not self._is_current(entry):
+            self.local.delete(key)
+            entry = None
+
+        if entry is None and self.shared is not None:
+            entry = self.shared.get(self._cache_key('key', key))
+            if entry is not None and self._is_current(entry):
+                with self._lock:
+                    self._shared_hits += 1
+                self._set_local(key, entry)
+            else:
+                entry = None
+
+        if entry is None:
+            return None
+
+        # Each request gets its own copy, so that the cached instances are never modified
+        user, token, _generation = entry
+        return copy.copy(user), copy.copy(token)
+
+    def set(self, user, token):
+        generation = self._generation(user.pk) if self.shared is not None else None
+        entry = (user, token, generation)
+        self._set_local(token.key, entry)
+        if self.shared is not None:
+            self.shared.set_many({
+                self._cache_key('key', token.key): entry,
+                self._cache_key('user', user.pk): token.key,
+            }, timeout=self.ttl)
+
+    def invalidate_token(self, key: str, user_id: Optional[int] = None):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(self._cache_key('key', key))
+            if user_id is not None:
+                self._new_generation(user_id)
+
+    def invalidate_user(self, user_id: int):
+        key = self._user_keys.get(user_id)
+        if key is not None:
+            self.local.delete(key)
+
+        if self.shared is not None:
+            self._new_generation(user_id)
+            shared_key = self.shared.get(self._cache_key('user', user_id))
+            if shared_key is not None:
+                self.shared.delete_many([self._cache_key('key', shared_key), self._cache_key('user', user_id)])
+
+    def clear(self):
+        self.local.clear()
+        self._user_keys.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.local.stats(), 'shared_hits': self._shared_hits, 'stale_hits': self._stale_hits}
+
+    def _is_current(self, entry: tuple) -> bool:
+        """Whether the entry was cached at the current generation of its user (always, without a shared cache)."""
+        if self.shared is None:
+            return True
+        user, _token, generation = entry
+        if self.shared.get(self._cache_key('generation', user.pk)) == generation:
+            return True
+        with self._lock:
+            self._stale_hits += 1
+        return False
+
+    def _generation(self, user_id: int) -> str:
+        generation_key = self._cache_key('generation', user_id)
+        # Random rather than a counter, so that a generation evicted from the shared cache is never reused
+        self.shared.add(generation_key, uuid.uuid4().hex, timeout=None)
+        return self.shared.get(generation_key)
+
+    def _new_generation(self, user_id: int):
+        self.shared.set(self._cache_key('generation', user_id), uuid.uuid4().hex, timeout=None)
+
+    def _set_local(self, key: str, entry: tuple):
+        user, _token, _generation = entry
+        self.local.set(key, entry)
+        self._user_keys.set(user.pk, key)
+
+    def _cache_key(self, kind: str, value) -> str:
+        return f'{self.key_prefix}:{kind}:{value}'
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache() -> TokenCache:
+    """Returns the (per process) token cache, configured by `TOKEN_AUTHENTICATION_CACHE` setting."""
+    global _token_cache
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                config = getattr(settings, 'TOKEN_AUTHENTICATION_CACHE', {})
+                shared_cache = config.get('SHARED_CACHE')
+                _token_cache = TokenCache(
+                    max_size=config.get('MAX_SIZE', 10000),
+                    ttl=config.get('TTL', DEFAULT_TTL if shared_cache else DEFAULT_LOCAL_TTL),
+                    shared_cache=shared_cache,
+                )
+    return _token_cache
+
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    global _token_cache
+    if setting in ('TOKEN_AUTHENTICATION_CACHE', 'CACHES'):
+        _token_cache = None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Same as `TokenAuthentication`, but the valid tokens (of active users) are cached,
+    so that authenticating a request makes no query in the common case.
+    """
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        entry = token_cache.get(key)
+        if entry is not None:
+            return entry
+
+        # Raises for invalid tokens or inactive users, which are never cached
+        shards = get_shards()
+        if shards:
+            user, token = self._authenticate_credentials_on_shards(key, shards)
+        else:
+            user, token = super().authenticate_credentials(key)
+        token_cache.set(user, token)
+        return user, token
+
+    def _authenticate_credentials_on_shards(self, key, shards):
+        """Same as the parent method, but looks for the token on every shard, since the key tells nothing of it."""
+        model = self.get_model()
+        for shard in shards:
+            token = model.objects.using(shard).select_related('user').filter(key=key).first()
+            if token is not None:
+                break
+        else:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return token.user, token
+
+
+class SignedTokenUser:
+    """
+    The user of a signed token, which knows only its id (and that it is active) without a query.
+    Any other attribute loads the user from the database, once.
+    """
+
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id: int):
+        self.id = self.pk = user_id
+
+    @cached_property
+    def user(self):
+        for db in get_shards() or [None]:
+            user = User.objects.using(db).filter(pk=self.id).first()
+            if user is not None:
+                return user
+        raise User.DoesNotExist
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            # i.e. the lookups of `copy` and `pickle`
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __eq__(self, other):
+        return getattr(other, 'pk', None) == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return str(self.user)
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    """
+    Authenticates the `Authorization: Bearer <token>` requests with the signed tokens.
+    Checks the signature and the expiry without a query, and the revocation by the cached state of the user.
+    """
+
+    keyword = 'Bearer'
+
+    def authenticate_credentials(self, key):
+        token = signed_tokens.parse_token(key)
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        state = signed_tokens.get_user_state(token.user_id)
+        if state is None or state[0] != token.version:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not state[1]:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return SignedTokenUser(token.user_id), token
@@ -0,0 +1,164 @@
+"""
+Compares the conditional UPDATE of `confirm_email` with the previous implementation, which locked the
+EmailConfirmation row (SELECT ... FOR UPDATE) before saving it, and with `confirm_email_link` (the signed links,
+which do not look the user up), under concurrent confirmations of the same users.
+
+Every user is confirmed by `--contenders` threads at once, only one of which may win. It reports the throughput,
+the errors and the lock hold time: from the first locking statement (SELECT ... FOR UPDATE, or the first write
+on backends without row locks, like SQLite) to the commit. On SQLite with deferred transactions, the locking
+implementation fails with "database is locked" whenever its read transaction can not be upgraded to a write one
+(see `transaction_mode` option of `ableton_challenge.sqlite3` backend).
+
+The test database is a file (rather than in memory), so that each thread has its own connection to it.
+
+Usage:
+    python -m user_management.benchmarks.confirm_email --users 500 --contenders 4
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ableton_challenge.settings')
+django.setup()
+
+from django.db import connection, transaction, OperationalError  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from django.utils.translation import gettext_lazy as _  # noqa: E402
+from result import Ok, Err  # noqa: E402
+
+from ableton_challenge.errors import UnprocessableContent  # noqa: E402
+from user_management.benchmarks.services import seed_users, _email, CODE  # noqa: E402
+from user_management.benchmarks.utils import benchmark_database, percentile  # noqa: E402
+from user_management.models.email_confirmation import EmailConfirmation  # noqa: E402
+from user_management.models.user import User  # noqa: E402
+from user_management.confirmation_links import make_token  # noqa: E402
+from user_management.services.user import confirm_email, confirm_email_link  # noqa: E402
+
+
+def confirm_email_with_lock(email: str, code: str):
+    """The previous implementation of `confirm_email`, kept here for the comparison."""
+    with transaction.atomic():
+        try:
+            user = User.objects.select_related().get(email=email)
+        except User.DoesNotExist:
+            return Err(UnprocessableContent(detail=_('Could not confirm email')))
+        try:
+            email_confirmation = EmailConfirmation.objects.select_for_update().get(user__email=email, code=code)
+        except EmailConfirmation.DoesNotExist:
+            return Err(UnprocessableContent(detail=_('Could not confirm email')))
+        if email_confirmation.confirmed_at:
+            return Err(UnprocessableContent(detail=_('Email already confirmed')))
+
+        email_confirmation.confirmed_at = timezone.now()
+        email_confirmation.save(update_fields=('confirmed_at',))
+        user.is_active = True
+        user.save(update_fields=('is_active',))
+        return Ok(user)
+
+
+def confirm_email_by_link(tokens: dict[str, str]):
+    """Adapts `confirm_email_link` to the (email, code) arguments of the other implementations."""
+
+    def confirm(email: str, code: str):
+        return confirm_email_link(tokens[email])
+
+    return confirm
+
+
+class LockHoldRecorder:
+    """Query wrapper recording the lock hold time of the transactions of each thread."""
+
+    def __init__(self):
+        self.durations = []
+        self._local = threading.local()
+
+    def __call__(self, execute, sql, params, many, context):
+        db_connection = context['connection']
+        if (
+            db_connection.in_atomic_block
+            and getattr(self._local, 'locked_at', None) is None
+            and (sql.startswith('UPDATE') or 'FOR UPDATE' in sql)
+        ):
+            self._local.locked_at = time.perf_counter()
+            transaction.on_commit(self._released, using=db_connection.alias)
+        return execute(sql, params, many, context)
+
+    def _released(self):
+        self.durations.append(time.perf_counter() - self._local.locked_at)
+        self._local.locked_at = None
+
+
+def run(service, emails: list[str], contenders: int) -> dict:
+    recorder = LockHoldRecorder()
+    errors = []
+
+    def confirm(email):
+        with connection.execute_wrapper(recorder):
+            try:
+                return service(email, CODE).is_ok()
+            except OperationalError:
+                # i.e. "database is locked" of SQLite, when a read transaction can not be upgraded to a write one
+                errors.append(email)
+                return False
+
+    def close_connection(_):
+        connection.close()
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=contenders) as executor:
+        confirmed = sum(executor.map(confirm, [email for email in emails for _ in range(contenders)]))
+        executor.map(close_connection, range(contenders))
+    seconds = time.perf_counter() - started_at
+
+    durations = sorted(recorder.durations)
+    return {
+        'confirmed': confirmed,
+        'errors': len(errors),
+        'attempts_per_second': len(emails) * contenders / seconds,
+        'lock_p50_ms': percentile(durations, 50) * 1000,
+        'lock_p99_ms': percentile(durations, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--contenders', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        with benchmark_database():
+            # The odd ones are inactive (not confirmed yet), a third of them for each implementation
+            seed_users(0, args.users * 6)
+            emails = [_email(index) for index in range(1, args.users * 6, 2)]
+            link_emails = emails[args.users * 2:]
+            expires_at = timezone.now() + timezone.timedelta(hours=1)
+            tokens = {
+                email: make_token(user_id, CODE, expires_at)
+                for email, user_id in User.objects.filter(email__in=link_emails).values_list('email', 'id')
+            }
+            results = {
+                'SELECT FOR UPDATE': run(confirm_email_with_lock, emails[:args.users], args.contenders),
+                'conditional UPDATE': run(confirm_email, emails[args.users:args.users * 2], args.contenders),
+                'signed link': run(confirm_email_by_link(tokens), link_emails, args.contenders),
+            }
+
+    print(
+        f'{"implementation":<20}{"confirmed":>10}{"errors":>8}{"attempts/s":>12}'
+        f'{"lock p50 ms":>13}{"lock p99 ms":>13}'
+    )
+    for name, result in results.items():
+        print(
+            f'{name:<20}{result["confirmed"]:>10}{result["errors"]:>8}{result["attempts_per_second"]:>12.1f}'
+            f'{result["lock_p50_ms"]:>13.2f}{result["lock_p99_ms"]:>13.2f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Measures the peak memory (by `tracemalloc`) and the rate of exporting the users, in both formats, for growing
+tables, against a naive export which loads the queryset into memory. The peak of the streaming export should stay
+flat when the table grows.
+
+Usage:
+    python -m user_management.benchmarks.export --sizes 10000 100000
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ableton_challenge.settings')
+django.setup()
+
+from django.contrib.auth.hashers import make_password  # noqa: E402
+
+from user_management.benchmarks.utils import benchmark_database  # noqa: E402
+from user_management.models.user import User  # noqa: E402
+from user_management.user_export import encode, iter_rows  # noqa: E402
+
+
+def naive_export() -> int:
+    users = list(User.objects.select_related('emailconfirmation').order_by('id'))
+    return sum(len(f'{user.id},{user.email},{user.date_joined.isoformat()}\n') for user in users)
+
+
+def streaming_export(file_format: str) -> int:
+    return sum(len(chunk) for chunk in encode(iter_rows(), file_format))
+
+
+def measure(export) -> tuple[float, float]:
+    """Returns the peak memory in MiB, and the seconds of the export."""
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    export()
+    seconds = time.perf_counter() - started_at
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+
+    exports = {
+        'naive': naive_export,
+        'csv': lambda: streaming_export('csv'),
+        'jsonl.gz': lambda: streaming_export('jsonl.gz'),
+    }
+    password = make_password('benchmark-password')
+    print(f'{"users":>8}{"export":>10}{"peak MiB":>10}{"rows/s":>10}')
+    with benchmark_database():
+        count = 0
+        for size in sorted(args.sizes):
+            User.objects.bulk_create(
+                [User(email=f'user{index}@test.com', password=password) for index in range(count, size)],
+                batch_size=1000,
+            )
+            count = size
+            for name, export in exports.items():
+                peak, seconds = measure(export)
+                print(f'{size:>8}{name:>10}{peak:>10.1f}{size / seconds:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
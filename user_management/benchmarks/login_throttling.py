@@ -0,0 +1,64 @@
+"""
+Measures the CPU spent on attack-shaped login traffic (many wrong passwords for the same email),
+with and without the sliding window throttles of the login view.
+
+The passwords are hashed inline (not by the process pool), so that all the hashing CPU time is counted.
+
+Usage:
+    python -m user_management.benchmarks.login_throttling --requests 200
+"""
+import argparse
+import os
+import time
+from unittest import mock
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ableton_challenge.settings')
+django.setup()
+
+from django.test import Client, override_settings  # noqa: E402
+
+from user_management.benchmarks.utils import benchmark_database  # noqa: E402
+from user_management.tests.factories.user import UserFactory  # noqa: E402
+from user_management.throttling import reset_throttle_store  # noqa: E402
+from user_management.views.v1 import LoginView  # noqa: E402
+
+
+def run_attack(email: str, requests: int) -> tuple[float, float, int]:
+    """Returns the CPU seconds, wall seconds and the number of rejected (429) requests."""
+    reset_throttle_store(setting='THROTTLE_STORE')
+    client = Client()
+    rejected = 0
+    cpu_started_at, started_at = time.process_time(), time.perf_counter()
+    for i in range(requests):
+        response = client.post(
+            '/user-management/v1/users/login/',
+            {'email': email, 'password': f'guess-{i}'},
+            content_type='application/json',
+            REMOTE_ADDR=f'10.0.0.{i % 4}',
+        )
+        rejected += response.status_code == 429
+    return time.process_time() - cpu_started_at, time.perf_counter() - started_at, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        with override_settings(PASSWORD_HASHING_EXECUTOR={'BACKEND': 'user_management.hashing.InlineHashingExecutor'}):
+            user = UserFactory(is_active=True)
+            with mock.patch.object(LoginView, 'throttle_classes', []):
+                unthrottled = run_attack(user.email, args.requests)
+            throttled = run_attack(user.email, args.requests)
+
+    print(f'{"throttles":<10}{"cpu seconds":>14}{"wall seconds":>14}{"rejected":>10}')
+    for name, (cpu_seconds, wall_seconds, rejected) in (('off', unthrottled), ('on', throttled)):
+        print(f'{name:<10}{cpu_seconds:>14.2f}{wall_seconds:>14.2f}{rejected:>10}')
+    print(f'CPU saved: {1 - throttled[0] / unthrottled[0]:.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Microbenchmarks of the services, at several sizes of the `User` table.
+
+For each size, the tables are seeded with bulk inserts (all the users share one precomputed password hash),
+then each service is called `iterations` times with distinct users, recording its latency percentiles and
+the number of queries it makes. See `benchmark_services` command, which compares the results with a stored baseline.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core import mail
+from django.db import connection, reset_queries
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from user_management.benchmarks.utils import percentile
+from user_management.email_filter import get_email_filter, reset_email_filter
+from user_management.models.email_confirmation import EmailConfirmation
+from user_management.models.user import User
+from user_management.services.email_confirmation import send_email_confirmation_email
+from user_management.services.user import signup, login, confirm_email, resend_email_confirmation
+
+PASSWORD = 'benchmark-password'
+CODE = '12345'
+SEED_BATCH_SIZE = 10000
+SERVICES = ('signup', 'login', 'confirm_email', 'resend_email_confirmation', 'send_email_confirmation_email')
+
+
+def _email(index: int) -> str:
+    return f'user.{index}@benchmark.test'
+
+
+def seed_users(start: int, stop: int):
+    """
+    Inserts the users [start, stop) with their EmailConfirmation objects.
+
+    The even ones are active (confirmed their email), the odd ones are not.
+    """
+    password = make_password(PASSWORD)
+    now = timezone.now()
+    expires_at = now + timezone.timedelta(days=365)
+    for batch_start in range(start, stop, SEED_BATCH_SIZE):
+        indexes = range(batch_start, min(batch_start + SEED_BATCH_SIZE, stop))
+        users = User.objects.bulk_create([
+            User(email=_email(index), password=password, is_active=index % 2 == 0)
+            for index in indexes
+        ])
+        EmailConfirmation.objects.bulk_create([
+            EmailConfirmation(user=user, code=CODE, expires_at=expires_at, confirmed_at=now if user.is_active else None)
+            for user in users
+        ])
+
+
+def _measure(calls) -> dict:
+    durations = []
+    queries = 0
+    for call in calls:
+        # Otherwise the log of the queries gets full (after the seeding), and the captured ones are lost
+        reset_queries()
+        with CaptureQueriesContext(connection) as context:
+            started_at = time.perf_counter()
+            call()
+            durations.append(time.perf_counter() - started_at)
+        queries = max(queries, len(context.captured_queries))
+
+    durations.sort()
+    return {
+        'p50_ms': percentile(durations, 50) * 1000,
+        'p95_ms': percentile(durations, 95) * 1000,
+        'p99_ms': percentile(durations, 99) * 1000,
+        'queries': queries,
+    }
+
+
+def benchmark_size(size: int, iterations: int) -> dict:
+    """Runs all the services against the (already seeded) table of `size` users."""
+    # The odd (inactive) users are split between the services which modify them
+    inactive = random.sample(range(1, size, 2), 3 * iterations)
+    active = random.sample(range(0, size, 2), iterations)
+    to_confirm, to_resend, to_send = inactive[:iterations], inactive[iterations:2 * iterations], inactive[2 * iterations:]
+    user_ids = dict(User.objects.filter(email__in=[_email(index) for index in to_send]).values_list('email', 'id'))
+
+    calls = {
+        'signup': [lambda i=i: signup(f'new.{size}.{i}@benchmark.test', PASSWORD) for i in range(iterations)],
+        'login': [lambda index=index: login(_email(index), PASSWORD) for index in active],
+        'confirm_email': [lambda index=index: confirm_email(_email(index), CODE) for index in to_confirm],
+        'resend_email_confirmation': [
+            lambda index=index: resend_email_confirmation(_email(index)) for index in to_resend
+        ],
+        'send_email_confirmation_email': [
+            lambda index=index: send_email_confirmation_email(_email(index), user_ids[_email(index)])
+            for index in to_send
+        ],
+    }
+    results = {}
+    for service in SERVICES:
+        results[service] = _measure(calls[service])
+        mail.outbox = []
+    return results
+
+
+def run_suite(sizes: list[int], iterations: int, stdout=None) -> dict:
+    """
+    Returns the results of all the services at all the sizes, i.e.:
+
+        {'1000': {'login': {'p50_ms': 1.2, 'p95_ms': 1.5, 'p99_ms': 2.0, 'queries': 3}, ...}, ...}
+    """
+    results = {}
+    seeded = 0
+    # Hash inline, to measure the services themselves rather than the process pool, and do not refresh the email
+    # filter in the middle of the measurements, to keep the query counts stable
+    with override_settings(
+        PASSWORD_HASHING_EXECUTOR={'BACKEND': 'user_management.hashing.InlineHashingExecutor'},
+        EMAIL_EXISTENCE_FILTER={**getattr(settings, 'EMAIL_EXISTENCE_FILTER', {}), 'REFRESH_INTERVAL': 3600},
+    ):
+        for size in sorted(sizes):
+            if stdout:
+                stdout.write(f'Seeding {size} users...')
+            seed_users(seeded, size)
+            seeded = size
+
+            # Rebuilt outside the measurements, since the seeded users are not added by the signals
+            reset_email_filter(setting='EMAIL_EXISTENCE_FILTER')
+            if get_email_filter() is not None:
+                get_email_filter().might_exist('')
+
+            if stdout:
+                stdout.write(f'Benchmarking {size} users...')
+            results[str(size)] = benchmark_size(size, iterations)
+    return results
+
+
+def find_regressions(baseline: dict, results: dict, threshold: float) -> list[str]:
+    """
+    Returns the metrics which regressed compared to the baseline.
+
+    A latency regresses when it is more than `threshold` (i.e. 0.2 for 20%) slower, a query count regresses
+    when it grows at all.
+    """
+    regressions = []
+    for size, services in results.items():
+        for service, metrics in services.items():
+            baseline_metrics = baseline.get(size, {}).get(service)
+            if baseline_metrics is None:
+                continue
+
+            for metric, value in metrics.items():
+                baseline_value = baseline_metrics.get(metric)
+                if baseline_value is None:
+                    continue
+
+                limit = baseline_value if metric == 'queries' else baseline_value * (1 + threshold)
+                if value > limit:
+                    regressions.append(
+                        f'{service} at {size} users: {metric} {value:.2f} > {baseline_value:.2f} (baseline)'
+                    )
+    return regressions
@@ -0,0 +1,121 @@
+"""
+Multi-process signup throughput with the users in a single SQLite file, and sharded over 2 and 4 files
+(see `user_management.sharding`). SQLite has a single writer per file, so the writes of the processes
+are serialized by the file lock, and each shard adds a writer.
+
+Each of `--processes` processes (like the gunicorn workers) signs up `--users` users, which writes the users,
+their email confirmations and, every `ID_BLOCK_SIZE` users, the id block on the default database.
+It reports the signups per second and how evenly the users are spread over the shards.
+
+The passwords are hashed inline, with few iterations, so that the database is the bottleneck.
+
+Usage:
+    python -m user_management.benchmarks.sharding --processes 8 --users 200
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ableton_challenge.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connections  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from user_management.benchmarks.utils import use_database  # noqa: E402
+from user_management.models.user import User  # noqa: E402
+from user_management.services.user import signup  # noqa: E402
+
+PASSWORD = 'stress-password'
+SHARD_COUNTS = (1, 2, 4)
+
+
+def _shard_aliases(count: int) -> list[str]:
+    return [f'users_{index}' for index in range(count)]
+
+
+def _use_databases(directory: str, shard_count: int):
+    database = {key: settings.DATABASES['default'][key] for key in ('ENGINE', 'OPTIONS')}
+    use_database({**database, 'NAME': os.path.join(directory, 'default.sqlite3')})
+    for alias in _shard_aliases(shard_count):
+        use_database({**database, 'NAME': os.path.join(directory, f'{alias}.sqlite3')}, alias)
+
+
+def _settings(shard_count: int) -> override_settings:
+    return override_settings(
+        USER_SHARDING={'SHARDS': _shard_aliases(shard_count), 'ID_BLOCK_SIZE': 100},
+        PASSWORD_HASHING_EXECUTOR={'BACKEND': 'user_management.hashing.InlineHashingExecutor'},
+        PASSWORD_HASHER_PARAMETERS={'pbkdf2_sha256': {'iterations': 1000}},
+        EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    )
+
+
+def _worker(directory: str, shard_count: int, worker: int, users: int, started: multiprocessing.Event) -> int:
+    _use_databases(directory, shard_count)
+    started.wait()
+    with _settings(shard_count):
+        for index in range(users):
+            signup(f'user.{worker}.{index}@stress.test', PASSWORD).unwrap()
+    connections.close_all()
+    return users
+
+
+def run(directory: str, shard_count: int, processes: int, users: int) -> dict:
+    started = multiprocessing.Manager().Event()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap_async(
+            _worker, [(directory, shard_count, worker, users, started) for worker in range(processes)],
+        )
+        started_at = time.perf_counter()
+        started.set()
+        signups = sum(results.get())
+        seconds = time.perf_counter() - started_at
+
+    _use_databases(directory, shard_count)
+    users_per_shard = [User.objects.using(alias).count() for alias in _shard_aliases(shard_count)]
+    connections.close_all()
+    return {
+        'signups_per_second': signups / seconds,
+        # The share of the users on the fullest shard, 1 / shard_count when perfectly even
+        'max_shard_share': max(users_per_shard) / signups,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--users', type=int, default=200, help='Per process')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        template = os.path.join(directory, 'template.sqlite3')
+        use_database({'NAME': template})
+        call_command('migrate', verbosity=0)
+        connections.close_all()
+
+        for shard_count in SHARD_COUNTS:
+            run_directory = os.path.join(directory, str(shard_count))
+            os.mkdir(run_directory)
+            for name in ['default', *_shard_aliases(shard_count)]:
+                shutil.copy(template, os.path.join(run_directory, f'{name}.sqlite3'))
+            results[shard_count] = run(run_directory, shard_count, args.processes, args.users)
+
+    print(f'{"shards":<8}{"signups/s":>11}{"speedup":>10}{"max shard share":>17}')
+    for shard_count, result in results.items():
+        speedup = result['signups_per_second'] / results[SHARD_COUNTS[0]]['signups_per_second']
+        print(
+            f'{shard_count:<8}{result["signups_per_second"]:>11.1f}{speedup:>9.2f}x'
+            f'{result["max_shard_share"]:>17.1%}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Multi-process write stress test of SQLite, with the bare settings (Django's default backend and options)
+and with the production profile of `settings.DATABASES` (WAL, BEGIN IMMEDIATE, busy timeout, tuned pragmas).
+
+Each of `--processes` processes (like the gunicorn workers) signs up and then confirms `--users` users,
+which writes the users, their email confirmations and the queued emails. It reports the write throughput
+and the rate of the "database is locked" errors.
+
+The passwords are hashed inline, with few iterations, so that the database is the bottleneck.
+
+Usage:
+    python -m user_management.benchmarks.sqlite_profile --processes 8 --users 200
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ableton_challenge.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connections, OperationalError  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from user_management.benchmarks.utils import use_database  # noqa: E402
+from user_management.models.email_confirmation import EmailConfirmation  # noqa: E402
+from user_management.services.user import signup, confirm_email  # noqa: E402
+
+PASSWORD = 'stress-password'
+
+
+def _worker(database: dict, worker: int, users: int, started: multiprocessing.Event) -> tuple[int, int]:
+    """Returns the number of the succeeded and the failed (by a lock error) operations."""
+    use_database(database)
+    succeeded = failed = 0
+    started.wait()
+    with override_settings(
+        PASSWORD_HASHING_EXECUTOR={'BACKEND': 'user_management.hashing.InlineHashingExecutor'},
+        PASSWORD_HASHER_PARAMETERS={'pbkdf2_sha256': {'iterations': 1000}},
+    ):
+        for index in range(users):
+            email = f'user.{worker}.{index}@stress.test'
+            try:
+                signup(email, PASSWORD).unwrap()
+                code = EmailConfirmation.objects.values_list('code', flat=True).get(user__email=email)
+                confirm_email(email, code).unwrap()
+                succeeded += 2
+            except OperationalError:
+                failed += 1
+    connections.close_all()
+    return succeeded, failed
+
+
+def run(database: dict, processes: int, users: int) -> dict:
+    started = multiprocessing.Manager().Event()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap_async(_worker, [(database, worker, users, started) for worker in range(processes)])
+        started_at = time.perf_counter()
+        started.set()
+        results = results.get()
+        seconds = time.perf_counter() - started_at
+
+    succeeded = sum(result[0] for result in results)
+    failed = sum(result[1] for result in results)
+    return {
+        'writes_per_second': succeeded / seconds,
+        'lock_errors': failed,
+        'lock_error_rate': failed / (succeeded + failed) if succeeded + failed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--users', type=int, default=200, help='Per process')
+    args = parser.parse_args()
+
+    profiles = {
+        'bare': {},
+        'production': {
+            key: settings.DATABASES['default'][key] for key in ('ENGINE', 'OPTIONS', 'CONN_MAX_AGE')
+        },
+    }
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        template = os.path.join(directory, 'template.sqlite3')
+        use_database({'NAME': template})
+        call_command('migrate', verbosity=0)
+        connections.close_all()
+
+        for name, database in profiles.items():
+            path = os.path.join(directory, f'{name}.sqlite3')
+            shutil.copy(template, path)
+            results[name] = run({**database, 'NAME': path}, args.processes, args.users)
+
+    print(f'{"profile":<12}{"writes/s":>10}{"lock errors":>13}{"error rate":>12}')
+    for name, result in results.items():
+        print(
+            f'{name:<12}{result["writes_per_second"]:>10.1f}{result["lock_errors"]:>13}'
+            f'{result["lock_error_rate"]:>12.1%}'
+        )
+
+
+if __name__ == '__main__':
+    main()
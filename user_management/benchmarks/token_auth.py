@@ -0,0 +1,79 @@
+"""
+Compares the authentication cost per request of the `authtoken` tokens (DRF's `TokenAuthentication`, and
+`CachedTokenAuthentication`) and of the signed tokens (`SignedTokenAuthentication`), each authenticating
+`--requests` requests of `--users` users, round robin.
+
+Usage:
+    python -m user_management.benchmarks.token_auth --requests 20000 --users 100
+"""
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ableton_challenge.settings')
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.authentication import TokenAuthentication  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from user_management import signed_tokens  # noqa: E402
+from user_management.authentication import CachedTokenAuthentication, SignedTokenAuthentication  # noqa: E402
+from user_management.authentication import get_token_cache  # noqa: E402
+from user_management.benchmarks.utils import benchmark_database  # noqa: E402
+from user_management.tests.factories.user import UserFactory  # noqa: E402
+
+
+def run(authentication, requests: list) -> dict:
+    with CaptureQueriesContext(connection) as queries:
+        started_at = time.perf_counter()
+        for request in requests:
+            authentication.authenticate(request)
+        seconds = time.perf_counter() - started_at
+    return {
+        'us_per_request': seconds / len(requests) * 1_000_000,
+        'queries_per_request': len(queries) / len(requests),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=100)
+    args = parser.parse_args()
+
+    factory = APIRequestFactory()
+    results = {}
+    with benchmark_database(), override_settings(SIGNED_TOKENS={'ENABLED': True, 'STATE_CACHE': 'default'}):
+        users = [UserFactory(is_active=True) for _ in range(args.users)]
+
+        token_keys = [Token.objects.create(user=user).key for user in users]
+        token_requests = [
+            factory.get('/', HTTP_AUTHORIZATION=f'Token {token_keys[index % len(users)]}')
+            for index in range(args.requests)
+        ]
+        results['authtoken'] = run(TokenAuthentication(), token_requests)
+        get_token_cache().clear()
+        results['authtoken (cached)'] = run(CachedTokenAuthentication(), token_requests)
+
+        signed_keys = [signed_tokens.issue_token(user).key for user in users]
+        signed_requests = [
+            factory.get('/', HTTP_AUTHORIZATION=f'Bearer {signed_keys[index % len(users)]}')
+            for index in range(args.requests)
+        ]
+        cache.clear()
+        results['signed'] = run(SignedTokenAuthentication(), signed_requests)
+
+    print(f'{"tokens":<20}{"us/request":>12}{"queries/request":>17}')
+    for name, result in results.items():
+        print(f'{name:<20}{result["us_per_request"]:>12.1f}{result["queries_per_request"]:>17.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Measures the overhead of the tracing spans: of a `traced` no-op function against the plain one, and of the
+`login` service, with tracing disabled and enabled (exporting to a JSON lines file in a temporary directory).
+
+The passwords are hashed inline, with few iterations, so that the hashing does not hide the overhead.
+
+Usage:
+    python -m user_management.benchmarks.tracing --calls 200000 --logins 500
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ableton_challenge.settings')
+django.setup()
+
+from django.test import override_settings  # noqa: E402
+
+from user_management.benchmarks.utils import benchmark_database  # noqa: E402
+from user_management.services.user import login  # noqa: E402
+from user_management.tests.factories.user import UserFactory  # noqa: E402
+from user_management.tracing import traced  # noqa: E402
+
+
+def noop():
+    pass
+
+
+traced_noop = traced()(noop)
+
+
+def time_calls(func, calls: int) -> float:
+    """Returns the nanoseconds per call."""
+    started_at = time.perf_counter_ns()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter_ns() - started_at) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--logins', type=int, default=500)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, benchmark_database(), override_settings(
+        PASSWORD_HASHING_EXECUTOR={'BACKEND': 'user_management.hashing.InlineHashingExecutor'},
+        PASSWORD_HASHER_PARAMETERS={'pbkdf2_sha256': {'iterations': 1000}},
+    ):
+        user = UserFactory(is_active=True, password='benchmark-password')
+
+        def login_once():
+            login(user.email, 'benchmark-password').unwrap()
+
+        tracing_settings = {
+            'off': {'ENABLED': False},
+            'on': {'ENABLED': True, 'OPTIONS': {'path': os.path.join(directory, 'traces.jsonl')}},
+        }
+        results['plain function'] = {'off': time_calls(noop, args.calls)}
+        for name, config in tracing_settings.items():
+            with override_settings(TRACING=config):
+                results.setdefault('traced function', {})[name] = time_calls(traced_noop, args.calls)
+                results.setdefault('login', {})[name] = time_calls(login_once, args.logins)
+
+    print(f'{"":<18}{"tracing off ns":>16}{"tracing on ns":>16}')
+    for name, result in results.items():
+        on = f'{result["on"]:>16.0f}' if 'on' in result else f'{"":>16}'
+        print(f'{name:<18}{result["off"]:>16.0f}{on}')
+    overhead = results['traced function']['off'] - results['plain function']['off']
+    print(f'Overhead of a disabled span: {overhead:.0f} ns per call')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import contextlib
+import logging
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.utils import load_backend
+from django.utils.connection import ConnectionDoesNotExist
+from django.test.utils import setup_test_environment, teardown_test_environment, get_runner
+
+
+@contextlib.contextmanager
+def benchmark_database():
+    """Runs the benchmark against a (freshly migrated) test database, so the real one is never touched."""
+    # The benchmarks make lots of 4xx requests, do not log them
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+
+    setup_test_environment()
+    test_runner = get_runner(settings)(verbosity=0)
+    old_config = test_runner.setup_databases()
+    try:
+        yield
+    finally:
+        test_runner.teardown_databases(old_config)
+        teardown_test_environment()
+
+
+def use_database(database: dict, alias: str = DEFAULT_DB_ALIAS):
+    """Replaces the connection (of this process) of the alias by one with the given settings."""
+    database = {**settings.DATABASES['default'], 'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {}, **database}
+    with contextlib.suppress(ConnectionDoesNotExist):
+        connections[alias].close()
+    connections[alias] = load_backend(database['ENGINE']).DatabaseWrapper(database, alias)
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    """Returns the percentile of the (sorted) values, by the nearest-rank method."""
+    if not sorted_values:
+        return 0.0
+    rank = max(round(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
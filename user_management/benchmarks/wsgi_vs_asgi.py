@@ -0,0 +1,87 @@
+"""
+Compares the throughput of the sync views served by the WSGI handler with the async views served by the ASGI handler.
+
+The WSGI side runs the requests from a pool of threads (like a threaded gunicorn worker), the ASGI side runs them
+as coroutines on a single event loop (like one uvicorn worker). Every request first waits `--client-delay` seconds,
+to simulate slow clients, which is the case the ASGI worker is meant for.
+
+Note that Django (5.0) still runs the queries of its async ORM methods in a thread,
+so the gain comes from waiting on the clients in the event loop rather than in the threads.
+
+Usage:
+    python -m user_management.benchmarks.wsgi_vs_asgi --requests 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ableton_challenge.settings')
+django.setup()
+
+from django.test import Client, AsyncClient  # noqa: E402
+
+from user_management.benchmarks.utils import benchmark_database  # noqa: E402
+from user_management.tests.factories.email_confirmation import EmailConfirmationFactory  # noqa: E402
+
+
+def run_wsgi(path: str, payload: dict, requests: int, concurrency: int, client_delay: float) -> float:
+    client = Client()
+
+    def request(_):
+        time.sleep(client_delay)
+        response = client.post(path, payload, content_type='application/json')
+        assert response.status_code < 500, response.content
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(request, range(requests)))
+    return time.perf_counter() - started_at
+
+
+async def run_asgi(path: str, payload: dict, requests: int, concurrency: int, client_delay: float) -> float:
+    client = AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request():
+        async with semaphore:
+            await asyncio.sleep(client_delay)
+            response = await client.post(path, payload, content_type='application/json')
+            assert response.status_code < 500, response.content
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(requests)))
+    return time.perf_counter() - started_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--client-delay', type=float, default=0.05)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        email_confirmation = EmailConfirmationFactory()
+        # The confirm-email endpoint does no password hashing, so it measures the request handling itself
+        payload = {'email': email_confirmation.user.email, 'code': 'wrong'}
+
+        wsgi_seconds = run_wsgi(
+            '/user-management/v1/users/confirm-email', payload,
+            args.requests, args.concurrency, args.client_delay,
+        )
+        asgi_seconds = asyncio.run(run_asgi(
+            '/user-management/v1/async/users/confirm-email', payload,
+            args.requests, args.concurrency, args.client_delay,
+        ))
+
+    print(f'{"handler":<8}{"seconds":>10}{"requests/s":>14}')
+    for handler, seconds in (('WSGI', wsgi_seconds), ('ASGI', asgi_seconds)):
+        print(f'{handler:<8}{seconds:>10.2f}{args.requests / seconds:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Signed confirmation links, an alternative to typing the code of the confirmation email: the email also carries
+a link with a token signed (HMAC-SHA256) over `<user id>:<nonce>:<expiry>`, which `confirm_email_link` verifies
+without reading the EmailConfirmation row. Configured by the `CONFIRMATION_LINKS` setting, i.e.:
+
+    CONFIRMATION_LINKS = {
+        'ENABLED': True,  # The confirmation emails carry a link, besides the code
+        'URL': 'https://example.com/confirm-email?token={token}',  # The page which posts the token
+    }
+
+The nonce is the current code of the user's EmailConfirmation, which is replaced on every resend, so a resend
+invalidates the links sent before, and the token expires with the code. The confirmation is then a conditional
+UPDATE (only if the nonce still matches, and it is not confirmed yet), like the one of the code flow, but without
+the lookup of the user by email beforehand.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+SALT = 'user_management.confirmation_links'
+
+
+@dataclass(frozen=True)
+class ConfirmationToken:
+    user_id: int
+    nonce: str
+    expires_at: int
+
+
+def _config() -> dict:
+    return getattr(settings, 'CONFIRMATION_LINKS', {})
+
+
+def is_enabled() -> bool:
+    return _config().get('ENABLED', False)
+
+
+def _signer() -> signing.Signer:
+    return signing.Signer(salt=SALT, algorithm='sha256')
+
+
+def make_token(user_id: int, nonce: str, expires_at: datetime) -> str:
+    return _signer().sign(f'{user_id}:{nonce}:{signing.b62_encode(int(expires_at.timestamp()))}')
+
+
+def make_link(user_id: int, nonce: str, expires_at: datetime) -> str:
+    return _config().get('URL', '{token}').format(token=make_token(user_id, nonce, expires_at))
+
+
+def parse_token(token: str) -> Optional[ConfirmationToken]:
+    """Returns the token if its signature is valid and it has not expired, otherwise None. Makes no query."""
+    try:
+        user_id, nonce, expires_at = _signer().unsign(token).split(':')
+        parsed = ConfirmationToken(int(user_id), nonce, signing.b62_decode(expires_at))
+    except (signing.BadSignature, ValueError):
+        return None
+
+    if parsed.expires_at <= timezone.now().timestamp():
+        return None
+    return parsed
@@ -0,0 +1,95 @@
+"""
+Database router sending the reads to the read replicas, and the writes (including `select_for_update` and
+`get_or_create`) to the primary (`default`) database.
+
+Configured by the `REPLICA_ROUTER` setting, i.e.:
+
+    REPLICA_ROUTER = {
+        'REPLICAS': ['replica'],  # Aliases of DATABASES, the reads are spread randomly over them
+        'STICKINESS_SECONDS': 5,  # Longer than the replication lag
+        'PIN_CACHE': 'default',  # Cache alias remembering the pinned clients (by IP), None to only use the cookie
+    }
+
+Read-your-writes: after a write, the reads of the same client go to the primary for `STICKINESS_SECONDS`,
+so that i.e. a `login` right after `confirm_email` never sees the (stale) inactive user. Within a request
+(or a command) the pin is kept in a context variable, across the requests by `middleware.ReplicaPinningMiddleware`,
+in a cookie and in `PIN_CACHE` (which must be shared by the processes, for the clients not keeping cookies).
+The reads inside a transaction of the primary go to the primary too.
+
+Locally, the replicas can be SQLite files, which are copied from the primary by `sync_sqlite_replicas` command.
+"""
+import contextlib
+import random
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+
+PIN_COOKIE_NAME = 'primary_pinned_until'
+
+_pinned_until: ContextVar[float] = ContextVar('primary_pinned_until', default=0.0)
+
+
+def _config() -> dict:
+    return getattr(settings, 'REPLICA_ROUTER', {})
+
+
+def get_replicas() -> list[str]:
+    return _config().get('REPLICAS', [])
+
+
+def stickiness_seconds() -> float:
+    return _config().get('STICKINESS_SECONDS', 5)
+
+
+def pin_to_primary(until: Optional[float] = None):
+    """Sends the reads of the current context to the primary, until the given (epoch) time."""
+    if until is None:
+        until = time.time() + stickiness_seconds()
+    if until > _pinned_until.get():
+        _pinned_until.set(until)
+
+
+def pinned_until() -> float:
+    return _pinned_until.get()
+
+
+def is_pinned_to_primary() -> bool:
+    return time.time() < _pinned_until.get()
+
+
+@contextlib.contextmanager
+def pin_scope(until: float = 0.0):
+    """Runs the block (i.e. a request) with its own pin, starting pinned to the primary until the given time."""
+    token = _pinned_until.set(until)
+    try:
+        yield
+    finally:
+        _pinned_until.reset(token)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas or is_pinned_to_primary() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Called for the possible writes as well (i.e. `get_or_create` which finds the object), which pin too
+        if get_replicas():
+            pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replicas get the schema from the primary, by the replication
+        if db in get_replicas():
+            return False
+        return None
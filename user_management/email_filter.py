@@ -0,0 +1,285 @@
+"""
+In-memory Bloom filter of the registered emails.
+
+It answers "definitely not registered" without touching the database, so the lookups of the non-existing
+emails (typos, enumeration attempts, bots) made by `signup`, `login` and `resend_email_confirmation` are skipped.
+A "maybe registered" answer still falls back to the database, so false positives only cost the usual query.
+
+Configured by the `EMAIL_EXISTENCE_FILTER` setting, i.e.:
+
+    EMAIL_EXISTENCE_FILTER = {
+        'ENABLED': True,
+        'CAPACITY': 1_000_000,  # Expected number of users, the filter grows when there are more
+        'ERROR_RATE': 0.01,  # False positive rate
+        'REFRESH_INTERVAL': 1,  # Seconds between fetching the users created by the other processes
+        'PATH': None,  # Optional file, written by `rebuild_email_filter` command, loaded at startup
+    }
+
+Each process builds its filter once, at startup (see `wsgi` and `asgi` modules), or otherwise on first use,
+from `PATH` if it exists, or else from the `User` table. Users created in the same process are added by the
+`post_save` signal, the ones created by other processes (or by `bulk_create`) are fetched by id every
+`REFRESH_INTERVAL` seconds. Bloom filters do not support removal, so deleted users stay in the filter until it is
+rebuilt, which only costs a query for their emails.
+
+The ids are not committed in their order: a transaction which got a lower id may commit after the refresh fetched
+a higher one. So the ids skipped by a refresh are pending, and fetched again by the next refreshes, until they are
+found or `PENDING_TIMEOUT` seconds passed (the id was rolled back, or its user deleted). Only the last `MAX_PENDING`
+of them are kept, a user committed that late (or after that many others) is missed until the filter is rebuilt.
+The filter is disabled when the users are sharded (see `user_management.sharding`), since the ids are reserved
+in blocks, so they are far from being created in increasing order.
+"""
+import collections
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+from django.dispatch import receiver
+
+from user_management.sharding import is_sharded
+
+PENDING_TIMEOUT = 600  # Seconds
+MAX_PENDING = 1000
+
+
+class BloomFilter:
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, value: str):
+        for index in self._indexes(value):
+            self.bits[index >> 3] |= 1 << (index & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[index >> 3] & (1 << (index & 7)) for index in self._indexes(value))
+
+    def _indexes(self, value: str) -> Iterable[int]:
+        # Double hashing (Kirsch-Mitzenmacher), derives all the indexes from a single digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+
+class EmailExistenceFilter:
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.01, refresh_interval: float = 1,
+                 path: Optional[str] = None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.path = path
+        self._bloom = None
+        self._last_user_id = 0
+        # The skipped ids (below `_last_user_id`) which may still be committed, by the time they were skipped
+        self._pending_user_ids: dict[int, float] = {}
+        self._refreshed_at = float('-inf')
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._checks = 0
+        self._queries_saved = 0
+        self._false_positives = 0
+
+    def might_exist(self, email: str) -> bool:
+        """Returns False if the email is definitely not registered, True if it might be."""
+        self._refresh()
+        might_exist = email in self._bloom
+        with self._lock:
+            self._checks += 1
+            if not might_exist:
+                self._queries_saved += 1
+        return might_exist
+
+    def add(self, email: str):
+        if self._bloom is not None:
+            with self._lock:
+                self._bloom.add(email)
+
+    def record_false_positive(self):
+        """To be called when the filter said "might exist", but the database did not find the email."""
+        with self._lock:
+            self._false_positives += 1
+
+    def build(self):
+        """Loads the filter from `path` if it exists, otherwise rebuilds it from the `User` table."""
+        if self.path and os.path.exists(self.path):
+            self.load(self.path)
+        else:
+            self.rebuild()
+
+    def rebuild(self):
+        """Rebuilds the filter from the `User` table."""
+        from user_management.models.user import User
+
+        # From the primary, since the replicas may lag behind (see `db_router` module)
+        users = User.objects.using(DEFAULT_DB_ALIAS).order_by('id').values_list('id', 'email')
+        bloom = BloomFilter(max(self.capacity, 2 * users.count()), self.error_rate)
+        last_user_ids = collections.deque(maxlen=MAX_PENDING)
+        for user_id, email in users.iterator(chunk_size=10000):
+            bloom.add(email)
+            last_user_ids.append(user_id)
+
+        last_user_id = last_user_ids[-1] if last_user_ids else 0
+        found_user_ids = set(last_user_ids)
+        now = time.monotonic()
+        # The users of the transactions still running may get any of the last ids
+        pending_user_ids = {
+            user_id: now for user_id in range(max(last_user_id - MAX_PENDING, 0) + 1, last_user_id)
+            if user_id not in found_user_ids
+        }
+        with self._lock:
+            self._bloom, self._last_user_id, self._refreshed_at = bloom, last_user_id, now
+            self._pending_user_ids = pending_user_ids
+
+    def save(self, path: str):
+        header = {
+            'capacity': self._bloom.capacity,
+            'error_rate': self._bloom.error_rate,
+            'count': self._bloom.count,
+            'last_user_id': self._last_user_id,
+            'pending_user_ids': list(self._pending_user_ids),
+        }
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(json.dumps(header).encode() + b'\n')
+            file.write(self._bloom.bits)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        with open(path, 'rb') as file:
+            header = json.loads(file.readline())
+            bloom = BloomFilter(header['capacity'], header['error_rate'])
+            bloom.bits = bytearray(file.read())
+            bloom.count = header['count']
+
+        now = time.monotonic()
+        with self._lock:
+            # Refreshed on the first check, to fetch the users created since the file was written
+            self._bloom, self._last_user_id, self._refreshed_at = bloom, header['last_user_id'], float('-inf')
+            self._pending_user_ids = {user_id: now for user_id in header.get('pending_user_ids', [])}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': self._bloom.count if self._bloom else 0,
+                'checks': self._checks,
+                'queries_saved': self._queries_saved,
+                'false_positives': self._false_positives,
+            }
+
+    def _refresh(self):
+        if self._bloom is None:
+            # The concurrent first checks wait for one build
+            with self._refresh_lock:
+                if self._bloom is None:
+                    self.build()
+
+        if time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            # Refreshed by another thread already
+            return
+        try:
+            self._fetch_new_users()
+        finally:
+            self._refresh_lock.release()
+
+    def _fetch_new_users(self):
+        from user_management.models.user import User
+
+        # Fetch the users created since the last refresh (i.e. by the other processes), and the pending ones.
+        # From the primary, since the users a lagging replica does not have yet would be skipped for good.
+        new_users = list(
+            User.objects.using(DEFAULT_DB_ALIAS)
+            .filter(Q(id__gt=self._last_user_id) | Q(id__in=list(self._pending_user_ids)))
+            .order_by('id')
+            .values_list('id', 'email')
+        )
+        now = time.monotonic()
+        with self._lock:
+            for _user_id, email in new_users:
+                self._bloom.add(email)
+
+            found_user_ids = {user_id for user_id, _email in new_users}
+            last_user_id = max(self._last_user_id, new_users[-1][0]) if new_users else self._last_user_id
+            pending_user_ids = {
+                user_id: skipped_at for user_id, skipped_at in self._pending_user_ids.items()
+                if user_id not in found_user_ids and now - skipped_at < PENDING_TIMEOUT
+            }
+            for user_id in range(max(self._last_user_id, last_user_id - MAX_PENDING) + 1, last_user_id):
+                if user_id not in found_user_ids:
+                    pending_user_ids[user_id] = now
+            if len(pending_user_ids) > MAX_PENDING:
+                pending_user_ids = dict(sorted(pending_user_ids.items())[-MAX_PENDING:])
+
+            self._last_user_id, self._pending_user_ids = last_user_id, pending_user_ids
+            self._refreshed_at = now
+            too_full = self._bloom.count > self._bloom.capacity
+
+        if too_full:
+            # Can not keep the error rate anymore, rebuild it bigger
+            self.rebuild()
+
+
+_email_filter = None
+_email_filter_lock = threading.Lock()
+
+
+def get_email_filter(build: bool = True) -> Optional[EmailExistenceFilter]:
+    """
+    Returns the (per process) email filter, built once under a lock,
+    or None if it is disabled by `EMAIL_EXISTENCE_FILTER` setting (or the users are sharded).
+
+    If not `build`, returns None instead of building the filter (i.e. when it only has to learn a new email,
+    which the build would fetch anyway).
+    """
+    global _email_filter
+    config = getattr(settings, 'EMAIL_EXISTENCE_FILTER', {})
+    if not config.get('ENABLED', False) or is_sharded():
+        return None
+
+    if _email_filter is None and build:
+        with _email_filter_lock:
+            if _email_filter is None:
+                email_filter = EmailExistenceFilter(
+                    capacity=config.get('CAPACITY', 1_000_000),
+                    error_rate=config.get('ERROR_RATE', 0.01),
+                    refresh_interval=config.get('REFRESH_INTERVAL', 1),
+                    path=config.get('PATH'),
+                )
+                email_filter.build()
+                _email_filter = email_filter
+    return _email_filter
+
+
+def might_exist(email: str) -> bool:
+    """Returns False if the email is definitely not registered, True if it might be (or the filter is disabled)."""
+    email_filter = get_email_filter()
+    return email_filter is None or email_filter.might_exist(email)
+
+
+def record_false_positive():
+    email_filter = get_email_filter()
+    if email_filter is not None:
+        email_filter.record_false_positive()
+
+
+@receiver(setting_changed)
+def reset_email_filter(setting, **kwargs):
+    global _email_filter
+    if setting == 'EMAIL_EXISTENCE_FILTER':
+        _email_filter = None
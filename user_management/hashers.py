@@ -0,0 +1,126 @@
+"""
+Password hashers whose parameters are read from `PASSWORD_HASHER_PARAMETERS` setting (per algorithm), rather than
+hard-coded on the class, plus the functions finding the parameters which hit a target latency on the current machine
+(see `calibrate_hashers` command), i.e.:
+
+    PASSWORD_HASHER_PARAMETERS = {
+        'pbkdf2_sha256': {'iterations': 870000},
+        'argon2': {'time_cost': 3, 'memory_cost': 65536, 'parallelism': 4},
+        'scrypt': {'work_factor': 32768, 'block_size': 8, 'parallelism': 1},
+    }
+
+The hashers keep the algorithm names of Django's ones, so the existing hashes are still verified, and the hashes
+with other parameters are upgraded (re-hashed) on the next successful login (see `User.check_password`).
+"""
+import statistics
+import time
+from typing import Callable
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+CALIBRATION_PASSWORD = 'calibration-password'
+SCRYPT_MAX_MEMORY = 1024 ** 3
+
+
+def _calibrated(name: str, default: int) -> property:
+    def getter(self):
+        return getattr(settings, 'PASSWORD_HASHER_PARAMETERS', {}).get(self.algorithm, {}).get(name, default)
+    return property(getter)
+
+
+class CalibratedPBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    iterations = _calibrated('iterations', hashers.PBKDF2PasswordHasher.iterations)
+
+
+class CalibratedArgon2PasswordHasher(hashers.Argon2PasswordHasher):
+    time_cost = _calibrated('time_cost', hashers.Argon2PasswordHasher.time_cost)
+    memory_cost = _calibrated('memory_cost', hashers.Argon2PasswordHasher.memory_cost)
+    parallelism = _calibrated('parallelism', hashers.Argon2PasswordHasher.parallelism)
+
+
+class CalibratedScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    work_factor = _calibrated('work_factor', hashers.ScryptPasswordHasher.work_factor)
+    block_size = _calibrated('block_size', hashers.ScryptPasswordHasher.block_size)
+    parallelism = _calibrated('parallelism', hashers.ScryptPasswordHasher.parallelism)
+    # Only an upper bound of the memory used (which is 128 * work_factor * block_size bytes), rather than a cost.
+    # OpenSSL's default (32 MiB) would fail to verify the hashes of higher work factors.
+    maxmem = SCRYPT_MAX_MEMORY
+
+
+def time_hash(hasher_class: type, repeat: int = 3, **parameters) -> float:
+    """Returns the median seconds of hashing a password by the hasher, with the given (class attribute) parameters."""
+    hasher = hasher_class()
+    for name, value in parameters.items():
+        setattr(hasher, name, value)
+
+    durations = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        hasher.encode(CALIBRATION_PASSWORD, hasher.salt())
+        durations.append(time.perf_counter() - started_at)
+    return statistics.median(durations)
+
+
+def calibrate_pbkdf2(target_seconds: float, timer: Callable = time_hash) -> tuple[dict, float]:
+    """
+    Returns the parameters (and their latency) of PBKDF2, by scaling the iterations linearly.
+
+    Never fewer iterations than Django's default, even if they take longer than the target.
+    """
+    probe_iterations = 100_000
+    seconds = timer(hashers.PBKDF2PasswordHasher, iterations=probe_iterations)
+    iterations = max(
+        int(round(probe_iterations * target_seconds / seconds, -3)), hashers.PBKDF2PasswordHasher.iterations,
+    )
+    return {'iterations': iterations}, timer(hashers.PBKDF2PasswordHasher, iterations=iterations)
+
+
+def calibrate_argon2(target_seconds: float, memory_cost: int = 65536, parallelism: int = 4,
+                     timer: Callable = time_hash) -> tuple[dict, float]:
+    """
+    Returns the parameters (and their latency) of Argon2, with the highest time cost (passes) within the target.
+
+    The memory cost is halved while even a single pass takes longer than the target.
+    """
+    def measure(time_cost):
+        return timer(hashers.Argon2PasswordHasher, time_cost=time_cost, memory_cost=memory_cost,
+                     parallelism=parallelism)
+
+    seconds = measure(1)
+    while seconds > target_seconds and memory_cost > 8 * parallelism:
+        memory_cost //= 2
+        seconds = measure(1)
+
+    time_cost = 1
+    while True:
+        next_seconds = measure(time_cost + 1)
+        if next_seconds > target_seconds:
+            break
+        time_cost, seconds = time_cost + 1, next_seconds
+
+    return {'time_cost': time_cost, 'memory_cost': memory_cost, 'parallelism': parallelism}, seconds
+
+
+def calibrate_scrypt(target_seconds: float, block_size: int = 8, max_memory: int = 256 * 1024 * 1024,
+                     timer: Callable = time_hash) -> tuple[dict, float]:
+    """
+    Returns the parameters (and their latency) of scrypt, with the highest (power of two) work factor within
+    the target, using at most `max_memory` bytes.
+    """
+    def memory(work_factor):
+        return 128 * work_factor * block_size
+
+    def measure(work_factor):
+        return timer(hashers.ScryptPasswordHasher, work_factor=work_factor, block_size=block_size,
+                     maxmem=SCRYPT_MAX_MEMORY)
+
+    work_factor = 2 ** 10
+    seconds = measure(work_factor)
+    while memory(work_factor * 2) <= max_memory:
+        next_seconds = measure(work_factor * 2)
+        if next_seconds > target_seconds:
+            break
+        work_factor, seconds = work_factor * 2, next_seconds
+
+    return {'work_factor': work_factor, 'block_size': block_size, 'parallelism': 1}, seconds
@@ -0,0 +1,234 @@
+"""
+Executors which run the (CPU-bound) password hashing off the request thread.
+
+Which executor is used is configured by the `PASSWORD_HASHING_EXECUTOR` setting, i.e.:
+
+    PASSWORD_HASHING_EXECUTOR = {
+        'BACKEND': 'user_management.hashing.ProcessPoolHashingExecutor',
+        'OPTIONS': {'max_workers': None, 'max_queue_size': 64, 'timeout': 5, 'metrics_interval': 60},
+    }
+
+Every `metrics_interval` seconds (0 to disable), each process logs the metrics of its executor (see `metrics`),
+i.e. its hashes, their queue depth and durations, and the rejected and timed out ones.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+
+from ableton_challenge.errors import ServiceUnavailable
+from user_management.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+def _make_password(raw_password: str) -> str:
+    return hashers.make_password(raw_password)
+
+
+def _make_passwords(raw_passwords: list[str]) -> list[str]:
+    return [hashers.make_password(raw_password) for raw_password in raw_passwords]
+
+
+def _check_password(raw_password: str, encoded: str) -> tuple[bool, bool]:
+    """Returns whether the password is correct, and whether its hash must be upgraded."""
+    must_update = []
+    is_correct = hashers.check_password(raw_password, encoded, setter=must_update.append)
+    return is_correct, bool(must_update)
+
+
+def _setup_worker():
+    # Needed when the worker processes are spawned (not forked), i.e. on macOS
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ableton_challenge.settings')
+    django.setup()
+
+
+class InlineHashingExecutor:
+    """Hashes on the calling thread, the same as Django does by default."""
+
+    def __init__(self, metrics_interval: float = 60):
+        self.metrics_interval = metrics_interval
+        self._lock = threading.Lock()
+        self._logged_at = time.monotonic()
+        self._queue_depth = 0
+        self._hashes = 0
+        self._hash_seconds = 0.0
+        self._max_hash_seconds = 0.0
+        self._rejected = 0
+        self._timeouts = 0
+
+    def make_password(self, raw_password: str) -> str:
+        with span('password.hash'):
+            return self._run(_make_password, raw_password)
+
+    def make_passwords(self, raw_passwords: list[str]) -> list[str]:
+        """Hashes many passwords (i.e. of a bulk signup), in the same order."""
+        return [self.make_password(raw_password) for raw_password in raw_passwords]
+
+    def check_password(self, raw_password: str, encoded: str) -> tuple[bool, bool]:
+        with span('password.check'):
+            return self._run(_check_password, raw_password, encoded)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                'queue_depth': self._queue_depth,
+                'hashes': self._hashes,
+                'rejected': self._rejected,
+                'timeouts': self._timeouts,
+                'avg_hash_seconds': self._hash_seconds / self._hashes if self._hashes else 0.0,
+                'max_hash_seconds': self._max_hash_seconds,
+            }
+
+    def shutdown(self):
+        pass
+
+    def _run(self, fn, *args):
+        with self._lock:
+            self._queue_depth += 1
+        started_at = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._record_hash(time.perf_counter() - started_at)
+            with self._lock:
+                self._queue_depth -= 1
+
+    def _record_hash(self, seconds: float, hashes: int = 1):
+        with self._lock:
+            self._hashes += hashes
+            self._hash_seconds += seconds
+            self._max_hash_seconds = max(self._max_hash_seconds, seconds)
+            log_metrics = bool(self.metrics_interval) and time.monotonic() - self._logged_at >= self.metrics_interval
+            if log_metrics:
+                self._logged_at = time.monotonic()
+        if log_metrics:
+            logger.info('Password hashing metrics', extra=self.metrics())
+
+
+class ProcessPoolHashingExecutor(InlineHashingExecutor):
+    """
+    Hashes in a pool of worker processes (one per CPU by default).
+
+    At most `max_queue_size` hashes can be pending at the same time, beyond that the requests fail fast
+    with `ServiceUnavailable` instead of piling up. The same error is raised when a hash does not finish
+    within `timeout` seconds.
+    """
+
+    def __init__(self, max_workers: int = None, max_queue_size: int = 64, timeout: float = 5,
+                 metrics_interval: float = 60):
+        super().__init__(metrics_interval)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue_size = max_queue_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_queue_size)
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_setup_worker)
+
+    def metrics(self) -> dict:
+        return {**super().metrics(), 'max_queue_size': self.max_queue_size, 'max_workers': self.max_workers}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def make_passwords(self, raw_passwords: list[str]) -> list[str]:
+        """
+        Hashes the passwords in parallel: they are split in one chunk per worker, each chunk taking one slot
+        of the queue, and waited for `timeout` seconds per password of the chunk.
+        """
+        raw_passwords = list(raw_passwords)
+        if not raw_passwords:
+            return []
+
+        chunk_size = math.ceil(len(raw_passwords) / self.max_workers)
+        chunks = [raw_passwords[start:start + chunk_size] for start in range(0, len(raw_passwords), chunk_size)]
+        with span('password.hash_many', passwords=len(raw_passwords)):
+            futures = [self._submit(_make_passwords, chunk, hashes=len(chunk)) for chunk in chunks]
+            return [encoded for future in futures for encoded in self._result(future, self.timeout * chunk_size)]
+
+    def _run(self, fn, *args):
+        return self._result(self._submit(fn, *args), self.timeout)
+
+    def _submit(self, fn, *args, hashes: int = 1) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ServiceUnavailable(detail=_('Too many concurrent password hashing requests, try again later.'))
+
+        with self._lock:
+            self._queue_depth += 1
+        started_at = time.perf_counter()
+        pool = self._pool
+        try:
+            future = pool.submit(fn, *args)
+        except BaseException as error:
+            with self._lock:
+                self._queue_depth -= 1
+            self._slots.release()
+            if isinstance(error, BrokenProcessPool):
+                self._replace_pool(pool)
+                raise ServiceUnavailable(detail=_('Password hashing failed, try again later.'))
+            raise
+        # The slot is released once the hash is done, not when the caller gives up waiting for it,
+        # so the queue depth always reflects the real load of the pool.
+        future.add_done_callback(lambda _future: self._release_slot(started_at, hashes))
+        return future
+
+    def _replace_pool(self, broken_pool: ProcessPoolExecutor):
+        """Replaces the pool, once one of its worker processes died (i.e. killed by the OOM killer)."""
+        with self._lock:
+            if self._pool is not broken_pool:
+                # Already replaced by another thread
+                return
+            logger.error('The password hashing pool is broken, replacing it')
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_setup_worker)
+        broken_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _result(self, future: Future, timeout: float):
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            raise ServiceUnavailable(detail=_('Password hashing timed out, try again later.'))
+
+    def _release_slot(self, started_at: float, hashes: int = 1):
+        self._record_hash(time.perf_counter() - started_at, hashes)
+        with self._lock:
+            self._queue_depth -= 1
+        self._slots.release()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_hashing_executor() -> InlineHashingExecutor:
+    """Returns the (per process) password hashing executor, configured by `PASSWORD_HASHING_EXECUTOR` setting."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                config = getattr(settings, 'PASSWORD_HASHING_EXECUTOR', {})
+                backend = import_string(config.get('BACKEND', 'user_management.hashing.InlineHashingExecutor'))
+                _executor = backend(**config.get('OPTIONS', {}))
+    return _executor
+
+
+@receiver(setting_changed)
+def reset_hashing_executor(setting, **kwargs):
+    global _executor
+    hashing_settings = ('PASSWORD_HASHING_EXECUTOR', 'PASSWORD_HASHERS', 'PASSWORD_HASHER_PARAMETERS')
+    if setting in hashing_settings and _executor is not None:
+        _executor.shutdown()
+        _executor = None
@@ -0,0 +1,240 @@
+"""
+`Idempotency-Key` header support: the first response to a key is stored, and the retries with the same key
+(i.e. of mobile clients, after a timeout) get it replayed without running the view again, so a retried
+signup does not hash the password again, and a retried resend does not send another code.
+
+A retry which arrives while the first request is still running waits for its response (up to `WAIT_TIMEOUT`
+seconds, then gets a 409), instead of running the view concurrently. Only the 2xx and the (not retryable) 4xx
+responses are stored, the others (i.e. 429, 503) release the key, so the retry runs the view.
+
+The views opt in by the `idempotent` decorator (or an `idempotent = True` attribute of the class based views),
+`middleware.IdempotencyMiddleware` does the rest. The keys and responses live in a pluggable store,
+configured by the `IDEMPOTENCY_STORE` setting, i.e.:
+
+    # A single process
+    IDEMPOTENCY_STORE = {'BACKEND': 'user_management.idempotency.LocalMemoryStore', 'TTL': 86400}
+    # Multiple processes, sharing a Django cache
+    IDEMPOTENCY_STORE = {
+        'BACKEND': 'user_management.idempotency.CacheStore',
+        'OPTIONS': {'cache': 'default'},
+        'TTL': 86400,  # Seconds the responses are kept
+        'LOCK_TTL': 60,  # Seconds a request can hold a key, in case its process dies
+        'WAIT_TIMEOUT': 10,  # Seconds a concurrent retry waits for the first request
+    }
+
+The keys are scoped by the view and the client: the authenticated user, or else (the IP often changes between
+the retries) the body of the request, so a response is only replayed to a request with the same credentials.
+Reusing a key of an authenticated user with another request (method, path or body) is rejected with a 422.
+The login is not idempotent, its responses (the tokens) are never stored. The clients must use random keys,
+i.e. UUIDs.
+"""
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int = 0
+    content: bytes = b''
+    content_type: str = ''
+
+    @property
+    def in_flight(self) -> bool:
+        return not self.status_code
+
+
+class LocalMemoryStore:
+    """
+    Keeps the responses in the memory of the current process, the waiting retries are woken up right away.
+
+    Keeps at most `max_entries` of them, the expired ones are dropped first, then the oldest ones.
+    """
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._condition = threading.Condition()
+
+    def add(self, key: str, entry: StoredResponse, ttl: float) -> bool:
+        now = time.monotonic()
+        with self._condition:
+            existing = self._entries.get(key)
+            if existing is not None and existing[0] > now:
+                return False
+            self._entries[key] = (now + ttl, entry)
+            if len(self._entries) > self.max_entries:
+                self._purge(now)
+            return True
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        with self._condition:
+            return self._get(key)
+
+    def set(self, key: str, entry: StoredResponse, ttl: float):
+        with self._condition:
+            self._entries[key] = (time.monotonic() + ttl, entry)
+            self._condition.notify_all()
+
+    def delete(self, key: str):
+        with self._condition:
+            self._entries.pop(key, None)
+            self._condition.notify_all()
+
+    def wait(self, key: str, timeout: float) -> Optional[StoredResponse]:
+        """Waits until the entry is no longer in flight, returns it (or None if it is gone)."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            entry = self._get(key)
+            while entry is not None and entry.in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+                entry = self._get(key)
+            return entry
+
+    def _get(self, key: str) -> Optional[StoredResponse]:
+        expires_at, entry = self._entries.get(key, (0, None))
+        return entry if expires_at > time.monotonic() else None
+
+    def _purge(self, now: float):
+        entries = [(key, entry) for key, entry in self._entries.items() if entry[0] > now]
+        # Room for a tenth more entries, so the next ones do not purge again right away
+        self._entries = dict(entries[max(len(entries) - self.max_entries * 9 // 10, 0):])
+
+
+class CacheStore:
+    """Keeps the responses in a Django cache, shared between the processes, the waiting retries poll it."""
+
+    poll_interval = 0.05
+
+    def __init__(self, cache: str = 'default'):
+        self.cache = caches[cache]
+
+    def add(self, key: str, entry: StoredResponse, ttl: float) -> bool:
+        return self.cache.add(key, entry, timeout=ttl)
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        return self.cache.get(key)
+
+    def set(self, key: str, entry: StoredResponse, ttl: float):
+        self.cache.set(key, entry, timeout=ttl)
+
+    def delete(self, key: str):
+        self.cache.delete(key)
+
+    def wait(self, key: str, timeout: float) -> Optional[StoredResponse]:
+        deadline = time.monotonic() + timeout
+        entry = self.get(key)
+        while entry is not None and entry.in_flight and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            entry = self.get(key)
+        return entry
+
+
+class IdempotencyStats:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {'requests': 0, 'replays': 0, 'waits': 0, 'conflicts': 0, 'mismatches': 0}
+
+    def record(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        counts['hit_rate'] = counts['replays'] / counts['requests'] if counts['requests'] else 0.0
+        return counts
+
+
+_store = None
+_stats = IdempotencyStats()
+_store_lock = threading.Lock()
+
+
+def _config() -> dict:
+    return getattr(settings, 'IDEMPOTENCY_STORE', {})
+
+
+def get_idempotency_store():
+    """Returns the (per process) store, configured by `IDEMPOTENCY_STORE` setting."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = import_string(_config().get('BACKEND', 'user_management.idempotency.LocalMemoryStore'))
+                _store = backend(**_config().get('OPTIONS', {}))
+    return _store
+
+
+def get_idempotency_stats() -> IdempotencyStats:
+    return _stats
+
+
+@receiver(setting_changed)
+def reset_idempotency_store(setting, **kwargs):
+    global _store, _stats
+    if setting in ('IDEMPOTENCY_STORE', 'CACHES'):
+        _store = None
+        _stats = IdempotencyStats()
+
+
+def ttl() -> float:
+    return _config().get('TTL', 24 * 60 * 60)
+
+
+def lock_ttl() -> float:
+    return _config().get('LOCK_TTL', 60)
+
+
+def wait_timeout() -> float:
+    return _config().get('WAIT_TIMEOUT', 10)
+
+
+def store_key(request, key: str) -> str:
+    """Returns the key of the stored response, scoped by the view and the client (see module docstring)."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        client = f'user:{user.pk}'
+    else:
+        client = f'body:{hashlib.sha256(request.body).hexdigest()}'
+    # Hashed, to fit the key length limit of the caches (i.e. memcached's 250 characters)
+    return 'idempotency:' + hashlib.sha256(f'{request.path}\n{client}\n{key}'.encode()).hexdigest()
+
+
+def fingerprint(request) -> str:
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def is_storable(status_code: int) -> bool:
+    # The client retries the others, which must run the view again
+    return 200 <= status_code < 300 or (400 <= status_code < 500 and status_code not in (408, 409, 425, 429))
+
+
+def idempotent(view_func: Callable) -> Callable:
+    """Marks the (function) view as honouring the `Idempotency-Key` header, see `middleware.IdempotencyMiddleware`."""
+    view_func.idempotent = True
+    return view_func
+
+
+def is_idempotent(view_func) -> bool:
+    owner = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    return getattr(view_func, 'idempotent', False) or getattr(owner, 'idempotent', False)
@@ -0,0 +1,190 @@
+"""
+High-throughput drainer of the django-mailer queue (see `drain_mail_queue` command).
+
+Each batch of messages is claimed by inserting `MailQueueClaim` rows, so that several drainers can run side by side
+without sending the same message twice. The messages are sent from a pool of threads, each of which reuses its own
+(SMTP) connection, then the whole batch is marked as sent (deleted from the queue) or deferred with bulk queries.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction, IntegrityError
+from django.utils import timezone
+from mailer.engine import ensure_message_id
+from mailer.models import Message, MessageLog, PRIORITY_DEFERRED, RESULT_SUCCESS, RESULT_FAILURE, get_message_id
+
+from user_management.models.mail_queue_claim import MailQueueClaim
+
+logger = logging.getLogger(__name__)
+
+# Returned by `_send` for the messages which could not be converted from DB
+_DISCARDED = object()
+
+
+class MailQueueDrainer:
+
+    def __init__(self, batch_size: int = 100, workers: int = 4, lease_seconds: float = 300,
+                 backend: Optional[str] = None):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.backend = backend or getattr(settings, 'MAILER_EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.sent = 0
+        self.deferred = 0
+        self._local = threading.local()
+        # Kept for the lifetime of the drainer, so each thread keeps its connection between the batches
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def claim_batch(self) -> list[Message]:
+        """Claims (and returns) up to `batch_size` messages of the queue, which are not claimed by other drainers."""
+        now = timezone.now()
+        # Take over the claims of the drainers which crashed in the middle of a batch
+        MailQueueClaim.objects.filter(claimed_at__lt=now - timezone.timedelta(seconds=self.lease_seconds)).delete()
+
+        message_ids = list(
+            Message.objects.non_deferred()
+            .filter(queue_claim__isnull=True)
+            .order_by('priority', 'when_added')
+            .values_list('id', flat=True)[:self.batch_size]
+        )
+        if not message_ids:
+            return []
+
+        try:
+            with transaction.atomic():
+                MailQueueClaim.objects.bulk_create(
+                    [MailQueueClaim(message_id=message_id, worker=self.worker_id, claimed_at=now)
+                     for message_id in message_ids],
+                    ignore_conflicts=True,
+                )
+        except IntegrityError:
+            # Some of the messages were sent (deleted) by another drainer meanwhile, try again with the next batch
+            return []
+
+        return list(Message.objects.filter(queue_claim__worker=self.worker_id).order_by('priority', 'when_added'))
+
+    def send_batch(self, messages: list[Message]) -> tuple[int, int]:
+        """Sends the claimed messages, and marks them as sent or deferred. Returns the number of both."""
+        errors = list(self._executor.map(self._send, messages))
+
+        sent = [message for message, error in zip(messages, errors) if error is None]
+        discarded = [message for message, error in zip(messages, errors) if error is _DISCARDED]
+        deferred = [
+            (message, error) for message, error in zip(messages, errors) if error is not None and error is not _DISCARDED
+        ]
+
+        with transaction.atomic():
+            MessageLog.objects.bulk_create(
+                [self._log(message, RESULT_SUCCESS) for message in sent]
+                + [self._log(message, RESULT_FAILURE, str(error)) for message, error in deferred]
+            )
+            # Deleting the messages deletes their claims as well
+            Message.objects.filter(id__in=[message.id for message in sent + discarded]).delete()
+            Message.objects.filter(id__in=[message.id for message, _error in deferred]).update(
+                priority=PRIORITY_DEFERRED,
+            )
+            MailQueueClaim.objects.filter(message_id__in=[message.id for message, _error in deferred]).delete()
+
+        self.sent += len(sent)
+        self.deferred += len(deferred)
+        return len(sent), len(deferred)
+
+    def drain(self, once: bool = False, empty_queue_sleep: float = 5, stats_interval: float = 10):
+        """
+        Sends the queued messages batch by batch.
+
+        If `once` is set, returns when the queue is empty, otherwise waits `empty_queue_sleep` seconds
+        and checks the queue again.
+        """
+        started_at = reported_at = time.perf_counter()
+        try:
+            while True:
+                messages = self.claim_batch()
+                if messages:
+                    self.send_batch(messages)
+                elif once:
+                    break
+                else:
+                    time.sleep(empty_queue_sleep)
+
+                if time.perf_counter() - reported_at >= stats_interval:
+                    reported_at = time.perf_counter()
+                    logger.info('Mail queue drainer stats', extra=self.stats(reported_at - started_at))
+        finally:
+            self.close()
+
+        return self.stats(time.perf_counter() - started_at)
+
+    def stats(self, seconds: float) -> dict:
+        return {
+            'sent': self.sent,
+            'deferred': self.deferred,
+            'seconds': seconds,
+            'messages_per_second': (self.sent + self.deferred) / seconds if seconds else 0.0,
+        }
+
+    def close(self):
+        self._executor.shutdown()
+        with self._connections_lock:
+            for connection in self._connections:
+                try:
+                    connection.close()
+                except Exception:
+                    logger.exception('Could not close the email connection')
+            self._connections = []
+
+    def _send(self, message: Message):
+        """Returns None if the message is sent, otherwise the error (or `_DISCARDED`)."""
+        email = message.email
+        if email is None:
+            # Same as django-mailer, discards the messages which could not be converted from DB
+            logger.warning(f'message discarded due to failure in converting from DB. Added on {message.when_added}')
+            return _DISCARDED
+
+        try:
+            email.connection = self._connection()
+            ensure_message_id(email)
+            email.send()
+        except Exception as exc:
+            logger.info(f'message deferred due to failure: {exc}')
+            # i.e. enforce creation of a new connection
+            self._local.connection = None
+            return exc
+        finally:
+            # connection can't be stored in the MessageLog
+            email.connection = None
+
+        message.email = email  # For the sake of MessageLog
+        return None
+
+    def _connection(self):
+        """Returns the connection of the current thread, which is opened once and reused for all its messages."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = get_connection(backend=self.backend, fail_silently=False)
+            connection.open()
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _log(self, message: Message, result_code: str, log_message: str = '') -> MessageLog:
+        return MessageLog(
+            message_data=message.message_data,
+            message_id=get_message_id(message.email),
+            when_added=message.when_added,
+            priority=message.priority,
+            result=result_code,
+            log_message=log_message,
+        )
@@ -0,0 +1,60 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user_management.benchmarks.services import run_suite, find_regressions
+from user_management.benchmarks.utils import benchmark_database
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'benchmarks',
+                                     'baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the services (p50/p95/p99 latency and query counts) at several sizes of the User table, '
+        'against a test database. Fails if any metric regresses past the threshold compared to the baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,100000,1000000',
+                            help='Comma separated sizes of the User table')
+        parser.add_argument('--iterations', type=int, default=50, help='Calls of each service, at each size')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH)
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed latency regression, i.e. 0.2 for 20%%. Query counts must not grow at all')
+        parser.add_argument('--save-baseline', action='store_true', help='Store the results as the new baseline')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        if any(size < 8 * options['iterations'] for size in sizes):
+            raise CommandError('Each size must be at least 8 times the iterations, to not reuse users.')
+        if not options['save_baseline'] and not os.path.exists(options['baseline']):
+            # Checked before running, the gate must not pass for lack of a baseline
+            raise CommandError(f'No baseline at {options["baseline"]}, run with --save-baseline to store one.')
+
+        with benchmark_database():
+            results = run_suite(sizes, options['iterations'], stdout=self.stdout)
+
+        for size, services in results.items():
+            for service, metrics in services.items():
+                self.stdout.write(
+                    f'{size:>8} {service:<32}'
+                    f'p50 {metrics["p50_ms"]:8.2f}ms  p95 {metrics["p95_ms"]:8.2f}ms  '
+                    f'p99 {metrics["p99_ms"]:8.2f}ms  queries {metrics["queries"]}'
+                )
+
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'Stored the baseline in {options["baseline"]}'))
+            return
+
+        with open(options['baseline']) as file:
+            baseline = json.load(file)
+
+        regressions = find_regressions(baseline, results, options['threshold'])
+        if regressions:
+            raise CommandError('Regressions found:\n' + '\n'.join(regressions))
+
+        self.stdout.write(self.style.SUCCESS('No regressions compared to the baseline.'))
@@ -0,0 +1,77 @@
+import pprint
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.management.base import BaseCommand, CommandError
+
+from user_management import hashers
+
+ALGORITHMS = ('argon2', 'pbkdf2_sha256', 'scrypt')
+HASHER_CLASSES = {
+    'argon2': 'user_management.hashers.CalibratedArgon2PasswordHasher',
+    'pbkdf2_sha256': 'user_management.hashers.CalibratedPBKDF2PasswordHasher',
+    'scrypt': 'user_management.hashers.CalibratedScryptPasswordHasher',
+}
+# Only verify the hashes of the other algorithms Django hashes with by default (but bcrypt, which is not installed)
+LEGACY_HASHER_CLASSES = (
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the password hashers on this machine, and prints the PASSWORD_HASHERS and '
+        'PASSWORD_HASHER_PARAMETERS settings which hit the target latency per hash. '
+        'The existing hashes are upgraded to the new parameters on the next login of their users.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=100, help='The latency budget of a single hash')
+        parser.add_argument('--algorithms', default=','.join(ALGORITHMS),
+                            help='Comma separated, the first one (which is available) hashes the new passwords')
+        parser.add_argument('--argon2-memory-kib', type=int, default=65536)
+        parser.add_argument('--argon2-parallelism', type=int, default=4)
+        parser.add_argument('--scrypt-max-memory-mib', type=int, default=256)
+
+    def handle(self, *args, **options):
+        algorithms = [algorithm.strip() for algorithm in options['algorithms'].split(',') if algorithm.strip()]
+        unknown = set(algorithms) - set(ALGORITHMS)
+        if unknown:
+            raise CommandError(
+                f'Unknown algorithms: {", ".join(sorted(unknown))}, choose from {", ".join(ALGORITHMS)}'
+            )
+
+        target_seconds = options['target_ms'] / 1000
+        calibrations = {
+            'argon2': lambda: hashers.calibrate_argon2(
+                target_seconds, memory_cost=options['argon2_memory_kib'], parallelism=options['argon2_parallelism'],
+            ),
+            'pbkdf2_sha256': lambda: hashers.calibrate_pbkdf2(target_seconds),
+            'scrypt': lambda: hashers.calibrate_scrypt(
+                target_seconds, max_memory=options['scrypt_max_memory_mib'] * 1024 * 1024,
+            ),
+        }
+
+        parameters = {}
+        for algorithm in algorithms:
+            try:
+                parameters[algorithm], seconds = calibrations[algorithm]()
+            except ValueError as error:
+                # i.e. argon2-cffi is not installed
+                self.stderr.write(self.style.WARNING(f'Skipped {algorithm}: {error}'))
+                continue
+            self.stderr.write(f'{algorithm:<16}{seconds * 1000:>8.1f} ms  {parameters[algorithm]}')
+            if parameters[algorithm] == {'iterations': PBKDF2PasswordHasher.iterations} and seconds > target_seconds:
+                self.stderr.write(self.style.WARNING(
+                    f'The PBKDF2 iterations are kept at the Django default ({PBKDF2PasswordHasher.iterations}), '
+                    f'which take longer than the target, consider preferring another algorithm'
+                ))
+
+        if not parameters:
+            raise CommandError('None of the algorithms could be calibrated')
+
+        hasher_classes = [HASHER_CLASSES[algorithm] for algorithm in parameters]
+        hasher_classes += [
+            HASHER_CLASSES[algorithm] for algorithm in ALGORITHMS if algorithm not in parameters
+        ] + list(LEGACY_HASHER_CLASSES)
+        self.stdout.write(f'PASSWORD_HASHERS = {pprint.pformat(hasher_classes)}')
+        self.stdout.write(f'PASSWORD_HASHER_PARAMETERS = {pprint.pformat(parameters)}')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from user_management.mail_queue import MailQueueDrainer
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends the queued (django-mailer) emails in batches, from a pool of threads reusing their connections. '
+        'Several instances can run side by side.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=4, help='Number of sending threads (and connections)')
+        parser.add_argument('--lease-seconds', type=float, default=300,
+                            help='After how long the claimed messages of a crashed instance are sent by the others')
+        parser.add_argument('--empty-queue-sleep', type=float, default=5)
+        parser.add_argument('--stats-interval', type=float, default=10)
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        drainer = MailQueueDrainer(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            lease_seconds=options['lease_seconds'],
+        )
+        stats = drainer.drain(
+            once=options['once'],
+            empty_queue_sleep=options['empty_queue_sleep'],
+            stats_interval=options['stats_interval'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {stats["sent"]}, deferred {stats["deferred"]} messages in {stats["seconds"]:.2f}s '
+            f'({stats["messages_per_second"]:.1f} messages/s)'
+        ))
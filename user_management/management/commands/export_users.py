@@ -0,0 +1,61 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from user_management.user_export import FORMATS, Watermark, encode, iter_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports the users with the status of their email confirmation, as CSV or gzipped JSON lines, '
+        'streamed in chunks so the memory does not grow with the table (see user_management.user_export). '
+        'With --watermark-file, each run only exports the users created since the previous one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help='File to write, "-" (the default) for the stdout')
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--since-id', type=int, default=None, help='Only the users with a greater id')
+        parser.add_argument('--since-date-joined', default=None,
+                            help='Only the users who joined after this ISO 8601 datetime')
+        parser.add_argument('--watermark-file', default=None,
+                            help='JSON file of the last exported id, read as --since-id and updated after the export')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        since_date_joined = None
+        if options['since_date_joined']:
+            since_date_joined = parse_datetime(options['since_date_joined'])
+            if since_date_joined is None:
+                raise CommandError(f'Invalid --since-date-joined: {options["since_date_joined"]}')
+
+        since_id = options['since_id']
+        watermark_path = Path(options['watermark_file']) if options['watermark_file'] else None
+        if since_id is None and watermark_path is not None and watermark_path.exists():
+            since_id = json.loads(watermark_path.read_text())['id']
+
+        started_at = time.perf_counter()
+        watermark = Watermark(iter_rows(since_id, since_date_joined, chunk_size=options['chunk_size']))
+        if options['output'] == '-':
+            self._write(sys.stdout.buffer, encode(watermark, options['format']))
+        else:
+            with open(options['output'], 'wb') as file:
+                self._write(file, encode(watermark, options['format']))
+
+        if watermark_path is not None and watermark.id is not None:
+            watermark_path.write_text(json.dumps({
+                'id': watermark.id, 'date_joined': watermark.date_joined.isoformat(),
+            }))
+        # To the stderr, since the stdout may be the export
+        self.stderr.write(self.style.SUCCESS(
+            f'Exported {watermark.count} users (last id {watermark.id}) in {time.perf_counter() - started_at:.2f}s'
+        ))
+
+    def _write(self, file, chunks):
+        for chunk in chunks:
+            file.write(chunk)
+        file.flush()
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ableton_challenge.openapi import generate_schema_artifact
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates the OpenAPI schema once (i.e. at build time), and writes it gzipped to OPENAPI_SCHEMA_DIR, '
+        'where the processes serve it from.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default=None, help='Defaults to OPENAPI_SCHEMA_DIR setting')
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+        artifact = generate_schema_artifact(options['directory'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote the schema of URL configuration {artifact.fingerprint} '
+            f'({len(artifact.gzipped)} bytes gzipped) in {time.perf_counter() - started_at:.2f}s'
+        ))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from user_management.user_import import FORMATS, UserImporter
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports the users of another system from a CSV or JSON lines file, with their password hashes as they are, '
+        'in chunks by bulk_create (see user_management.user_import for the columns). '
+        'An interrupted import resumes from its checkpoint file when it is run again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, default=None,
+                            help='By default, jsonl for the .jsonl/.ndjson/.json files, else csv')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--checkpoint', default=None,
+                            help='File of the rows done so far, by default <path>.checkpoint')
+        parser.add_argument('--no-checkpoint', action='store_true', help='Neither resume nor write a checkpoint')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+
+        checkpoint = None if options['no_checkpoint'] else options['checkpoint'] or f'{options["path"]}.checkpoint'
+        importer = UserImporter(
+            options['path'],
+            file_format=options['format'],
+            chunk_size=options['chunk_size'],
+            checkpoint_path=checkpoint,
+        )
+        try:
+            stats = importer.run()
+        except FileNotFoundError as error:
+            raise CommandError(str(error))
+
+        if stats['resumed_after']:
+            self.stdout.write(f'Resumed after the first {stats["resumed_after"]} rows (see {checkpoint})')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats["imported"]} of {stats["read"]} users ({stats["confirmed"]} confirmed, '
+            f'{stats["duplicates"]} duplicates and {stats["invalid"]} invalid skipped) in {stats["seconds"]:.2f}s '
+            f'({stats["rows_per_second"]:.1f} rows/s)'
+        ))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from user_management.outbox import MAX_ATTEMPTS, OutboxWorker, retry_dead
+from user_management.sharding import get_shards
+
+
+class Command(BaseCommand):
+    help = (
+        'Dispatches the outbox events (i.e. of the signups, when OUTBOX["ENABLED"]) to their handlers, in batches. '
+        'Several instances can run side by side.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--lease-seconds', type=float, default=300,
+                            help='After how long the claimed events of a crashed worker are handled by the others')
+        parser.add_argument('--empty-sleep', type=float, default=1)
+        parser.add_argument('--stats-interval', type=float, default=10)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                            help='After how many failures an event is dead (kept, but not retried anymore)')
+        parser.add_argument('--once', action='store_true', help='Exit once there is no available event')
+        parser.add_argument('--retry-dead', action='store_true', help='Make the dead events available again first')
+
+    def handle(self, *args, **options):
+        if options['retry_dead']:
+            retried = sum(retry_dead(using) for using in get_shards() or [DEFAULT_DB_ALIAS])
+            self.stdout.write(f'Made {retried} dead events available again')
+
+        worker = OutboxWorker(
+            batch_size=options['batch_size'],
+            lease_seconds=options['lease_seconds'],
+            max_attempts=options['max_attempts'],
+        )
+        stats = worker.process(
+            once=options['once'],
+            empty_sleep=options['empty_sleep'],
+            stats_interval=options['stats_interval'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Handled {stats["handled"]}, failed {stats["failed"]} ({stats["dead"]} dead) events '
+            f'in {stats["seconds"]:.2f}s ({stats["events_per_second"]:.1f} events/s)'
+        ))
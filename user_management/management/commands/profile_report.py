@@ -0,0 +1,37 @@
+import io
+import pstats
+from collections import Counter
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user_management import profiling
+
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+
+class Command(BaseCommand):
+    help = (
+        'Merges the request profiles dumped by ProfilingMiddleware (REQUEST_PROFILING setting), '
+        'and prints the hottest functions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', type=Path, help='By default REQUEST_PROFILING["DIRECTORY"]')
+        parser.add_argument('--endpoint', help='Only the profiles of the endpoints containing this, i.e. "login"')
+        parser.add_argument('--top', type=int, default=30)
+        parser.add_argument('--sort', choices=SORT_KEYS, default='cumulative')
+
+    def handle(self, *args, **options):
+        paths = profiling.profile_paths(options['directory'], options['endpoint'])
+        if not paths:
+            raise CommandError('No profiles found')
+
+        for tag, count in sorted(Counter(profiling.tag_of(path) for path in paths).items()):
+            self.stdout.write(f'{count:>6}  {tag}')
+
+        # Into a buffer, since the command's output adds a line ending to every write
+        report = io.StringIO()
+        stats = pstats.Stats(*(str(path) for path in paths), stream=report)
+        stats.strip_dirs().sort_stats(options['sort']).print_stats(options['top'])
+        self.stdout.write(report.getvalue())
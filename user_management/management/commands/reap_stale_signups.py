@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from user_management.signup_reaper import StaleSignupReaper
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes the inactive users whose email confirmation has expired (for longer than --grace-hours) '
+        'without being confirmed, in small chunks and short transactions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=7 * 24,
+                            help='How long after the expiration the users can still ask for a new confirmation')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--max-rows-per-second', type=float, default=None,
+                            help='Sleeps between the chunks to keep the deletion rate under this')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the stale signups')
+
+    def handle(self, *args, **options):
+        reaper = StaleSignupReaper(
+            expired_before=timezone.now() - timezone.timedelta(hours=options['grace_hours']),
+            chunk_size=options['chunk_size'],
+            max_rows_per_second=options['max_rows_per_second'],
+            dry_run=options['dry_run'],
+        )
+        stats = reaper.reap()
+
+        if options['dry_run']:
+            self.stdout.write(f'Found {stats["found"]} stale signups (dry run, nothing is deleted)')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Deleted {stats["deleted"]} of {stats["found"]} stale signups in {stats["seconds"]:.2f}s '
+                f'({stats["rows_per_second"]:.1f} rows/s)'
+            ))
@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from user_management.email_filter import EmailExistenceFilter
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the Bloom filter of the registered emails from the User table, and writes it to a file '
+        'which the processes load at startup (EMAIL_EXISTENCE_FILTER["PATH"] setting by default).'
+    )
+
+    def add_arguments(self, parser):
+        config = getattr(settings, 'EMAIL_EXISTENCE_FILTER', {})
+        parser.add_argument('--path', default=config.get('PATH'))
+        parser.add_argument('--capacity', type=int, default=config.get('CAPACITY', 1_000_000))
+        parser.add_argument('--error-rate', type=float, default=config.get('ERROR_RATE', 0.01))
+
+    def handle(self, *args, **options):
+        if not options['path']:
+            raise CommandError('No path is given, either pass --path or set EMAIL_EXISTENCE_FILTER["PATH"] setting.')
+
+        started_at = time.perf_counter()
+        email_filter = EmailExistenceFilter(capacity=options['capacity'], error_rate=options['error_rate'])
+        email_filter.rebuild()
+        email_filter.save(options['path'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote the filter of {email_filter.stats()["size"]} emails to {options["path"]} '
+            f'in {time.perf_counter() - started_at:.2f}s'
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from user_management.sharding import get_shards, move_misplaced_users
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves the users to their shard (USER_SHARDING["SHARDS"] setting), after the shards have changed. '
+        'With rendezvous hashing, adding a shard only moves the users which now belong to it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', action='append', dest='sources', default=[],
+                            help='Alias of another database to move the users from, '
+                                 'i.e. "default" when starting to shard, or a removed shard')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Only count the users to move')
+
+    def handle(self, *args, **options):
+        shards = get_shards()
+        if not shards:
+            raise CommandError('The users are not sharded, see USER_SHARDING["SHARDS"] setting.')
+        unknown = [alias for alias in options['sources'] if alias not in connections]
+        if unknown:
+            raise CommandError(f'Unknown databases: {", ".join(unknown)}')
+
+        sources = shards + [alias for alias in options['sources'] if alias not in shards]
+        for source in sources:
+            stats = move_misplaced_users(
+                source, shards, batch_size=options['batch_size'], dry_run=options['dry_run'],
+            )
+            if options['dry_run']:
+                self.stdout.write(f'{source}: {stats["moved"]} of {stats["scanned"]} users to move (dry run)')
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{source}: moved {stats["moved"]} of {stats["scanned"]} users'
+                ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from user_management.db_router import get_replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies the primary SQLite database to its replicas (REPLICA_ROUTER["REPLICAS"] setting), '
+        'to try the read replicas locally. Run it periodically to simulate the replication (and its lag).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--replica', action='append', dest='replicas',
+                            help='Alias of the replica, all of them by default')
+
+    def handle(self, *args, **options):
+        replicas = options['replicas'] or get_replicas()
+        if not replicas:
+            raise CommandError('No replicas are configured, see REPLICA_ROUTER["REPLICAS"] setting.')
+
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError(f'Only SQLite databases can be copied, the primary is {primary.vendor}.')
+        primary.ensure_connection()
+
+        for alias in replicas:
+            replica = connections[alias]
+            if replica.vendor != 'sqlite':
+                raise CommandError(f'Only SQLite databases can be copied, {alias} is {replica.vendor}.')
+
+            replica.ensure_connection()
+            # The backup API copies a consistent snapshot, while the primary is being written
+            primary.connection.backup(replica.connection)
+            self.stdout.write(self.style.SUCCESS(f'Copied {primary.settings_dict["NAME"]} to {alias}'))
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import BaseUserManager
 
+from user_management import sharding
 from user_management.services.email_confirmation import send_email_confirmation_email
 
 
@@ -18,7 +19,12 @@ class UserManager(BaseUserManager):
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
         user.set_password(password)
-        user.save(using=self._db)
+        using = self._db
+        if using is None and sharding.is_sharded():
+            # The ids are unique over all the shards, rather than per shard
+            user.id = sharding.allocate_user_ids()[0]
+            using = sharding.shard_for_email(email)
+        user.save(using=using)
         return user
 
     def create_user(self, email, password=None, **extra_fields):
@@ -0,0 +1,263 @@
+import cProfile
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+from rest_framework import status
+from rest_framework.throttling import BaseThrottle
+
+from user_management import db_router, idempotency, profiling
+from user_management.query_budget import QueryRecorder, get_budget, check_budget
+
+
+class SyncAndAsyncMiddleware:
+    """
+    Base of the middlewares which run in both modes: under ASGI, the requests go through their `__acall__`,
+    so the async views are served without a thread hop (as long as all the middlewares are async capable).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.call(request)
+
+    def call(self, request):
+        raise NotImplementedError
+
+    async def __acall__(self, request):
+        raise NotImplementedError
+
+
+class QueryBudgetMiddleware(SyncAndAsyncMiddleware):
+    """Records the queries of each request, and logs when they exceed the query budget of the view."""
+
+    def call(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        self._check_budget(request, recorder)
+        return response
+
+    async def __acall__(self, request):
+        # The queries run in the thread of the (thread sensitive) `sync_to_async` calls of the request,
+        # so the recorder wraps the database connections of that thread
+        recorder = QueryRecorder()
+        await sync_to_async(recorder.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.__exit__)(None, None, None)
+
+        self._check_budget(request, recorder)
+        return response
+
+    def _check_budget(self, request, recorder: QueryRecorder):
+        name, budget = getattr(request, '_query_budget', (None, None))
+        if budget is not None:
+            check_budget(name, budget, recorder)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = get_budget(view_func)
+
+
+class ReplicaPinningMiddleware(SyncAndAsyncMiddleware):
+    """Keeps the clients which have written pinned to the primary across their requests (see `db_router` module)."""
+
+    def call(self, request):
+        if not db_router.get_replicas():
+            return self.get_response(request)
+
+        cache, cache_key = self._pin_cache(request)
+        request_pinned_until = self._request_pinned_until(request, cache.get(cache_key, 0.0) if cache else 0.0)
+
+        with db_router.pin_scope(request_pinned_until):
+            response = self.get_response(request)
+            new_pinned_until = db_router.pinned_until()
+
+        seconds = self._pin_response(response, request_pinned_until, new_pinned_until)
+        if seconds and cache:
+            cache.set(cache_key, new_pinned_until, timeout=seconds)
+        return response
+
+    async def __acall__(self, request):
+        if not db_router.get_replicas():
+            return await self.get_response(request)
+
+        cache, cache_key = self._pin_cache(request)
+        request_pinned_until = self._request_pinned_until(
+            request, await cache.aget(cache_key, 0.0) if cache else 0.0,
+        )
+
+        # The pin is a context variable, so it is seen by the `sync_to_async` calls of the request as well
+        with db_router.pin_scope(request_pinned_until):
+            response = await self.get_response(request)
+            new_pinned_until = db_router.pinned_until()
+
+        seconds = self._pin_response(response, request_pinned_until, new_pinned_until)
+        if seconds and cache:
+            await cache.aset(cache_key, new_pinned_until, timeout=seconds)
+        return response
+
+    def _pin_cache(self, request) -> tuple:
+        cache_alias = getattr(settings, 'REPLICA_ROUTER', {}).get('PIN_CACHE', 'default')
+        # Identified the same way as by the throttles (by IP, behind NUM_PROXIES proxies)
+        cache_key = f'replica-router:pinned:{BaseThrottle().get_ident(request)}'
+        return (caches[cache_alias] if cache_alias else None), cache_key
+
+    def _request_pinned_until(self, request, cached_pinned_until: float) -> float:
+        try:
+            cookie_pinned_until = float(request.COOKIES.get(db_router.PIN_COOKIE_NAME, 0))
+        except ValueError:
+            cookie_pinned_until = 0.0
+        # Capped, since the cookie comes from the client
+        return min(max(cookie_pinned_until, cached_pinned_until), time.time() + db_router.stickiness_seconds())
+
+    def _pin_response(self, response, request_pinned_until: float, new_pinned_until: float) -> float:
+        """Sets the cookie of the new pin, if the request has written, and returns its seconds (0 otherwise)."""
+        if new_pinned_until <= request_pinned_until:
+            return 0.0
+        seconds = new_pinned_until - time.time()
+        response.set_cookie(db_router.PIN_COOKIE_NAME, f'{new_pinned_until:.3f}', max_age=seconds, httponly=True,
+                            samesite='Lax')
+        return seconds
+
+
+class IdempotencyMiddleware(SyncAndAsyncMiddleware):
+    """
+    Replays the stored responses of the retried requests of the idempotent views (see `idempotency` module).
+
+    Its `process_view` is synchronous (the stores block, i.e. while waiting for the first request), Django runs it
+    in a thread in async mode.
+    """
+
+    def call(self, request):
+        response = self.get_response(request)
+        self._store_response(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if getattr(request, '_idempotency_key', None) is not None:
+            await sync_to_async(self._store_response)(request, response)
+        return response
+
+    def _store_response(self, request, response):
+        key = getattr(request, '_idempotency_key', None)
+        if key is not None:
+            store = idempotency.get_idempotency_store()
+            if idempotency.is_storable(response.status_code) and not response.streaming:
+                store.set(key, idempotency.StoredResponse(
+                    fingerprint=request._idempotency_fingerprint,
+                    status_code=response.status_code,
+                    content=response.content,
+                    content_type=response.get('Content-Type', ''),
+                ), ttl=idempotency.ttl())
+            else:
+                store.delete(key)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        key = request.headers.get(idempotency.HEADER)
+        if not key or request.method != 'POST' or not idempotency.is_idempotent(view_func):
+            return None
+        if len(key) > idempotency.MAX_KEY_LENGTH:
+            return JsonResponse(
+                {'detail': f'{idempotency.HEADER} is longer than {idempotency.MAX_KEY_LENGTH} characters.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        store = idempotency.get_idempotency_store()
+        stats = idempotency.get_idempotency_stats()
+        stats.record('requests')
+        store_key = idempotency.store_key(request, key)
+        fingerprint = idempotency.fingerprint(request)
+        in_flight = idempotency.StoredResponse(fingerprint=fingerprint)
+
+        while not store.add(store_key, in_flight, ttl=idempotency.lock_ttl()):
+            entry = store.get(store_key)
+            if entry is not None and entry.fingerprint != fingerprint:
+                stats.record('mismatches')
+                return JsonResponse(
+                    {'detail': f'{idempotency.HEADER} was already used for another request.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if entry is not None and entry.in_flight:
+                stats.record('waits')
+                entry = store.wait(store_key, timeout=idempotency.wait_timeout())
+            if entry is None:
+                # Released (the first request failed) or expired meanwhile, try to take it over
+                continue
+
+            if entry.in_flight:
+                stats.record('conflicts')
+                response = JsonResponse(
+                    {'detail': 'The request with this key is still being processed.'},
+                    status=status.HTTP_409_CONFLICT,
+                )
+                response['Retry-After'] = '1'
+                return response
+
+            stats.record('replays')
+            response = HttpResponse(entry.content, status=entry.status_code, content_type=entry.content_type)
+            response[idempotency.REPLAYED_HEADER] = 'true'
+            return response
+
+        request._idempotency_key = store_key
+        request._idempotency_fingerprint = fingerprint
+        return None
+
+
+class ProfilingMiddleware(SyncAndAsyncMiddleware):
+    """
+    Profiles a sample of the requests, and the ones with the profiling header (see `profiling` module).
+
+    In async mode, the profile is the one of the event loop's thread while the request is served: it includes
+    the other requests served meanwhile, and not the code run in threads (i.e. by `sync_to_async`).
+    """
+
+    def call(self, request):
+        if not profiling.should_profile(request):
+            return self.get_response(request)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active (i.e. a nested request of the test client)
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+
+        path = profiling.dump(profile, profiling.endpoint_tag(request))
+        response['X-Profile-Id'] = path.name
+        return response
+
+    async def __acall__(self, request):
+        if not profiling.should_profile(request):
+            return await self.get_response(request)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active (i.e. the one of another request being served)
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile.disable()
+
+        path = await sync_to_async(profiling.dump)(profile, profiling.endpoint_tag(request))
+        response['X-Profile-Id'] = path.name
+        return response
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-18 09:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailer', '0006_message_retry_count'),
+        ('user_management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailQueueClaim',
+            fields=[
+                ('message', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='queue_claim', serialize=False, to='mailer.message')),
+                ('worker', models.CharField(db_index=True, max_length=128)),
+                ('claimed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
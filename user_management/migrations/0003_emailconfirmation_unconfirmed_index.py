@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 09:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_management', '0002_mail_queue_claim'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emailconfirmation',
+            index=models.Index(condition=models.Q(('confirmed_at__isnull', True)), fields=['expires_at', 'user'], name='emailconfirmation_unconfirmed'),
+        ),
+    ]
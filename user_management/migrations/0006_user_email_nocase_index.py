@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-18 10:36
+
+from django.db import migrations
+
+# The index is not in the state of the model, since its expression depends on the database:
+# - SQLite: `email__istartswith` is a LIKE, which is case-insensitive, and uses an index of the NOCASE collation
+# - PostgreSQL: `email__istartswith` is `UPPER(email) LIKE UPPER(...)`, which uses an index of `UPPER(email)`
+#   with the pattern operator class (whatever the collation of the database)
+# - MySQL: the default collations are case-insensitive already, the unique index of `email` is used
+INDEXES = {
+    'sqlite': 'CREATE INDEX IF NOT EXISTS "user_email_nocase" ON "user_management_user" ("email" COLLATE NOCASE)',
+    'postgresql': (
+        'CREATE INDEX IF NOT EXISTS "user_email_nocase" ON "user_management_user" (UPPER("email") varchar_pattern_ops)'
+    ),
+}
+
+
+def create_index(apps, schema_editor):
+    sql = INDEXES.get(schema_editor.connection.vendor)
+    if sql is not None:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS "user_email_nocase"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('user_management', '0005_user_token_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,2 +1,5 @@
 from user_management.models.user import User
 from user_management.models.email_confirmation import EmailConfirmation
+from user_management.models.mail_queue_claim import MailQueueClaim
+from user_management.models.id_block import IdBlock
+from user_management.models.outbox_event import OutboxEvent
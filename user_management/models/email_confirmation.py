@@ -6,3 +6,13 @@ class EmailConfirmation(models.Model):
     code = models.CharField(max_length=5)
     expires_at = models.DateTimeField()
     confirmed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # For finding the expired, unconfirmed ones (see `reap_stale_signups` command) without a full scan
+            models.Index(
+                fields=['expires_at', 'user'],
+                condition=models.Q(confirmed_at__isnull=True),
+                name='emailconfirmation_unconfirmed',
+            ),
+        ]
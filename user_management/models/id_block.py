@@ -0,0 +1,12 @@
+from django.db import models
+
+
+class IdBlock(models.Model):
+    """
+    The next free id of a sequence, shared by all the shards (see `sharding` module).
+
+    The processes reserve the ids in blocks, by moving `next_id` forward, so it is written once per block.
+    """
+
+    name = models.CharField(max_length=64, primary_key=True)
+    next_id = models.BigIntegerField()
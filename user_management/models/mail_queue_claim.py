@@ -0,0 +1,20 @@
+from django.db import models
+from django.utils import timezone
+
+
+class MailQueueClaim(models.Model):
+    """
+    A queued (django-mailer) message claimed by a mail queue drainer.
+
+    The primary key guarantees that each message is claimed by only one of the drainers running side by side.
+    The claims older than the lease (of crashed drainers) can be taken over by the other drainers.
+    """
+
+    message = models.OneToOneField(
+        'mailer.Message',
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='queue_claim',
+    )
+    worker = models.CharField(max_length=128, db_index=True)
+    claimed_at = models.DateTimeField(default=timezone.now, db_index=True)
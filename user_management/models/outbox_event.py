@@ -0,0 +1,28 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxEvent(models.Model):
+    """
+    A domain event, written in the same transaction as the state change it is about (see `outbox` module).
+
+    The events are claimed by the outbox workers for a lease (`claimed_by`, `claimed_until`), dispatched to their
+    handlers, and deleted once handled. The failed ones are made available again later (`available_at`), until
+    they have failed `MAX_ATTEMPTS` times, then they are dead (`dead_at`), and kept for inspection.
+    """
+
+    event_type = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    claimed_by = models.CharField(max_length=128, blank=True, default='')
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    dead_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # For finding the next batch of events in order, without a full scan
+            models.Index(fields=['available_at', 'id'], name='outboxevent_available'),
+        ]
@@ -3,6 +3,7 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 from user_management.managers.user import UserManager
+from user_management.hashing import get_hashing_executor
 
 
 class User(AbstractUser):
@@ -14,8 +15,32 @@ class User(AbstractUser):
 
     username = None
     email = models.EmailField(_('email address'), unique=True)
+    # Bumped to revoke all the signed tokens of the user, see `user_management.signed_tokens`
+    token_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
     objects = UserManager()
+
+    # The prefix search of the admin (`email__istartswith`) uses the `user_email_nocase` index, whose expression
+    # depends on the database, so it is created by migration 0006 rather than declared here
+
+    def set_password(self, raw_password):
+        """Overrides the parent method to hash the password by the configured hashing executor."""
+        self.password = get_hashing_executor().make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """
+        Overrides the parent method to check the password by the configured hashing executor.
+
+        Same as the parent method, upgrades the password hash if the hasher (or its parameters) has changed.
+        """
+        is_correct, must_update = get_hashing_executor().check_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            # Password hash upgrades shouldn't be considered password changes.
+            self._password = None
+            self.save(update_fields=['password'])
+        return is_correct
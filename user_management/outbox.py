@@ -0,0 +1,212 @@
+"""
+Transactional outbox of the domain events: the services write the events (`OutboxEvent` rows) in the same
+transaction as the state change they are about, and the outbox workers (see `process_outbox` command) dispatch
+them to their handlers later, so the side effects (i.e. the confirmation code and email of a signup) neither
+add to the latency of the requests nor get lost when the process dies after the commit.
+Configured by the `OUTBOX` setting, i.e.:
+
+    OUTBOX = {
+        'ENABLED': True,  # The services write the events, instead of doing their side effects right away
+    }
+
+The handlers are registered per event type by the `handler` decorator (see `outbox_handlers` module). The events
+are claimed in batches by a conditional UPDATE (so several workers can run side by side), for a lease, after which
+the events of a crashed worker are claimed by the others. Each event is handled (and deleted) in its own
+transaction, so the write lock of the database (i.e. SQLite's) is not held for a whole batch, and a failing event
+does not roll back the others; it is retried later, with a growing delay, and after `MAX_ATTEMPTS` failures it is
+dead: kept (with its last error) but not claimed anymore, until it is retried by `process_outbox --retry-dead`.
+
+The delivery is at least once: a handler may run again for the same event (i.e. after its lease expired),
+so the handlers should be idempotent. The events are deleted once handled.
+
+When the users are sharded, the events are written to the shard of their user, and the workers go over all the shards.
+"""
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction, DEFAULT_DB_ALIAS
+from django.db.models import Q
+from django.utils import timezone
+
+from user_management.models.outbox_event import OutboxEvent
+from user_management.query_budget import bulk_batches, record_batches
+from user_management.sharding import get_shards
+
+logger = logging.getLogger(__name__)
+
+USER_SIGNED_UP = 'UserSignedUp'
+CONFIRMATION_REQUESTED = 'ConfirmationRequested'
+EMAIL_CONFIRMED = 'EmailConfirmed'
+
+MAX_RETRY_DELAY = 3600  # Seconds
+MAX_ATTEMPTS = 10
+
+_handlers: dict[str, list[Callable[[OutboxEvent], None]]] = {}
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'OUTBOX', {}).get('ENABLED', False)
+
+
+def handler(event_type: str) -> Callable:
+    """Registers the function as a handler of the events of the type, it gets the `OutboxEvent`."""
+
+    def decorator(func):
+        _handlers.setdefault(event_type, []).append(func)
+        return func
+
+    return decorator
+
+
+def get_handlers(event_type: str) -> list[Callable[[OutboxEvent], None]]:
+    handlers = _handlers.get(event_type)
+    if handlers is None:
+        logger.warning(f'No handler of the outbox events {event_type}, they are deleted as handled')
+        return []
+    return handlers
+
+
+def retry_dead(using: Optional[str] = None) -> int:
+    """Makes the dead events available again (with their attempts reset), returns their number."""
+    return OutboxEvent.objects.using(using).filter(dead_at__isnull=False).update(
+        dead_at=None, attempts=0, available_at=timezone.now(),
+    )
+
+
+def publish(events: Iterable[tuple[str, dict]], using: Optional[str] = None) -> list[OutboxEvent]:
+    """
+    Writes the (event type, payload) events with one INSERT.
+
+    Call it in the transaction of the state change, and with the database (shard) of the user as `using`.
+    """
+    events = [OutboxEvent(event_type=event_type, payload=payload) for event_type, payload in events]
+    record_batches(bulk_batches(OutboxEvent, len(events), using=using))
+    return OutboxEvent.objects.using(using).bulk_create(events)
+
+
+async def apublish(events: Iterable[tuple[str, dict]], using: Optional[str] = None) -> list[OutboxEvent]:
+    """Async counterpart of `publish`."""
+    return await OutboxEvent.objects.using(using).abulk_create([
+        OutboxEvent(event_type=event_type, payload=payload) for event_type, payload in events
+    ])
+
+
+class OutboxWorker:
+
+    def __init__(self, batch_size: int = 100, lease_seconds: float = 300, max_attempts: int = MAX_ATTEMPTS):
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.handled = 0
+        self.failed = 0
+        self.dead = 0
+
+    def claim_batch(self, using: str) -> list[OutboxEvent]:
+        """Claims (and returns) up to `batch_size` of the available events, which are not claimed by other workers."""
+        now = timezone.now()
+        claimable = (
+            Q(available_at__lte=now, dead_at__isnull=True)
+            & (Q(claimed_until__isnull=True) | Q(claimed_until__lt=now))
+        )
+        event_ids = list(
+            OutboxEvent.objects.using(using).filter(claimable)
+            .order_by('available_at', 'id')
+            .values_list('id', flat=True)[:self.batch_size]
+        )
+        if not event_ids:
+            return []
+
+        # Compare-and-set, the events claimed by another worker meanwhile are not claimable anymore
+        claimed_until = now + timezone.timedelta(seconds=self.lease_seconds)
+        OutboxEvent.objects.using(using).filter(claimable, id__in=event_ids).update(
+            claimed_by=self.worker_id, claimed_until=claimed_until,
+        )
+        return list(
+            OutboxEvent.objects.using(using)
+            .filter(id__in=event_ids, claimed_by=self.worker_id, claimed_until=claimed_until)
+            .order_by('available_at', 'id')
+        )
+
+    def process_batch(self, using: str, events: list[OutboxEvent]) -> tuple[int, int]:
+        """Dispatches the claimed events to their handlers, returns the numbers of the handled and failed ones."""
+        handled = 0
+        failed = 0
+        for event in events:
+            try:
+                # One transaction per event, the database is not locked for the whole batch
+                with transaction.atomic(using=using):
+                    for event_handler in get_handlers(event.event_type):
+                        event_handler(event)
+                    OutboxEvent.objects.using(using).filter(id=event.id, claimed_by=self.worker_id).delete()
+            except Exception as error:
+                logger.exception(f'Could not handle the outbox event {event.id} ({event.event_type})')
+                self._record_failure(using, event, error)
+                failed += 1
+            else:
+                handled += 1
+
+        self.handled += handled
+        self.failed += failed
+        return handled, failed
+
+    def _record_failure(self, using: str, event: OutboxEvent, error: Exception):
+        """Makes the event available again later, or marks it dead once it has failed `max_attempts` times."""
+        attempts = event.attempts + 1
+        now = timezone.now()
+        if attempts >= self.max_attempts:
+            logger.error(f'Gave up the outbox event {event.id} ({event.event_type}) after {attempts} attempts')
+            self.dead += 1
+            retry = {'dead_at': now}
+        else:
+            retry = {'available_at': now + timezone.timedelta(seconds=min(2 ** event.attempts, MAX_RETRY_DELAY))}
+
+        OutboxEvent.objects.using(using).filter(id=event.id, claimed_by=self.worker_id).update(
+            attempts=attempts,
+            last_error=f'{type(error).__name__}: {error}',
+            claimed_by='',
+            claimed_until=None,
+            **retry,
+        )
+
+    def process(self, once: bool = False, empty_sleep: float = 1, stats_interval: float = 10) -> dict:
+        """
+        Processes the events batch by batch, of all the databases (shards) in turn.
+
+        If `once` is set, returns when there is no available event, otherwise waits `empty_sleep` seconds
+        and checks again.
+        """
+        databases = get_shards() or [DEFAULT_DB_ALIAS]
+        started_at = reported_at = time.perf_counter()
+        while True:
+            found = False
+            for using in databases:
+                events = self.claim_batch(using)
+                if events:
+                    found = True
+                    self.process_batch(using, events)
+
+            if not found:
+                if once:
+                    break
+                time.sleep(empty_sleep)
+
+            if time.perf_counter() - reported_at >= stats_interval:
+                reported_at = time.perf_counter()
+                logger.info('Outbox worker stats', extra=self.stats(reported_at - started_at))
+
+        return self.stats(time.perf_counter() - started_at)
+
+    def stats(self, seconds: float) -> dict:
+        return {
+            'handled': self.handled,
+            'failed': self.failed,
+            'dead': self.dead,
+            'seconds': seconds,
+            'events_per_second': (self.handled + self.failed) / seconds if seconds else 0.0,
+        }
@@ -0,0 +1,29 @@
+"""
+The handlers of the outbox events (see `outbox` module), registered when the app is ready.
+
+`UserSignedUp` and `EmailConfirmed` have no side effect in this service yet: their handlers only log them,
+they are published for the consumers to come (i.e. a welcome email, or the analytics).
+"""
+import logging
+
+from user_management import outbox
+from user_management.models.outbox_event import OutboxEvent
+from user_management.services.email_confirmation import send_email_confirmation_email
+
+logger = logging.getLogger(__name__)
+
+
+@outbox.handler(outbox.CONFIRMATION_REQUESTED)
+def send_confirmation_email(event: OutboxEvent):
+    """Generates the confirmation code of the user, and enqueues their email, on the database of the event."""
+    result = send_email_confirmation_email(event.payload['email'], event.payload['user_id'], using=event._state.db)
+    if result.is_err():
+        # i.e. the email was confirmed meanwhile, there is nothing to send
+        logger.info(f'Skipped the outbox event {event.id}: {result.err().detail}')
+
+
+@outbox.handler(outbox.USER_SIGNED_UP)
+@outbox.handler(outbox.EMAIL_CONFIRMED)
+def log_event(event: OutboxEvent):
+    """Intentionally no side effect, see the module's docstring."""
+    logger.debug(f'Handled the outbox event {event.id} ({event.event_type}): {event.payload}')
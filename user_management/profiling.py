@@ -0,0 +1,94 @@
+"""
+Sampled profiling of the requests by `cProfile`, to see where the time of the slow requests goes (password hashing,
+the ORM, DRF serialization, the mailer insert, ...) in production. Configured by the `REQUEST_PROFILING` setting, i.e.:
+
+    REQUEST_PROFILING = {
+        'SAMPLE_RATE': 0.01,  # Share of the requests to profile, 0 to only profile the requests with the header
+        'HEADER_SECRET': 'long-random-string',  # Requests with `X-Profile-Request: <secret>` are always profiled
+        'DIRECTORY': BASE_DIR / 'profiles',
+        'MAX_FILES': 500,  # The oldest profiles are deleted beyond this
+    }
+
+Each profiled request is dumped to a `.prof` file, named after its route
+(i.e. `user-management-v1-users-login.<time>.<pid>.prof`), see `middleware.ProfilingMiddleware`.
+Merge them into a report of the hottest functions by `profile_report` command.
+
+Caveat: `cProfile` only sees the thread of the request, so the time spent by the hashing executor's workers
+shows as waiting for them.
+"""
+import cProfile
+import hmac
+import os
+import random
+import re
+import time
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+
+HEADER = 'X-Profile-Request'
+SUFFIX = '.prof'
+
+
+def _config() -> dict:
+    return getattr(settings, 'REQUEST_PROFILING', {})
+
+
+def get_directory() -> Path:
+    return Path(_config().get('DIRECTORY') or Path(settings.BASE_DIR) / 'profiles')
+
+
+def should_profile(request) -> bool:
+    config = _config()
+    secret = config.get('HEADER_SECRET')
+    header = request.headers.get(HEADER)
+    if secret and header and hmac.compare_digest(header.encode(), secret.encode()):
+        return True
+    sample_rate = config.get('SAMPLE_RATE', 0)
+    return bool(sample_rate) and random.random() < sample_rate
+
+
+def endpoint_tag(request) -> str:
+    """Returns the route of the request (not its path, so the profiles of an endpoint are grouped), as a file name."""
+    match = request.resolver_match
+    route = match.route if match is not None else 'unresolved'
+    return re.sub(r'[^A-Za-z0-9_]+', '-', route).strip('-') or 'root'
+
+
+def dump(profile: cProfile.Profile, tag: str) -> Path:
+    """Writes the profile to the directory, and deletes the oldest profiles beyond `MAX_FILES`."""
+    directory = get_directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{tag}.{time.time_ns()}.{os.getpid()}{SUFFIX}'
+    profile.dump_stats(path)
+    rotate(directory, _config().get('MAX_FILES', 500))
+    return path
+
+
+def rotate(directory: Path, max_files: int):
+    paths = list(directory.glob(f'*{SUFFIX}'))
+    if len(paths) <= max_files:
+        return
+
+    def modified_at(path: Path) -> float:
+        try:
+            return path.stat().st_mtime
+        except FileNotFoundError:
+            # Deleted by another process meanwhile
+            return 0.0
+
+    for path in sorted(paths, key=modified_at)[:len(paths) - max_files]:
+        path.unlink(missing_ok=True)
+
+
+def profile_paths(directory: Optional[Path] = None, endpoint: Optional[str] = None) -> list[Path]:
+    """Returns the dumped profiles, optionally only of the endpoints whose tag contains `endpoint`."""
+    paths = sorted((directory or get_directory()).glob(f'*{SUFFIX}'))
+    if endpoint:
+        paths = [path for path in paths if endpoint in tag_of(path)]
+    return paths
+
+
+def tag_of(path: Path) -> str:
+    return path.name.split('.', 1)[0]
@@ -0,0 +1,185 @@
+"""
+SQL query budgets of the services and views.
+
+Each service declares its maximum number of queries (and total SQL time) by the `query_budget` decorator,
+each view by its `query_budget` attribute (or the `view_query_budget` decorator, for function views). The actual numbers are
+recorded at runtime, and a warning is logged whenever a budget is exceeded (see `QueryBudgetMiddleware` for views).
+In tests, `QueryBudgetTestMixin.assertWithinQueryBudget` fails instead.
+
+The budgets are the worst cases, counting every statement: the savepoints, the queued email insert
+(django-mailer) and the periodic refresh of the email filter.
+
+The services whose queries grow with their input (i.e. `signup_many`) declare a budget of one batch, and a
+`per_batch` budget of each further batch; they report their number of batches (the INSERTs of their `bulk_create`,
+see `bulk_batches`) by `record_batches`, to the budgets of the service and of the view around it.
+"""
+import contextlib
+import functools
+import logging
+import math
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from django.db import connections, router
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudget:
+
+    def __init__(self, queries: int, sql_ms: Optional[float] = None, per_batch: int = 0):
+        self.queries = queries
+        self.sql_ms = sql_ms
+        self.per_batch = per_batch
+
+    def max_queries(self, batches: int = 0) -> int:
+        return self.queries + self.per_batch * max(batches - 1, 0)
+
+    def exceeded_by(self, queries: int, sql_ms: float, batches: int = 0) -> bool:
+        return queries > self.max_queries(batches) or (self.sql_ms is not None and sql_ms > self.sql_ms)
+
+    def __repr__(self):
+        return f'QueryBudget(queries={self.queries}, sql_ms={self.sql_ms}, per_batch={self.per_batch})'
+
+
+# All the declared budgets, by the name of their service or view
+registry: dict[str, QueryBudget] = {}
+
+# The recorders entered in the current context, which the reported batches are added to
+_recorders: ContextVar[tuple] = ContextVar('query_budget_recorders', default=())
+
+
+def record_batches(batches: int):
+    """
+    Reports the batches of the running service, to the budgets of the services and views around it.
+
+    The largest number reported counts (the batches of a nested service are part of the ones of the outer one).
+    """
+    for recorder in _recorders.get():
+        recorder.batches = max(recorder.batches, batches)
+
+
+def bulk_batches(model, count: int, batch_size: Optional[int] = None, using: Optional[str] = None) -> int:
+    """Returns the number of INSERTs of `bulk_create` of `count` objects, the backend may need smaller batches."""
+    if not count:
+        return 0
+    connection = connections[using or router.db_for_write(model)]
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    max_batch_size = max(connection.ops.bulk_batch_size(fields, range(count)), 1)
+    return math.ceil(count / min(batch_size or max_batch_size, max_batch_size))
+
+
+class QueryRecorder:
+    """Counts and times the queries of all the databases, while it is entered."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.batches = 0
+        self._stack = None
+
+    @property
+    def sql_ms(self) -> float:
+        return self.sql_seconds * 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_seconds += time.perf_counter() - started_at
+
+    def __enter__(self):
+        self._stack = contextlib.ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        _recorders.set(_recorders.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        # Not reset by a token, since it might be exited in another context (see `QueryBudgetMiddleware.__acall__`)
+        _recorders.set(tuple(recorder for recorder in _recorders.get() if recorder is not self))
+        self._stack.close()
+
+
+def check_budget(name: str, budget: QueryBudget, recorder: QueryRecorder):
+    if budget.exceeded_by(recorder.queries, recorder.sql_ms, recorder.batches):
+        sql_ms_budget = f' in {budget.sql_ms}ms' if budget.sql_ms is not None else ''
+        logger.warning(
+            f'Query budget of {name} exceeded: {recorder.queries} queries in {recorder.sql_ms:.1f}ms, '
+            f'budget is {budget.max_queries(recorder.batches)} queries{sql_ms_budget}',
+            extra={'budget_name': name, 'queries': recorder.queries, 'sql_ms': recorder.sql_ms},
+        )
+
+
+def query_budget(queries: int, sql_ms: Optional[float] = None, per_batch: int = 0) -> Callable:
+    """Declares the query budget of a (sync) service or function view, and checks it on every call."""
+    budget = QueryBudget(queries, sql_ms, per_batch)
+
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+        registry[name] = budget
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with QueryRecorder() as recorder:
+                result = func(*args, **kwargs)
+            check_budget(name, budget, recorder)
+            return result
+
+        wrapper.query_budget = budget
+        return wrapper
+
+    return decorator
+
+
+def view_query_budget(queries: int, sql_ms: Optional[float] = None, per_batch: int = 0) -> Callable:
+    """
+    Declares the query budget of a function view, which is checked by `QueryBudgetMiddleware`.
+
+    Class based views declare it by their `query_budget` attribute instead.
+    """
+    budget = QueryBudget(queries, sql_ms, per_batch)
+
+    def decorator(view_func):
+        registry[f'{view_func.__module__}.{view_func.__qualname__}'] = budget
+        view_func.query_budget = budget
+        return view_func
+
+    return decorator
+
+
+def get_budget(func) -> tuple[Optional[str], Optional[QueryBudget]]:
+    """Returns the name and the budget of the service or view (function, or class based view's `as_view()`)."""
+    owner = func
+    budget = getattr(func, 'query_budget', None)
+    if budget is None:
+        owner = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+        budget = getattr(owner, 'query_budget', None)
+
+    if budget is None:
+        return None, None
+    return f'{owner.__module__}.{owner.__qualname__}', budget
+
+
+class QueryBudgetTestMixin:
+
+    @contextlib.contextmanager
+    def assertWithinQueryBudget(self, budget_owner):
+        """Fails if the queries made in the context exceed the budget of the service or view."""
+        _name, budget = get_budget(budget_owner)
+        if budget is None:
+            self.fail(f'{budget_owner} has no query budget')
+
+        with QueryRecorder() as recorder:
+            yield recorder
+
+        max_queries = budget.max_queries(recorder.batches)
+        self.assertLessEqual(
+            recorder.queries, max_queries,
+            f'{recorder.queries} queries exceed the budget of {max_queries} of {budget_owner}',
+        )
+        if budget.sql_ms is not None:
+            self.assertLessEqual(recorder.sql_ms, budget.sql_ms)
@@ -1,6 +1,11 @@
 from rest_framework import serializers
 
+from user_management import signed_tokens
 from user_management.models.user import User
+from user_management.user_export import FORMATS as EXPORT_FORMATS
+
+# Inserted by `signup_many` in batches, the cap bounds the memory and the hashing time of a request
+MAX_BULK_SIGNUP_USERS = 5000
 
 
 class SignupSerializer(serializers.Serializer):
@@ -29,6 +34,25 @@ class LoginSerializer(serializers.Serializer):
         )
 
 
+class SignedTokenLoginSerializer(LoginSerializer):
+    """The login response when `SIGNED_TOKENS["ENABLED"]`, the token is sent as `Authorization: Bearer <token>`."""
+    token = serializers.CharField(source='signed_token.key', read_only=True)
+    expires_at = serializers.IntegerField(source='signed_token.expires_at', read_only=True)
+
+    class Meta:
+        model = User
+        fields = (
+            'email',
+            'password',
+            'token',
+            'expires_at',
+        )
+
+
+def get_login_serializer_class() -> type[LoginSerializer]:
+    return SignedTokenLoginSerializer if signed_tokens.is_enabled() else LoginSerializer
+
+
 class ResendEmailConfirmationSerializer(serializers.Serializer):
     email = serializers.EmailField()
 
@@ -36,3 +60,24 @@ class ResendEmailConfirmationSerializer(serializers.Serializer):
 class ConfirmEmailSerializer(serializers.Serializer):
     email = serializers.EmailField()
     code = serializers.CharField(max_length=5)
+
+
+class ConfirmEmailLinkSerializer(serializers.Serializer):
+    token = serializers.CharField(max_length=200)
+
+
+class BulkSignupSerializer(serializers.Serializer):
+    users = SignupSerializer(many=True, allow_empty=False, max_length=MAX_BULK_SIGNUP_USERS)
+
+
+class BulkSignupResultSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+    created = serializers.BooleanField()
+    detail = serializers.CharField(required=False)
+
+
+class ExportUsersQuerySerializer(serializers.Serializer):
+    # Not `format`, which selects the renderer of DRF
+    output_format = serializers.ChoiceField(choices=EXPORT_FORMATS, default='csv')
+    since_id = serializers.IntegerField(required=False, min_value=0)
+    since_date_joined = serializers.DateTimeField(required=False)
@@ -1,17 +1,53 @@
 from random import randint
+from typing import Iterable, Optional
 
-from django.core.mail import send_mail
+from asgiref.sync import sync_to_async
+from django.core.mail import send_mail, send_mass_mail
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.db import transaction
+from mailer.models import Message
 from result import Ok, Err, Result
 from rest_framework.exceptions import APIException
 
+from user_management import confirmation_links
 from user_management.models.email_confirmation import EmailConfirmation
+from user_management.query_budget import bulk_batches, query_budget, record_batches
+from user_management.tracing import span, traced
 from ableton_challenge.errors import UnprocessableContent
 
 
-def send_email_confirmation_email(email: str, user_id: int) -> Result[EmailConfirmation, APIException]:
+def generate_code() -> str:
+    return str(randint(10000, 99999))
+
+
+def _expiration_time():
+    return timezone.now() + timezone.timedelta(hours=1)
+
+
+def _confirmation_email(email: str, email_confirmation: EmailConfirmation) -> tuple:
+    """Returns the (subject, message, from_email, recipient_list) tuple of a confirmation email."""
+    message = _('Please click here to confirm your email {}').format(email_confirmation.code)
+    if confirmation_links.is_enabled():
+        link = confirmation_links.make_link(
+            email_confirmation.user_id, email_confirmation.code, email_confirmation.expires_at,
+        )
+        message = _('Please click here to confirm your email {}\nor enter the code {}').format(
+            link, email_confirmation.code,
+        )
+    return (
+        _('Email Confirmation'),
+        message,
+        "from@example.com",
+        [email],
+    )
+
+
+@traced()
+@query_budget(queries=5)
+def send_email_confirmation_email(
+    email: str, user_id: int, using: Optional[str] = None,
+) -> Result[EmailConfirmation, APIException]:
     """
     Sends an email confirmation email to the specified user.
 
@@ -23,15 +59,17 @@ def send_email_confirmation_email(email: str, user_id: int) -> Result[EmailConfi
 
         If the user's email is already confirmed, returns an error indicating that the email is already confirmed.
 
+    `using` is the database (shard) of the user, by default the routed one.
+
     Caveat: This function always assume that the user exists.
     """
-    code = str(randint(10000, 99999))
-    expires_at = timezone.now() + timezone.timedelta(hours=1)
-    with transaction.atomic():
+    code = generate_code()
+    expires_at = _expiration_time()
+    with transaction.atomic(using=using):
         try:
-            email_confirmation = EmailConfirmation.objects.select_for_update().get(user__email=email)
+            email_confirmation = EmailConfirmation.objects.using(using).select_for_update().get(user__email=email)
         except EmailConfirmation.DoesNotExist:
-            email_confirmation = EmailConfirmation.objects.create(
+            email_confirmation = EmailConfirmation.objects.using(using).create(
                 code=code,
                 user_id=user_id,
                 expires_at=expires_at,
@@ -44,12 +82,86 @@ def send_email_confirmation_email(email: str, user_id: int) -> Result[EmailConfi
             email_confirmation.expires_at = expires_at
             email_confirmation.save(update_fields=('code', 'expires_at'))
 
-        send_mail(
-            _('Email Confirmation'),
-            _('Please click here to confirm your email {}').format(email_confirmation.code),
-            "from@example.com",
-            [email],
-            fail_silently=False,
-        )
+        with span('mail.enqueue'):
+            send_mail(
+                *_confirmation_email(email, email_confirmation),
+                fail_silently=False,
+            )
 
         return Ok(email_confirmation)
+
+
+async def asend_email_confirmation_email(
+    email: str, user_id: int, using: Optional[str] = None,
+) -> Result[EmailConfirmation, APIException]:
+    """
+    Async counterpart of `send_email_confirmation_email`.
+
+    Django does not support transactions in async code yet, so instead of locking the EmailConfirmation
+    object, it is updated with a conditional UPDATE (only if it is not confirmed yet), which is atomic by itself.
+    Only the email enqueue runs in a thread, since the email backends are synchronous.
+
+    Caveat: This function always assume that the user exists.
+    """
+    code = generate_code()
+    expires_at = _expiration_time()
+    updated = await EmailConfirmation.objects.using(using).filter(
+        user_id=user_id,
+        confirmed_at__isnull=True,
+    ).aupdate(code=code, expires_at=expires_at)
+
+    if updated:
+        email_confirmation = EmailConfirmation(user_id=user_id, code=code, expires_at=expires_at)
+    elif await EmailConfirmation.objects.using(using).filter(user_id=user_id).aexists():
+        return Err(UnprocessableContent(detail=_('Email is already confirmed for this user')))
+    else:
+        email_confirmation = await EmailConfirmation.objects.using(using).acreate(
+            code=code,
+            user_id=user_id,
+            expires_at=expires_at,
+        )
+
+    await sync_to_async(send_mail)(
+        *_confirmation_email(email, email_confirmation),
+        fail_silently=False,
+    )
+
+    return Ok(email_confirmation)
+
+
+# Plus the INSERTs of the confirmations and of the queued emails, of each further batch
+@query_budget(queries=4, per_batch=2)
+def send_email_confirmation_emails(
+    users: Iterable, batch_size: int = 500, using: Optional[str] = None,
+) -> list[EmailConfirmation]:
+    """
+    Sends email confirmation emails to many newly created users at once.
+
+    Unlike `send_email_confirmation_email`, it does not look up existing EmailConfirmation objects,
+    it inserts all of them with one `bulk_create` and enqueues all the emails in a single batch.
+
+    `using` is the database (shard) of the users, by default the routed one.
+
+    Caveat: This function always assume that the users exist and have no EmailConfirmation yet.
+    """
+    expires_at = _expiration_time()
+    email_confirmations = [
+        EmailConfirmation(user=user, code=generate_code(), expires_at=expires_at)
+        for user in users
+    ]
+    record_batches(max(
+        bulk_batches(EmailConfirmation, len(email_confirmations), batch_size, using),
+        bulk_batches(Message, len(email_confirmations)),
+    ))
+    with transaction.atomic(using=using):
+        EmailConfirmation.objects.using(using).bulk_create(email_confirmations, batch_size=batch_size)
+        with span('mail.enqueue', count=len(email_confirmations)):
+            send_mass_mail(
+                [
+                    _confirmation_email(email_confirmation.user.email, email_confirmation)
+                    for email_confirmation in email_confirmations
+                ],
+                fail_silently=False,
+            )
+
+    return email_confirmations
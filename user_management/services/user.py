@@ -1,36 +1,176 @@
-from typing import Optional
+from datetime import datetime
+from typing import Iterable, Optional
 
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from django.db import transaction
+from django.db import transaction, IntegrityError
 from rest_framework.exceptions import APIException, AuthenticationFailed
 from rest_framework.authtoken.models import Token
 from result import Ok, Result, Err
 
 from ableton_challenge.errors import UnprocessableContent
+from user_management import confirmation_links, email_filter, outbox, signed_tokens
+from user_management.sharding import allocate_user_ids, get_shards, is_sharded, shard_for_email
+from user_management.tracing import traced
+from user_management.hashing import get_hashing_executor
 from user_management.models.user import User
 from user_management.models.email_confirmation import EmailConfirmation
-from user_management.services.email_confirmation import send_email_confirmation_email
+from user_management.query_budget import bulk_batches, query_budget, record_batches
+from user_management.services.email_confirmation import send_email_confirmation_email, send_email_confirmation_emails
+from user_management.services.email_confirmation import asend_email_confirmation_email
 
 
+def _user_payload(user: User) -> dict:
+    return {'user_id': user.id, 'email': user.email}
+
+
+def _has_confirmed_email(user_id: int, using: Optional[str]) -> bool:
+    return EmailConfirmation.objects.using(using).filter(user_id=user_id, confirmed_at__isnull=False).exists()
+
+
+@traced()
+@query_budget(queries=10)
 def signup(email: str, password: str) -> Result[User, APIException]:
-    if User.objects.filter(email=email).exists():
-        return Err(UnprocessableContent(detail=_('User with this email already exists')))
-    user = User.objects.create_user(
-        email=email,
-        password=password
-    )
+    """
+    Signs up the user, and sends their email confirmation email.
+
+    When `OUTBOX["ENABLED"]`, the email is sent by the outbox workers instead: the user and their `UserSignedUp`
+    and `ConfirmationRequested` events are written in one transaction (see `user_management.outbox`).
+    """
+    user_exists_error = Err(UnprocessableContent(detail=_('User with this email already exists')))
+
+    db = shard_for_email(email)
+    if email_filter.might_exist(email):
+        if User.objects.using(db).filter(email=email).exists():
+            return user_exists_error
+        email_filter.record_false_positive()
 
-    send_email_confirmation_email(user.email, user.id)
+    try:
+        with transaction.atomic(using=db):
+            user = User.objects.create_user(
+                email=email,
+                password=password
+            )
+            if outbox.is_enabled():
+                outbox.publish([
+                    (outbox.USER_SIGNED_UP, _user_payload(user)),
+                    (outbox.CONFIRMATION_REQUESTED, _user_payload(user)),
+                ], using=db)
+    except IntegrityError:
+        # The user was created concurrently, (or by another process, which the email filter does not know yet)
+        return user_exists_error
+
+    if not outbox.is_enabled():
+        send_email_confirmation_email(user.email, user.id, using=db)
     return Ok(user)
 
 
+# Plus the INSERTs of the users, of their confirmations (or events) and of the queued emails, of each further batch
+@query_budget(queries=8, per_batch=3)
+def signup_many(credentials: Iterable[tuple[str, str]], batch_size: int = 500) -> list[Result[User, APIException]]:
+    """
+    Signs up many users at once.
+
+    Checks for already existing emails with one query, hashes the passwords in parallel (see
+    `ProcessPoolHashingExecutor.make_passwords`), inserts the users and their EmailConfirmation objects
+    with `bulk_create` and enqueues all the confirmation emails in a single batch.
+
+    Returns one result per given (email, password) pair, in the same order.
+
+    When the users are sharded, the queries above are made per shard (of the given emails).
+
+    When `OUTBOX["ENABLED"]`, the events of the users are inserted instead of their EmailConfirmation objects
+    and emails, see `signup`.
+    """
+    credentials = [(User.objects.normalize_email(email), password) for email, password in credentials]
+    emails_by_db = {}
+    for email, _password in credentials:
+        emails_by_db.setdefault(shard_for_email(email), set()).add(email)
+
+    existing_emails = set()
+    for db, emails in emails_by_db.items():
+        existing_emails.update(User.objects.using(db).filter(email__in=emails).values_list('email', flat=True))
+
+    results = []
+    new_users = []
+    new_passwords = []
+    for email, password in credentials:
+        if email in existing_emails:
+            results.append(Err(UnprocessableContent(detail=_('User with this email already exists'))))
+            continue
+
+        existing_emails.add(email)
+        user = User(email=email, is_staff=False, is_superuser=False, is_active=False)
+        new_users.append(user)
+        new_passwords.append(password)
+        results.append(Ok(user))
+
+    # Hashed in parallel by the hashing executor, rather than one after the other by `set_password`
+    for user, encoded in zip(new_users, get_hashing_executor().make_passwords(new_passwords)):
+        user.password = encoded
+
+    if is_sharded():
+        for user, user_id in zip(new_users, allocate_user_ids(len(new_users))):
+            user.id = user_id
+
+    new_users_by_db = {}
+    for user in new_users:
+        new_users_by_db.setdefault(shard_for_email(user.email), []).append(user)
+
+    record_batches(sum(bulk_batches(User, len(users), batch_size, db) for users in new_users_by_db.values()))
+    for db, users in new_users_by_db.items():
+        while users:
+            try:
+                _create_users(users, batch_size, db)
+            except IntegrityError:
+                # Some of the users were created concurrently, they are left out and the others inserted again
+                created_emails = set(
+                    User.objects.using(db).filter(email__in=[user.email for user in users])
+                    .values_list('email', flat=True)
+                )
+                if not created_emails:
+                    raise
+                for index, result in enumerate(results):
+                    if result.is_ok() and result.value.email in created_emails:
+                        results[index] = Err(UnprocessableContent(detail=_('User with this email already exists')))
+                users = [user for user in users if user.email not in created_emails]
+            else:
+                break
+
+    return results
+
+
+def _create_users(users: list[User], batch_size: int, using: str):
+    with transaction.atomic(using=using):
+        User.objects.using(using).bulk_create(users, batch_size=batch_size)
+        if outbox.is_enabled():
+            outbox.publish(
+                [(outbox.USER_SIGNED_UP, _user_payload(user)) for user in users]
+                + [(outbox.CONFIRMATION_REQUESTED, _user_payload(user)) for user in users],
+                using=using,
+            )
+        else:
+            send_email_confirmation_emails(users, batch_size=batch_size, using=using)
+
+
+@traced()
+@query_budget(queries=6)
 def login(email: str, password: str) -> Result[User, APIException]:
+    """
+    Logs the user in, and gives it an `authtoken` token, or (when `SIGNED_TOKENS["ENABLED"]`) a signed token
+    as `user.signed_token`, which needs no query.
+    """
     bad_credentials_error = Err(AuthenticationFailed(detail=_('Unable to log in with provided credentials.')))
 
+    if not email_filter.might_exist(email):
+        return bad_credentials_error
+
+    db = shard_for_email(email)
     try:
-        user = User.objects.select_related('emailconfirmation').get(email=email)
+        user = User.objects.using(db).select_related('emailconfirmation').get(email=email)
     except User.DoesNotExist:
+        email_filter.record_false_positive()
         return bad_credentials_error
     else:
         if not user.check_password(password):
@@ -39,48 +179,289 @@ def login(email: str, password: str) -> Result[User, APIException]:
             user_deactivated_error = Err(
                 UnprocessableContent(detail=_('User is not active.')))
 
-            if not user.emailconfirmation.confirmed_at:
+            # No EmailConfirmation yet, when the outbox workers have not handled the signup yet
+            email_confirmation = getattr(user, 'emailconfirmation', None)
+            if email_confirmation is None or not email_confirmation.confirmed_at:
                 user_deactivated_error = Err(
                     UnprocessableContent(
                         detail=_('User is not active. please make sure that you have confirmed you email'))
                 )
 
             return user_deactivated_error
+        elif signed_tokens.is_enabled():
+            user.signed_token = signed_tokens.issue_token(user)
+            return Ok(user)
         else:
-            Token.objects.get_or_create(user=user)
+            Token.objects.using(db).get_or_create(user=user)
             return Ok(user)
 
 
+@traced()
+@query_budget(queries=7)
 def resend_email_confirmation(email: str) -> Result[Optional[EmailConfirmation], APIException]:
+    if not email_filter.might_exist(email):
+        return Ok(None)
+
+    db = shard_for_email(email)
     try:
-        user = User.objects.get(email=email)
+        user = User.objects.using(db).get(email=email)
     except User.DoesNotExist:
+        email_filter.record_false_positive()
         return Ok(None)
-    else:
-        return send_email_confirmation_email(email, user.id)
+
+    if outbox.is_enabled():
+        if _has_confirmed_email(user.id, using=db):
+            return Err(UnprocessableContent(detail=_('Email is already confirmed for this user')))
+        outbox.publish([(outbox.CONFIRMATION_REQUESTED, _user_payload(user))], using=db)
+        return Ok(None)
+    return send_email_confirmation_email(email, user.id, using=db)
 
 
+@traced()
+@query_budget(queries=6)
 def confirm_email(email: str, code: str) -> Result[User, APIException]:
-    with transaction.atomic():
-        try:
-            user = User.objects.select_related().get(email=email)
-        except User.DoesNotExist:
-            # Maybe it is a good idea to add some logs later, to trace non-existing emails
-            return Err(UnprocessableContent(detail=_('Could not confirm email')))
-        else:
-            try:
-                email_confirmation = EmailConfirmation.objects.select_for_update().get(
-                    user__email=email,
-                    code=code,
+    """
+    Confirms the email with a conditional UPDATE (only if the code matches, it is not confirmed yet and not expired),
+    which is a compare-and-set: only one of the concurrent confirmations can win it, without locking the
+    EmailConfirmation row beforehand. The winner then activates the user in the same (short) transaction.
+
+    The failures are told apart only when the UPDATE misses, which keeps the happy path to 3 statements.
+    """
+    db = shard_for_email(email)
+    try:
+        user = User.objects.using(db).get(email=email)
+    except User.DoesNotExist:
+        # Maybe it is a good idea to add some logs later, to trace non-existing emails
+        return Err(UnprocessableContent(detail=_('Could not confirm email')))
+
+    if _confirm_and_activate(user, code, timezone.now(), using=db):
+        return Ok(user)
+
+    if EmailConfirmation.objects.using(db).filter(user_id=user.id, code=code, confirmed_at__isnull=False).exists():
+        return Err(UnprocessableContent(detail=_('Email already confirmed')))
+    return Err(UnprocessableContent(detail=_('Could not confirm email')))
+
+
+def _confirm_and_activate(user: User, code: str, now: datetime, using: Optional[str]) -> bool:
+    """Confirms the EmailConfirmation of the user by the code, and activates the user in the same transaction."""
+    with transaction.atomic(using=using):
+        confirmed = EmailConfirmation.objects.using(using).filter(
+            user_id=user.id,
+            code=code,
+            confirmed_at__isnull=True,
+            expires_at__gt=now,
+        ).update(confirmed_at=now)
+
+        if not confirmed:
+            return False
+        user.is_active = True
+        user.save(using=using, update_fields=('is_active',))
+        if outbox.is_enabled():
+            outbox.publish([(outbox.EMAIL_CONFIRMED, _user_payload(user))], using=using)
+        return True
+
+
+@traced()
+@query_budget(queries=4)
+def confirm_email_link(token: str) -> Result[int, APIException]:
+    """
+    Confirms the email by the token of a confirmation link (see `user_management.confirmation_links`), returns the
+    id of the user.
+
+    The token is checked without any query, then a conditional UPDATE of the EmailConfirmation (only if the nonce
+    still matches and it is not confirmed yet) decides the winner of the concurrent confirmations, which activates
+    the user by another UPDATE, in the same transaction. Nothing is read (or locked) beforehand.
+
+    The token has no email to find the shard by, so when the users are sharded, the UPDATE is tried on each shard
+    (the user ids are unique over all of them).
+    """
+    confirmation_token = confirmation_links.parse_token(token)
+    if confirmation_token is None:
+        return Err(UnprocessableContent(detail=_('Could not confirm email')))
+
+    user_id = confirmation_token.user_id
+    dbs = get_shards() or [None]
+    now = timezone.now()
+    for db in dbs:
+        if _confirm_link_and_activate(user_id, confirmation_token.nonce, now, using=db):
+            return Ok(user_id)
+
+    for db in dbs:
+        if EmailConfirmation.objects.using(db).filter(
+            user_id=user_id, code=confirmation_token.nonce, confirmed_at__isnull=False,
+        ).exists():
+            return Err(UnprocessableContent(detail=_('Email already confirmed')))
+    return Err(UnprocessableContent(detail=_('Could not confirm email')))
+
+
+def _confirm_link_and_activate(user_id: int, nonce: str, now: datetime, using: Optional[str]) -> bool:
+    """Confirms the EmailConfirmation of the user by the nonce of a link, and activates the user in one transaction."""
+    with transaction.atomic(using=using):
+        confirmed = EmailConfirmation.objects.using(using).filter(
+            user_id=user_id,
+            code=nonce,
+            confirmed_at__isnull=True,
+        ).update(confirmed_at=now)
+
+        if not confirmed:
+            return False
+        # No post_save signal, there are no (cached) tokens to invalidate, since an inactive user can not log in
+        User.objects.using(using).filter(pk=user_id).update(is_active=True)
+        if outbox.is_enabled():
+            outbox.publish([(outbox.EMAIL_CONFIRMED, {'user_id': user_id})], using=using)
+        return True
+
+
+# Async counterparts of the services above, to be used by the async views (served by ASGI).
+# Password hashing is CPU-bound, so waiting for the hashing executor runs in a worker thread,
+# instead of blocking the event loop.
+
+
+async def _ahash_password(raw_password: str) -> str:
+    return await sync_to_async(get_hashing_executor().make_password, thread_sensitive=False)(raw_password)
+
+
+async def _acheck_password(raw_password: str, encoded: str) -> tuple[bool, bool]:
+    return await sync_to_async(get_hashing_executor().check_password, thread_sensitive=False)(raw_password, encoded)
+
+
+def _save_with_events(user: User, using: Optional[str]):
+    with transaction.atomic(using=using):
+        user.save(using=using)
+        outbox.publish([
+            (outbox.USER_SIGNED_UP, _user_payload(user)),
+            (outbox.CONFIRMATION_REQUESTED, _user_payload(user)),
+        ], using=using)
+
+
+async def asignup(email: str, password: str) -> Result[User, APIException]:
+    """Async counterpart of `signup`, without the email filter (its refresh is a synchronous query)."""
+    user_exists_error = Err(UnprocessableContent(detail=_('User with this email already exists')))
+
+    email = User.objects.normalize_email(email)
+    db = shard_for_email(email)
+    if await User.objects.using(db).filter(email=email).aexists():
+        return user_exists_error
+
+    user = User(
+        email=email,
+        password=await _ahash_password(password),
+        is_staff=False,
+        is_superuser=False,
+        is_active=False,
+    )
+    if is_sharded():
+        user.id = (await sync_to_async(allocate_user_ids)())[0]
+    try:
+        if outbox.is_enabled():
+            # Transactions are not supported in async code yet, the user and its events are written in a thread
+            await sync_to_async(_save_with_events)(user, db)
+            return Ok(user)
+        await user.asave(using=db)
+    except IntegrityError:
+        # The user was created concurrently
+        return user_exists_error
+
+    await asend_email_confirmation_email(user.email, user.id, using=db)
+    return Ok(user)
+
+
+async def alogin(email: str, password: str) -> Result[User, APIException]:
+    bad_credentials_error = Err(AuthenticationFailed(detail=_('Unable to log in with provided credentials.')))
+
+    db = shard_for_email(email)
+    try:
+        user = await User.objects.using(db).select_related('emailconfirmation').aget(email=email)
+    except User.DoesNotExist:
+        return bad_credentials_error
+    else:
+        is_correct, password_needs_upgrade = await _acheck_password(password, user.password)
+        if not is_correct:
+            return bad_credentials_error
+        elif not user.is_active:
+            user_deactivated_error = Err(
+                UnprocessableContent(detail=_('User is not active.')))
+
+            # No EmailConfirmation yet, when the outbox workers have not handled the signup yet
+            email_confirmation = getattr(user, 'emailconfirmation', None)
+            if email_confirmation is None or not email_confirmation.confirmed_at:
+                user_deactivated_error = Err(
+                    UnprocessableContent(
+                        detail=_('User is not active. please make sure that you have confirmed you email'))
                 )
-            except EmailConfirmation.DoesNotExist:
-                return Err(UnprocessableContent(detail=_('Could not confirm email')))
+
+            return user_deactivated_error
+        else:
+            if password_needs_upgrade:
+                user.password = await _ahash_password(password)
+                await user.asave(update_fields=('password',))
+
+            if signed_tokens.is_enabled():
+                user.signed_token = signed_tokens.issue_token(user)
             else:
-                if email_confirmation.confirmed_at:
-                    return Err(UnprocessableContent(detail=_('Email already confirmed')))
-
-                email_confirmation.confirmed_at = timezone.now()
-                email_confirmation.save(update_fields=('confirmed_at',))
-                user.is_active = True
-                user.save(update_fields=('is_active',))
-                return Ok(user)
+                # Cache the token on the user, so it can be serialized without a (synchronous) query
+                user.auth_token, _created = await Token.objects.using(db).aget_or_create(user=user)
+            return Ok(user)
+
+
+async def aresend_email_confirmation(email: str) -> Result[Optional[EmailConfirmation], APIException]:
+    db = shard_for_email(email)
+    user_id = await User.objects.using(db).filter(email=email).values_list('id', flat=True).afirst()
+    if user_id is None:
+        return Ok(None)
+
+    if outbox.is_enabled():
+        if await sync_to_async(_has_confirmed_email)(user_id, using=db):
+            return Err(UnprocessableContent(detail=_('Email is already confirmed for this user')))
+        await outbox.apublish([(outbox.CONFIRMATION_REQUESTED, {'user_id': user_id, 'email': email})], using=db)
+        return Ok(None)
+    return await asend_email_confirmation_email(email, user_id, using=db)
+
+
+async def aconfirm_email(email: str, code: str) -> Result[User, APIException]:
+    """
+    Async counterpart of `confirm_email`.
+
+    Django does not support transactions in async code yet, so the EmailConfirmation object is confirmed and
+    the user activated (in one transaction) in a thread.
+    """
+    db = shard_for_email(email)
+    try:
+        user = await User.objects.using(db).aget(email=email)
+    except User.DoesNotExist:
+        # Maybe it is a good idea to add some logs later, to trace non-existing emails
+        return Err(UnprocessableContent(detail=_('Could not confirm email')))
+
+    if await sync_to_async(_confirm_and_activate)(user, code, timezone.now(), using=db):
+        return Ok(user)
+
+    if await EmailConfirmation.objects.using(db).filter(
+        user_id=user.id, code=code, confirmed_at__isnull=False,
+    ).aexists():
+        return Err(UnprocessableContent(detail=_('Email already confirmed')))
+    return Err(UnprocessableContent(detail=_('Could not confirm email')))
+
+
+async def aconfirm_email_link(token: str) -> Result[int, APIException]:
+    """
+    Async counterpart of `confirm_email_link`.
+
+    Same as `aconfirm_email`, the EmailConfirmation object is confirmed and the user activated in a thread.
+    """
+    confirmation_token = confirmation_links.parse_token(token)
+    if confirmation_token is None:
+        return Err(UnprocessableContent(detail=_('Could not confirm email')))
+
+    user_id = confirmation_token.user_id
+    dbs = get_shards() or [None]
+    now = timezone.now()
+    for db in dbs:
+        if await sync_to_async(_confirm_link_and_activate)(user_id, confirmation_token.nonce, now, using=db):
+            return Ok(user_id)
+
+    for db in dbs:
+        if await EmailConfirmation.objects.using(db).filter(
+            user_id=user_id, code=confirmation_token.nonce, confirmed_at__isnull=False,
+        ).aexists():
+            return Err(UnprocessableContent(detail=_('Email already confirmed')))
+    return Err(UnprocessableContent(detail=_('Could not confirm email')))
@@ -0,0 +1,208 @@
+"""
+Optional horizontal sharding of the users: each `User`, with its `EmailConfirmation` and `Token`, lives on one of
+the configured databases (shards), chosen by the hash of its normalized email, which is the lookup key of the
+services. Configured by the `USER_SHARDING` setting, i.e.:
+
+    USER_SHARDING = {
+        'SHARDS': ['users_0', 'users_1'],  # Aliases of DATABASES, empty (the default) to not shard
+        'ID_BLOCK_SIZE': 100,  # How many user ids each process reserves at once
+    }
+
+The shard is chosen by rendezvous (highest random weight) hashing, so adding a shard only moves the users which
+now belong to it (1/N of them), see `reshard_users` command. The user ids are unique over all the shards, they are
+reserved in blocks from the `IdBlock` table of the default database, rather than by each shard's own sequence.
+
+The services pick the shard by `shard_for_email` and query it explicitly (by `using`), while `ShardRouter` keeps
+the queries of the already loaded objects (i.e. `user.emailconfirmation`, `user.save()`) on the shard they came from.
+
+The batch jobs (`reap_stale_signups`, `export_users` and `import_users`) go over all the shards.
+
+Caveats:
+    - The email existence filter is disabled when sharding, since its refresh relies on increasing ids.
+    - The users being moved by `reshard_users` can not be found until they arrive at their new shard.
+    - The admin only lists the users of the default database, and tells so on its changelists.
+"""
+import hashlib
+import threading
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction, DEFAULT_DB_ALIAS
+from django.db.models import F, Max
+from django.dispatch import receiver
+
+SHARDED_MODELS = (
+    'user_management.user', 'user_management.emailconfirmation', 'authtoken.token', 'user_management.outboxevent',
+)
+
+
+def _config() -> dict:
+    return getattr(settings, 'USER_SHARDING', {})
+
+
+def get_shards() -> list[str]:
+    return _config().get('SHARDS', [])
+
+
+def is_sharded() -> bool:
+    return bool(get_shards())
+
+
+def _weight(shard: str, email: str) -> int:
+    return int.from_bytes(hashlib.blake2b(f'{shard}:{email}'.encode(), digest_size=8).digest(), 'big')
+
+
+def choose_shard(email: str, shards: Iterable[str]) -> str:
+    """Returns the shard of the (normalized) email, among the given ones."""
+    return max(shards, key=lambda shard: _weight(shard, email))
+
+
+def shard_for_email(email: str) -> Optional[str]:
+    """
+    Returns the alias of the database of the user with the email,
+    or None when the users are not sharded, so that the queries are routed as usual.
+    """
+    shards = get_shards()
+    if not shards:
+        return None
+
+    from user_management.models.user import User
+    return choose_shard(User.objects.normalize_email(email), shards)
+
+
+class IdAllocator:
+    """Hands out ids which are unique over all the shards, reserving them in blocks from the `IdBlock` table."""
+
+    def __init__(self, name: str, block_size: int = 100):
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next_id = self._stop_id = 0
+
+    def allocate(self, count: int = 1) -> list[int]:
+        ids = []
+        with self._lock:
+            while len(ids) < count:
+                if self._next_id >= self._stop_id:
+                    self._reserve(max(self.block_size, count - len(ids)))
+                taken = min(count - len(ids), self._stop_id - self._next_id)
+                ids.extend(range(self._next_id, self._next_id + taken))
+                self._next_id += taken
+        return ids
+
+    def _reserve(self, size: int):
+        from user_management.models.id_block import IdBlock
+        from user_management.models.user import User
+
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            block = IdBlock.objects.using(DEFAULT_DB_ALIAS).select_for_update().filter(name=self.name).first()
+            if block is None:
+                # The first block starts after the existing users (i.e. when sharding an existing database)
+                existing_ids = [
+                    User.objects.using(alias).aggregate(max_id=Max('id'))['max_id'] or 0
+                    for alias in {DEFAULT_DB_ALIAS, *get_shards()}
+                ]
+                block = IdBlock.objects.using(DEFAULT_DB_ALIAS).create(name=self.name, next_id=max(existing_ids) + 1)
+            IdBlock.objects.using(DEFAULT_DB_ALIAS).filter(name=self.name).update(next_id=F('next_id') + size)
+
+        self._next_id, self._stop_id = block.next_id, block.next_id + size
+
+
+_user_id_allocator = None
+_user_id_allocator_lock = threading.Lock()
+
+
+def allocate_user_ids(count: int = 1) -> list[int]:
+    """Returns `count` new user ids, from the (per process) allocator."""
+    global _user_id_allocator
+    if _user_id_allocator is None:
+        with _user_id_allocator_lock:
+            if _user_id_allocator is None:
+                _user_id_allocator = IdAllocator('user', block_size=_config().get('ID_BLOCK_SIZE', 100))
+    return _user_id_allocator.allocate(count)
+
+
+@receiver(setting_changed)
+def reset_user_id_allocator(setting, **kwargs):
+    global _user_id_allocator
+    if setting in ('USER_SHARDING', 'DATABASES'):
+        _user_id_allocator = None
+
+
+class ShardRouter:
+    """Keeps the queries of the objects loaded from a shard (and of their related objects) on that shard."""
+
+    def _db_of_instance(self, model, hints) -> Optional[str]:
+        if not is_sharded() or model._meta.label_lower not in SHARDED_MODELS:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_of_instance(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_of_instance(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not is_sharded():
+            return None
+        if obj1._meta.label_lower in SHARDED_MODELS and obj2._meta.label_lower in SHARDED_MODELS:
+            return obj1._state.db == obj2._state.db
+        return None
+
+
+def move_misplaced_users(source: str, shards: list[str], batch_size: int = 500, dry_run: bool = False) -> dict:
+    """
+    Moves the users of the `source` database which belong to another of the `shards` (i.e. after adding a shard),
+    with their email confirmations, tokens, groups and permissions, in batches of short transactions.
+
+    Each batch is copied to its new shard first, and only then deleted from the source, so that an interrupted
+    run leaves no user behind, and can simply be run again. Returns the numbers of the scanned and moved users.
+    """
+    from rest_framework.authtoken.models import Token
+    from user_management.models.email_confirmation import EmailConfirmation
+    from user_management.models.user import User
+
+    scanned = moved = 0
+    last_id = 0
+    while True:
+        users = list(User.objects.using(source).filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not users:
+            break
+        scanned += len(users)
+        last_id = users[-1].id
+
+        users_by_shard = {}
+        for user in users:
+            shard = choose_shard(user.email, shards)
+            if shard != source:
+                users_by_shard.setdefault(shard, []).append(user)
+
+        for shard, shard_users in users_by_shard.items():
+            moved += len(shard_users)
+            if dry_run:
+                continue
+
+            ids = [user.id for user in shard_users]
+            related = [
+                (model, list(model.objects.using(source).filter(**{f'{field}__in': ids})))
+                for model, field in (
+                    (EmailConfirmation, 'user_id'),
+                    (Token, 'user_id'),
+                    (User.groups.through, 'user_id'),
+                    (User.user_permissions.through, 'user_id'),
+                )
+            ]
+            # Ignores the conflicts, in case a previous (interrupted) run has already copied them
+            with transaction.atomic(using=shard):
+                User.objects.using(shard).bulk_create(shard_users, ignore_conflicts=True)
+                for model, objects in related:
+                    model.objects.using(shard).bulk_create(objects, ignore_conflicts=True)
+            with transaction.atomic(using=source):
+                User.objects.using(source).filter(id__in=ids).delete()
+
+    return {'scanned': scanned, 'moved': moved}
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user_management import signed_tokens
+from user_management.authentication import get_token_cache
+from user_management.email_filter import get_email_filter
+from user_management.models.user import User
+
+
+@receiver((post_save, post_delete), sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    get_token_cache().invalidate_token(instance.key, instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+    # i.e. when the user gets deactivated, or their password changes
+    get_token_cache().invalidate_user(instance.pk)
+    signed_tokens.invalidate_user_state(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def add_to_email_filter(sender, instance, **kwargs):
+    # Deleted users can not be removed from the (Bloom) filter, they only cost a query until it is rebuilt
+    email_filter = get_email_filter(build=False)
+    if email_filter is not None:
+        email_filter.add(instance.email)
@@ -0,0 +1,105 @@
+"""
+Stateless access tokens, signed (HMAC-SHA256) rather than stored: `<user id>:<revocation counter>:<expiry>:<signature>`.
+
+Unlike the `authtoken` tokens, logging in writes nothing, and authenticating a request needs no query of the
+token and user tables. Revoking all the tokens of a user bumps their `User.token_version`, which is checked
+against a small cached (version, is_active) entry per user. Configured by the `SIGNED_TOKENS` setting, i.e.:
+
+    SIGNED_TOKENS = {
+        'ENABLED': True,  # The login issues signed tokens instead of authtoken ones
+        'TTL': 3600,  # Seconds the tokens are valid for
+        'STATE_CACHE': 'default',  # Cache alias of the (version, is_active) entries of the users
+        'STATE_CACHE_TTL': 60,  # Seconds
+    }
+
+The entries are deleted on save/delete of the user (see `user_management.signals`), so a revocation or
+a deactivation is seen right away by the processes sharing `STATE_CACHE`, and by the others within its TTL.
+The tokens are sent as `Authorization: Bearer <token>`, see `authentication.SignedTokenAuthentication`.
+"""
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db.models import F
+
+from user_management.models.user import User
+from user_management.sharding import get_shards
+
+SALT = 'user_management.signed_tokens'
+
+
+@dataclass(frozen=True)
+class SignedToken:
+    key: str
+    user_id: int
+    version: int
+    expires_at: int
+
+
+def _config() -> dict:
+    return getattr(settings, 'SIGNED_TOKENS', {})
+
+
+def is_enabled() -> bool:
+    return _config().get('ENABLED', False)
+
+
+def _signer() -> signing.Signer:
+    return signing.Signer(salt=SALT, algorithm='sha256')
+
+
+def _state_cache():
+    return caches[_config().get('STATE_CACHE', 'default')]
+
+
+def _state_cache_key(user_id: int) -> str:
+    return f'signed-token:state:{user_id}'
+
+
+def issue_token(user: User) -> SignedToken:
+    """Returns a new token of the user, valid for `SIGNED_TOKENS["TTL"]` seconds."""
+    expires_at = int(time.time() + _config().get('TTL', 3600))
+    value = f'{user.pk}:{user.token_version}:{signing.b62_encode(expires_at)}'
+    return SignedToken(_signer().sign(value), user.pk, user.token_version, expires_at)
+
+
+def parse_token(key: str) -> Optional[SignedToken]:
+    """Returns the token if its signature is valid and it has not expired, otherwise None. Makes no query."""
+    try:
+        user_id, version, expires_at = _signer().unsign(key).split(':')
+        token = SignedToken(key, int(user_id), int(version), signing.b62_decode(expires_at))
+    except (signing.BadSignature, ValueError):
+        return None
+
+    if token.expires_at <= time.time():
+        return None
+    return token
+
+
+def get_user_state(user_id: int) -> Optional[tuple[int, bool]]:
+    """Returns the (token version, is_active) of the user, or None if it does not exist, cached by `STATE_CACHE`."""
+    cache = _state_cache()
+    state = cache.get(_state_cache_key(user_id))
+    if state is None:
+        for db in get_shards() or [None]:
+            state = User.objects.using(db).filter(pk=user_id).values_list('token_version', 'is_active').first()
+            if state is not None:
+                break
+        else:
+            return None
+        cache.set(_state_cache_key(user_id), state, timeout=_config().get('STATE_CACHE_TTL', 60))
+    return state
+
+
+def invalidate_user_state(user_id: int):
+    _state_cache().delete(_state_cache_key(user_id))
+
+
+def revoke_tokens(user: User):
+    """Revokes all the signed tokens issued to the user so far."""
+    User.objects.using(user._state.db).filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    user.refresh_from_db(fields=('token_version',))
+    invalidate_user_state(user.pk)
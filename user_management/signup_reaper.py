@@ -0,0 +1,106 @@
+"""
+Reaper of the stale signups (see `reap_stale_signups` command): the inactive users, whose email confirmation
+has expired without being confirmed.
+
+The users are deleted in small chunks, each in its own short transaction, so that the locks are held only briefly
+and the signups, logins and confirmations keep going meanwhile. The chunks are paginated by
+(expires_at, user_id) keyset over the `emailconfirmation_unconfirmed` (partial) index, rather than by OFFSET,
+so finding each chunk costs the same, no matter how far the reaper has gone.
+
+When the users are sharded (see `user_management.sharding`), the shards are reaped one after the other.
+
+Caveat: the reaped emails stay in the email existence filter (see `email_filter` module) until it is rebuilt,
+which only costs a query on the next signup with them.
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Iterator, Optional
+
+from django.db import transaction
+from django.db.models import Q
+
+from user_management.models.email_confirmation import EmailConfirmation
+from user_management.models.user import User
+from user_management.sharding import get_shards
+
+logger = logging.getLogger(__name__)
+
+
+class StaleSignupReaper:
+
+    def __init__(self, expired_before: datetime, chunk_size: int = 500, max_rows_per_second: Optional[float] = None,
+                 dry_run: bool = False):
+        self.expired_before = expired_before
+        self.chunk_size = chunk_size
+        self.max_rows_per_second = max_rows_per_second
+        self.dry_run = dry_run
+        self.found = 0
+        self.deleted = 0
+
+    def chunks(self, using: Optional[str] = None) -> Iterator[list[int]]:
+        """Yields the ids of the stale users (of the database), `chunk_size` at a time."""
+        queryset = EmailConfirmation.objects.using(using).filter(
+            confirmed_at__isnull=True,
+            expires_at__lt=self.expired_before,
+            user__is_active=False,
+        ).order_by('expires_at', 'user_id')
+
+        last_key = None
+        while True:
+            chunk_queryset = queryset
+            if last_key is not None:
+                last_expires_at, last_user_id = last_key
+                chunk_queryset = queryset.filter(
+                    Q(expires_at__gt=last_expires_at) | Q(expires_at=last_expires_at, user_id__gt=last_user_id)
+                )
+
+            rows = list(chunk_queryset.values_list('expires_at', 'user_id')[:self.chunk_size])
+            if not rows:
+                return
+
+            last_key = rows[-1]
+            yield [user_id for _expires_at, user_id in rows]
+
+    def delete_chunk(self, user_ids: list[int], using: Optional[str] = None) -> int:
+        """Deletes the given users (and their related objects), if they are still stale, returns how many."""
+        with transaction.atomic(using=using):
+            # Filtered again, to skip the users which have confirmed their email since the chunk was found
+            _total, deleted_per_model = User.objects.using(using).filter(
+                id__in=user_ids,
+                is_active=False,
+                emailconfirmation__confirmed_at__isnull=True,
+                emailconfirmation__expires_at__lt=self.expired_before,
+            ).delete()
+        return deleted_per_model.get(User._meta.label, 0)
+
+    def reap(self) -> dict:
+        started_at = time.perf_counter()
+        for using in get_shards() or [None]:
+            for user_ids in self.chunks(using):
+                self.found += len(user_ids)
+                if self.dry_run:
+                    continue
+
+                self.deleted += self.delete_chunk(user_ids, using)
+                logger.debug('Deleted %d of %d stale signups so far', self.deleted, self.found)
+                self._throttle(started_at)
+
+        return self.stats(time.perf_counter() - started_at)
+
+    def stats(self, seconds: float) -> dict:
+        return {
+            'found': self.found,
+            'deleted': self.deleted,
+            'seconds': seconds,
+            'rows_per_second': self.deleted / seconds if seconds else 0.0,
+        }
+
+    def _throttle(self, started_at: float):
+        """Sleeps, if needed, to keep the deletion rate under `max_rows_per_second`."""
+        if not self.max_rows_per_second:
+            return
+
+        ahead_by = self.deleted / self.max_rows_per_second - (time.perf_counter() - started_at)
+        if ahead_by > 0:
+            time.sleep(ahead_by)
@@ -0,0 +1,86 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from user_management.admin.pagination import EstimatedCountPaginator, estimate_row_count
+from user_management.models.user import User
+from user_management.tests.factories.email_confirmation import EmailConfirmationFactory
+from user_management.tests.factories.user import UserFactory
+
+
+class EstimatedCountPaginatorTestCase(TestCase):
+
+    def setUp(self):
+        UserFactory.create_batch(5)
+
+    def _paginator(self, queryset) -> EstimatedCountPaginator:
+        paginator = EstimatedCountPaginator(queryset, per_page=2)
+        paginator.exact_count_limit = 3
+        return paginator
+
+    def test_exact_count_under_the_limit(self):
+        paginator = self._paginator(User.objects.filter(id__in=User.objects.values('id')[:3]).order_by('id'))
+
+        self.assertEqual(paginator.count, 3)
+
+    def test_capped_count(self):
+        # No statistics yet
+        self.assertEqual(self._paginator(User.objects.order_by('email')).count, 4)
+        self.assertEqual(self._paginator(User.objects.filter(is_active=False).order_by('id')).count, 4)
+
+    def test_estimated_count(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        self.assertEqual(estimate_row_count(User, 'default'), 5)
+        self.assertEqual(self._paginator(User.objects.order_by('email')).count, 5)
+        # The estimate is only for the whole table
+        self.assertEqual(self._paginator(User.objects.filter(is_active=False).order_by('id')).count, 4)
+
+
+class AdminChangelistTestCase(TestCase):
+
+    def setUp(self):
+        self.client.force_login(UserFactory(is_staff=True, is_superuser=True, is_active=True))
+
+    def _changelist_queries(self, url: str) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_email_confirmation_changelist_queries(self):
+        url = '/admin/user_management/emailconfirmation/'
+        EmailConfirmationFactory.create_batch(2)
+        queries = self._changelist_queries(url)
+
+        EmailConfirmationFactory.create_batch(5)
+
+        # Check if the users are not queried per row
+        self.assertEqual(self._changelist_queries(url), queries)
+
+    def test_user_search(self):
+        UserFactory(email='findme@test.com')
+
+        response = self.client.get('/admin/user_management/user/', {'q': 'FINDME'})
+
+        self.assertContains(response, 'findme@test.com')
+
+    @override_settings(USER_SHARDING={'SHARDS': ['default']})
+    def test_sharded_changelist_warning(self):
+        response = self.client.get('/admin/user_management/user/')
+
+        # Check if the admin tells that it does not list the users of the other shards
+        self.assertContains(response, 'only the ones of the default database are listed here')
+
+    @skipUnless(connection.vendor == 'sqlite', 'The plan of SQLite')
+    def test_user_search_uses_index(self):
+        sql, params = User.objects.filter(email__istartswith='findme').query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+
+        self.assertIn('user_email_nocase', plan)
@@ -0,0 +1,99 @@
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from user_management.authentication import CachedTokenAuthentication, TokenCache, get_token_cache
+from user_management.services.user import confirm_email
+from user_management.tests.factories.email_confirmation import EmailConfirmationFactory
+from user_management.tests.factories.user import UserFactory
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+
+    def setUp(self):
+        self.user = UserFactory(is_active=True)
+        self.token = Token.objects.create(user=self.user)
+        self.authentication = CachedTokenAuthentication()
+        get_token_cache().clear()
+
+    def test_authenticate_credentials_cached(self):
+        # The first call queries the token (joined with the user)
+        with self.assertNumQueries(1):
+            user, token = self.authentication.authenticate_credentials(self.token.key)
+
+        # The next ones are served by the cache
+        with self.assertNumQueries(0):
+            cached_user, cached_token = self.authentication.authenticate_credentials(self.token.key)
+
+        self.assertEqual(cached_user, self.user)
+        self.assertEqual(cached_token, self.token)
+        self.assertEqual(get_token_cache().stats()['hits'], 1)
+
+    def test_authenticate_credentials_invalid_token(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials('invalid')
+
+    def test_token_deleted(self):
+        self.authentication.authenticate_credentials(self.token.key)
+
+        self.token.delete()
+
+        # Check if the deleted token is not served by the cache
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_user_deactivated(self):
+        self.authentication.authenticate_credentials(self.token.key)
+
+        self.user.is_active = False
+        self.user.save(update_fields=('is_active',))
+
+        # Check if the tokens of the deactivated user are not served by the cache
+        with self.assertRaisesMessage(AuthenticationFailed, 'User inactive or deleted.'):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_user_activated_by_confirm_email(self):
+        email_confirmation = EmailConfirmationFactory()
+        token = Token.objects.create(user=email_confirmation.user)
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(token.key)
+
+        confirm_email(email_confirmation.user.email, email_confirmation.code)
+
+        user, _ = self.authentication.authenticate_credentials(token.key)
+        self.assertTrue(user.is_active)
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        TOKEN_AUTHENTICATION_CACHE={'SHARED_CACHE': 'default'},
+    )
+    def test_shared_cache(self):
+        self.authentication.authenticate_credentials(self.token.key)
+
+        # Check if another process (with an empty local cache) is served by the shared cache
+        get_token_cache().clear()
+        with self.assertNumQueries(0):
+            self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(get_token_cache().stats()['shared_hits'], 1)
+
+        # Check if the shared entries are invalidated as well
+        self.user.save()
+        get_token_cache().clear()
+        with self.assertNumQueries(1):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+    def test_shared_cache_invalidation_seen_by_other_processes(self):
+        first_process = TokenCache(shared_cache='default')
+        second_process = TokenCache(shared_cache='default')
+        first_process.set(self.user, self.token)
+        self.assertIsNotNone(first_process.get(self.token.key))
+
+        # Call the invalidation in the other process (the one where the user is deactivated)
+        second_process.invalidate_user(self.user.pk)
+
+        # Check if the local entry of the first process is not served anymore
+        self.assertIsNone(first_process.get(self.token.key))
+        self.assertEqual(first_process.stats()['stale_hits'], 1)
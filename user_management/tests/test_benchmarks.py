@@ -0,0 +1,48 @@
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from user_management.benchmarks.services import find_regressions
+from user_management.benchmarks.utils import percentile
+
+
+class PercentileTestCase(SimpleTestCase):
+
+    def test_percentile(self):
+        values = [float(value) for value in range(1, 101)]
+
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile([1.0], 95), 1.0)
+        self.assertEqual(percentile([], 95), 0.0)
+
+
+class FindRegressionsTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.baseline = {'1000': {'login': {'p50_ms': 10.0, 'p99_ms': 20.0, 'queries': 3}}}
+
+    def test_no_regressions(self):
+        results = {'1000': {'login': {'p50_ms': 11.0, 'p99_ms': 15.0, 'queries': 3}}}
+
+        self.assertEqual(find_regressions(self.baseline, results, threshold=0.2), [])
+
+    def test_regressions(self):
+        results = {
+            '1000': {'login': {'p50_ms': 13.0, 'p99_ms': 20.0, 'queries': 4}},
+            # Not in the baseline, so it is not compared
+            '100000': {'login': {'p50_ms': 100.0, 'p99_ms': 200.0, 'queries': 10}},
+        }
+
+        regressions = find_regressions(self.baseline, results, threshold=0.2)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertIn('login at 1000 users: p50_ms', regressions[0])
+        self.assertIn('login at 1000 users: queries', regressions[1])
+
+
+class BenchmarkServicesCommandTestCase(SimpleTestCase):
+
+    def test_missing_baseline(self):
+        # Check if the gate fails (before running the benchmarks) when there is no baseline to compare with
+        with self.assertRaisesMessage(CommandError, 'No baseline at /nonexisting/baseline.json'):
+            call_command('benchmark_services', '--sizes=1000', '--baseline=/nonexisting/baseline.json')
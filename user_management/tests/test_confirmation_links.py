@@ -0,0 +1,99 @@
+import re
+
+from asgiref.sync import async_to_sync
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from user_management import confirmation_links
+from user_management.models.email_confirmation import EmailConfirmation
+from user_management.services.email_confirmation import send_email_confirmation_email
+from user_management.services.user import aconfirm_email_link, confirm_email_link, confirm_email
+from user_management.tests.factories.email_confirmation import EmailConfirmationFactory
+
+
+@override_settings(CONFIRMATION_LINKS={'ENABLED': True, 'URL': 'https://example.com/confirm-email?token={token}'})
+class ConfirmationLinksTestCase(TestCase):
+
+    def setUp(self):
+        self.email_confirmation = EmailConfirmationFactory()
+        self.user = self.email_confirmation.user
+
+    def _token(self, email_confirmation: EmailConfirmation) -> str:
+        return confirmation_links.make_token(
+            email_confirmation.user_id, email_confirmation.code, email_confirmation.expires_at,
+        )
+
+    def test_parse_token(self):
+        token = self._token(self.email_confirmation)
+
+        parsed = confirmation_links.parse_token(token)
+
+        self.assertEqual((parsed.user_id, parsed.nonce), (self.user.id, str(self.email_confirmation.code)))
+        self.assertIsNone(confirmation_links.parse_token(token.replace(f'{self.user.id}:', f'{self.user.id + 1}:', 1)))
+        self.assertIsNone(confirmation_links.parse_token('invalid'))
+
+    def test_parse_token_expired(self):
+        token = confirmation_links.make_token(self.user.id, '12345', timezone.now() - timezone.timedelta(seconds=1))
+
+        self.assertIsNone(confirmation_links.parse_token(token))
+
+    def test_email_carries_the_link_and_the_code(self):
+        email_confirmation = send_email_confirmation_email(self.user.email, self.user.id).unwrap()
+
+        body = mail.outbox[0].body
+        token = re.search(r'token=(\S+)', body).group(1)
+        self.assertEqual(confirmation_links.parse_token(token).nonce, email_confirmation.code)
+        self.assertIn(email_confirmation.code, body)
+
+    def test_confirm_email_link(self):
+        token = self._token(self.email_confirmation)
+
+        with CaptureQueriesContext(connection) as queries:
+            result = confirm_email_link(token)
+
+        # Check if the confirmation makes no read, only the conditional UPDATE and the activation
+        statements = [query['sql'].split()[0] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(statements, ['UPDATE', 'UPDATE'])
+
+        self.assertEqual(result.unwrap(), self.user.id)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_active)
+        self.email_confirmation.refresh_from_db()
+        self.assertIsNotNone(self.email_confirmation.confirmed_at)
+
+        # Clicking the link again is harmless
+        self.assertEqual(confirm_email_link(token).err().detail, 'Email already confirmed')
+
+    def test_resend_invalidates_the_link(self):
+        token = self._token(self.email_confirmation)
+        send_email_confirmation_email(self.user.email, self.user.id).unwrap()
+
+        result = confirm_email_link(token)
+
+        self.assertEqual(result.err().detail, 'Could not confirm email')
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+    def test_code_flow_still_works(self):
+        result = confirm_email(self.user.email, self.email_confirmation.code)
+
+        self.assertTrue(result.is_ok())
+
+    def test_aconfirm_email_link(self):
+        result = async_to_sync(aconfirm_email_link)(self._token(self.email_confirmation))
+
+        self.assertEqual(result.unwrap(), self.user.id)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_active)
+
+    def test_view(self):
+        response = self.client.post(
+            '/user-management/v1/users/confirm-email-link', {'token': self._token(self.email_confirmation)},
+        )
+        invalid_response = self.client.post('/user-management/v1/users/confirm-email-link', {'token': 'invalid'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(invalid_response.status_code, 422)
@@ -0,0 +1,130 @@
+import os
+import tempfile
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.db.utils import load_backend
+from django.test import TransactionTestCase, override_settings
+
+from user_management import db_router
+from user_management.models.user import User
+from user_management.tests.factories.email_confirmation import EmailConfirmationFactory
+from user_management.tests.factories.user import UserFactory
+
+
+class PrimaryReplicaRouterTestCase(TransactionTestCase):
+    """Runs against a second SQLite file as the replica, which is copied from the primary by the tests."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = {
+            **connections['default'].settings_dict, 'NAME': os.path.join(directory.name, 'replica.sqlite3'),
+        }
+        replica = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, 'replica')
+        connections['replica'] = replica
+        self.addCleanup(connections.__delitem__, 'replica')
+        self.addCleanup(replica.close)
+
+        settings_override = override_settings(
+            REPLICA_ROUTER={'REPLICAS': ['replica'], 'STICKINESS_SECONDS': 5, 'PIN_CACHE': None},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _sync_replica(self):
+        call_command('sync_sqlite_replicas', stdout=StringIO())
+
+    def test_reads_go_to_the_replica(self):
+        user = UserFactory()
+        self._sync_replica()
+
+        # Call the read from a client which has not written
+        with db_router.pin_scope():
+            read_user = User.objects.get(email=user.email)
+
+        self.assertEqual(read_user._state.db, 'replica')
+
+    def test_reads_after_a_write_go_to_the_primary(self):
+        self._sync_replica()
+        user = UserFactory()
+
+        with db_router.pin_scope():
+            # Check if the replica is stale (has not got the user yet)
+            self.assertFalse(User.objects.filter(email=user.email).exists())
+
+            User.objects.filter(id=user.id).update(is_active=True)
+
+            # Check if the client reads its own write
+            self.assertTrue(User.objects.filter(email=user.email, is_active=True).exists())
+
+    def test_reads_in_a_transaction_go_to_the_primary(self):
+        self._sync_replica()
+        user = UserFactory()
+
+        with db_router.pin_scope(), transaction.atomic():
+            self.assertTrue(User.objects.filter(email=user.email).exists())
+
+    def test_login_right_after_confirm_email(self):
+        email_confirmation = EmailConfirmationFactory(user__password='testpassword')
+        email = email_confirmation.user.email
+        self._sync_replica()
+
+        # Call the confirm email, then the login endpoint (the replica still has the inactive user)
+        response = self.client.post(
+            '/user-management/v1/users/confirm-email', {'email': email, 'code': email_confirmation.code},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(db_router.PIN_COOKIE_NAME, response.cookies)
+        response = self.client.post('/user-management/v1/users/login/', {'email': email, 'password': 'testpassword'})
+
+        # Check if the client, which keeps the cookie, reads the confirmed user
+        self.assertEqual(response.status_code, 201)
+
+        # Check if another client (which has not written) reads from the stale replica
+        self.client.cookies.clear()
+        response = self.client.post('/user-management/v1/users/login/', {'email': email, 'password': 'testpassword'})
+        self.assertEqual(response.status_code, 422)
+
+    async def test_async_login_right_after_confirm_email(self):
+        email_confirmation = await sync_to_async(EmailConfirmationFactory)(user__password='testpassword')
+        email = email_confirmation.user.email
+        await sync_to_async(self._sync_replica)()
+
+        # Without the sync only WhiteNoise middleware, all the middlewares run in async mode
+        middleware = [name for name in settings.MIDDLEWARE if not name.startswith('whitenoise.')]
+        with override_settings(MIDDLEWARE=middleware):
+            response = await self.async_client.post(
+                '/user-management/v1/async/users/confirm-email',
+                {'email': email, 'code': str(email_confirmation.code)}, content_type='application/json',
+            )
+            self.assertIn(db_router.PIN_COOKIE_NAME, response.cookies)
+            response = await self.async_client.post(
+                '/user-management/v1/async/users/login', {'email': email, 'password': 'testpassword'},
+                content_type='application/json',
+            )
+
+        # Check if the client, which keeps the cookie, reads the confirmed user
+        self.assertEqual(response.status_code, 201)
+
+    def test_client_without_cookies_is_pinned_by_the_cache(self):
+        self.addCleanup(caches['default'].clear)
+        email_confirmation = EmailConfirmationFactory(user__password='testpassword')
+        email = email_confirmation.user.email
+        self._sync_replica()
+
+        with override_settings(REPLICA_ROUTER={'REPLICAS': ['replica'], 'PIN_CACHE': 'default'}):
+            self.client.post(
+                '/user-management/v1/users/confirm-email', {'email': email, 'code': email_confirmation.code},
+            )
+            self.client.cookies.clear()
+            response = self.client.post(
+                '/user-management/v1/users/login/', {'email': email, 'password': 'testpassword'},
+            )
+
+        # Check if the client is pinned by its IP address
+        self.assertEqual(response.status_code, 201)
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from user_management.email_filter import BloomFilter, EmailExistenceFilter, get_email_filter, reset_email_filter
+from user_management.models.user import User
+from user_management.services.user import login, resend_email_confirmation
+from user_management.tests.factories.user import UserFactory
+
+
+class BloomFilterTestCase(TestCase):
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(capacity=10000, error_rate=0.01)
+        for i in range(10000):
+            bloom.add(f'email.{i}@test.com')
+
+        # Check if there are no false negatives, and the false positives are around the configured rate
+        self.assertTrue(all(f'email.{i}@test.com' in bloom for i in range(10000)))
+        false_positives = sum(f'other.{i}@test.com' in bloom for i in range(10000))
+        self.assertLess(false_positives, 200)
+
+
+@override_settings(EMAIL_EXISTENCE_FILTER={'ENABLED': True, 'REFRESH_INTERVAL': 3600})
+class EmailExistenceFilterTestCase(TestCase):
+
+    def setUp(self):
+        # Each test builds its own filter
+        reset_email_filter(setting='EMAIL_EXISTENCE_FILTER')
+        self.user = UserFactory()
+
+    def test_might_exist(self):
+        self.assertTrue(get_email_filter().might_exist(self.user.email))
+        self.assertFalse(get_email_filter().might_exist('nonexisting@example.com'))
+
+    def test_users_created_after_build(self):
+        get_email_filter().might_exist(self.user.email)
+
+        # Added by the post_save signal
+        user = UserFactory()
+        # Not added by any signal, fetched by the refresh
+        User.objects.bulk_create([User(email='bulk@example.com')])
+
+        self.assertTrue(get_email_filter().might_exist(user.email))
+        get_email_filter().refresh_interval = 0
+        self.assertTrue(get_email_filter().might_exist('bulk@example.com'))
+
+    def test_users_committed_out_of_order(self):
+        email_filter = get_email_filter()
+        email_filter.refresh_interval = 0
+        # The transaction of the next id commits after the one of the id after it
+        User.objects.bulk_create([User(id=self.user.id + 2, email='second@example.com')])
+        self.assertTrue(email_filter.might_exist('second@example.com'))
+
+        User.objects.bulk_create([User(id=self.user.id + 1, email='first@example.com')])
+
+        # Check if the skipped id is fetched again
+        self.assertTrue(email_filter.might_exist('first@example.com'))
+
+    def test_built_once(self):
+        reset_email_filter(setting='EMAIL_EXISTENCE_FILTER')
+
+        def build(email_filter):
+            time.sleep(0.05)
+            email_filter._bloom = BloomFilter(10, 0.01)
+
+        # Call the get_email_filter function from concurrent first requests
+        with mock.patch.object(EmailExistenceFilter, 'build', autospec=True, side_effect=build) as build_mock:
+            threads = [threading.Thread(target=get_email_filter) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        # Check if only one of them built the filter
+        self.assertEqual(build_mock.call_count, 1)
+
+    def test_services_skip_the_queries(self):
+        get_email_filter().might_exist(self.user.email)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(login('nonexisting@example.com', 'testpassword').is_err())
+            self.assertIsNone(resend_email_confirmation('nonexisting@example.com').value)
+
+        self.assertEqual(get_email_filter().stats()['queries_saved'], 2)
+
+    def test_rebuild_email_filter_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'email_filter.bin')
+            call_command('rebuild_email_filter', path=path, stdout=open(os.devnull, 'w'))
+
+            email_filter = EmailExistenceFilter(refresh_interval=3600, path=path)
+            # Only fetches the users created since the file was written
+            with self.assertNumQueries(1):
+                self.assertTrue(email_filter.might_exist(self.user.email))
+                self.assertFalse(email_filter.might_exist('nonexisting@example.com'))
@@ -0,0 +1,84 @@
+from io import StringIO
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, identify_hasher, make_password
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from user_management.hashers import calibrate_argon2, calibrate_pbkdf2, calibrate_scrypt
+
+
+@override_settings(PASSWORD_HASHER_PARAMETERS={'pbkdf2_sha256': {'iterations': 1000}})
+class CalibratedHasherTestCase(SimpleTestCase):
+
+    def test_parameters_from_settings(self):
+        encoded = make_password('testpassword')
+
+        # Check if the password is hashed with the calibrated iterations
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(check_password('testpassword', encoded))
+
+    def test_hash_of_other_parameters_must_be_updated(self):
+        encoded = make_password('testpassword')
+
+        with override_settings(PASSWORD_HASHER_PARAMETERS={'pbkdf2_sha256': {'iterations': 2000}}):
+            # Check if the hash is still verified, but reported to be upgraded
+            self.assertTrue(check_password('testpassword', encoded))
+            self.assertTrue(identify_hasher(encoded).must_update(encoded))
+
+
+def _fake_timer(seconds_per_unit):
+    """Returns a timer which takes the given seconds per unit of the (multiplied) parameters."""
+    def timer(hasher_class, **parameters):
+        cost = 1
+        for name in ('iterations', 'time_cost', 'memory_cost', 'work_factor'):
+            cost *= parameters.get(name, 1)
+        return cost * seconds_per_unit
+    return timer
+
+
+class CalibrateTestCase(SimpleTestCase):
+
+    def test_calibrate_pbkdf2(self):
+        parameters, seconds = calibrate_pbkdf2(0.1, timer=_fake_timer(1e-7))
+
+        self.assertEqual(parameters, {'iterations': 1_000_000})
+        self.assertAlmostEqual(seconds, 0.1)
+
+    def test_calibrate_pbkdf2_not_below_default(self):
+        parameters, seconds = calibrate_pbkdf2(0.1, timer=_fake_timer(1e-6))
+
+        # Check if the iterations are kept at Django's default, even though they take longer than the target
+        self.assertEqual(parameters, {'iterations': PBKDF2PasswordHasher.iterations})
+        self.assertGreater(seconds, 0.1)
+
+    def test_calibrate_argon2(self):
+        parameters, seconds = calibrate_argon2(0.1, memory_cost=65536, parallelism=4, timer=_fake_timer(1e-6))
+
+        # Check if the memory cost is halved until a single pass fits, then as many passes as fit are taken
+        self.assertEqual(parameters, {'time_cost': 1, 'memory_cost': 65536, 'parallelism': 4})
+        parameters, seconds = calibrate_argon2(0.1, memory_cost=65536, parallelism=4, timer=_fake_timer(1e-5))
+        self.assertEqual(parameters, {'time_cost': 1, 'memory_cost': 8192, 'parallelism': 4})
+        parameters, seconds = calibrate_argon2(0.1, memory_cost=1024, parallelism=4, timer=_fake_timer(1e-5))
+        self.assertEqual(parameters, {'time_cost': 9, 'memory_cost': 1024, 'parallelism': 4})
+        self.assertLessEqual(seconds, 0.1)
+
+    def test_calibrate_scrypt(self):
+        parameters, seconds = calibrate_scrypt(0.1, timer=_fake_timer(1e-5))
+
+        self.assertEqual(parameters, {'work_factor': 8192, 'block_size': 8, 'parallelism': 1})
+        self.assertLessEqual(seconds, 0.1)
+        # Check if the work factor is limited by the memory too
+        parameters, _seconds = calibrate_scrypt(0.1, max_memory=4 * 1024 * 1024, timer=_fake_timer(1e-5))
+        self.assertEqual(parameters['work_factor'], 4096)
+
+    def test_command(self):
+        stdout = StringIO()
+
+        call_command('calibrate_hashers', '--algorithms', 'pbkdf2_sha256,scrypt', '--target-ms', '5',
+                     stdout=stdout, stderr=StringIO())
+
+        # Check if the settings are printed, with the first algorithm preferred
+        output = stdout.getvalue()
+        self.assertIn("PASSWORD_HASHERS = ['user_management.hashers.CalibratedPBKDF2PasswordHasher',", output)
+        self.assertIn("'pbkdf2_sha256': {'iterations':", output)
+        self.assertIn("'scrypt': {", output)
@@ -0,0 +1,112 @@
+import time
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.test import TestCase, override_settings
+
+from ableton_challenge.errors import ServiceUnavailable
+from user_management.hashing import InlineHashingExecutor, ProcessPoolHashingExecutor, get_hashing_executor
+from user_management.tests.factories.user import UserFactory
+
+
+def _outdated_hash(raw_password):
+    # A hash made by the default hasher, but with fewer iterations than the current ones
+    hasher = PBKDF2PasswordHasher()
+    return hasher.encode(raw_password, hasher.salt(), iterations=1000)
+
+
+class ProcessPoolHashingExecutorTestCase(TestCase):
+
+    def setUp(self):
+        self.executor = ProcessPoolHashingExecutor(max_workers=1, max_queue_size=2, timeout=10)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_make_and_check_password(self):
+        encoded = self.executor.make_password('testpassword')
+
+        # Check if the hash made by the worker process is a valid one
+        self.assertEqual(self.executor.check_password('testpassword', encoded), (True, False))
+        self.assertEqual(self.executor.check_password('wrongpassword', encoded), (False, False))
+
+        metrics = self.executor.metrics()
+        self.assertEqual(metrics['hashes'], 3)
+        self.assertEqual(metrics['queue_depth'], 0)
+        self.assertGreater(metrics['max_hash_seconds'], 0)
+
+    def test_make_passwords(self):
+        executor = ProcessPoolHashingExecutor(max_workers=2, max_queue_size=2, timeout=10)
+        self.addCleanup(executor.shutdown)
+
+        raw_passwords = ['first', 'second', 'third']
+        encoded = executor.make_passwords(raw_passwords)
+
+        # Check if the hashes are returned in the order of the passwords, and counted one by one
+        self.assertEqual([executor.check_password(raw, hash) for raw, hash in zip(raw_passwords, encoded)],
+                         [(True, False)] * 3)
+        self.assertEqual(executor.metrics()['hashes'], 6)
+        self.assertEqual(executor.make_passwords([]), [])
+
+    def test_check_password_outdated_hash(self):
+        encoded = _outdated_hash('testpassword')
+
+        # Check if the worker process reports that the hash must be upgraded
+        self.assertEqual(self.executor.check_password('testpassword', encoded), (True, True))
+
+    def test_queue_full(self):
+        executor = ProcessPoolHashingExecutor(max_workers=1, max_queue_size=0)
+        self.addCleanup(executor.shutdown)
+
+        # Check if the request fails fast when there is no free slot in the queue
+        with self.assertRaises(ServiceUnavailable):
+            executor.make_password('testpassword')
+        self.assertEqual(executor.metrics()['rejected'], 1)
+
+    def test_broken_pool(self):
+        executor = ProcessPoolHashingExecutor(max_workers=1, max_queue_size=1)
+        self.addCleanup(executor.shutdown)
+        broken_pool = executor._pool
+
+        with mock.patch.object(broken_pool, 'submit', side_effect=BrokenProcessPool('A worker died')):
+            with self.assertLogs('user_management.hashing', 'ERROR'), self.assertRaises(ServiceUnavailable):
+                executor.make_password('testpassword')
+
+        # Check if the slot is released, and the next hash gets a new pool
+        self.assertEqual(executor.metrics()['queue_depth'], 0)
+        self.assertIsNot(executor._pool, broken_pool)
+        self.assertTrue(executor.make_password('testpassword').startswith('pbkdf2_sha256$'))
+
+    def test_metrics_logged(self):
+        # Inline, so that the hash is recorded before it returns
+        executor = InlineHashingExecutor(metrics_interval=0.001)
+
+        with self.assertLogs('user_management.hashing', 'INFO') as logs:
+            time.sleep(0.01)
+            executor.make_password('testpassword')
+
+        self.assertEqual(logs.records[0].getMessage(), 'Password hashing metrics')
+        self.assertEqual(logs.records[0].hashes, 1)
+
+    def test_timeout(self):
+        executor = ProcessPoolHashingExecutor(max_workers=1, timeout=0.001)
+        self.addCleanup(executor.shutdown)
+
+        with self.assertRaises(ServiceUnavailable):
+            executor.make_password('testpassword')
+        self.assertEqual(executor.metrics()['timeouts'], 1)
+
+
+class UserPasswordTestCase(TestCase):
+
+    @override_settings(PASSWORD_HASHING_EXECUTOR={'BACKEND': 'user_management.hashing.InlineHashingExecutor'})
+    def test_check_password_upgrades_outdated_hash(self):
+        user = UserFactory()
+        user.password = _outdated_hash('testpassword')
+        user.save()
+        hashes = get_hashing_executor().metrics()['hashes']
+
+        # Check if the password is hashed by the configured executor, and the outdated hash is upgraded
+        self.assertTrue(user.check_password('testpassword'))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        self.assertEqual(get_hashing_executor().metrics()['hashes'], hashes + 2)
@@ -0,0 +1,176 @@
+import json
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core import mail
+from django.test import SimpleTestCase, TestCase, override_settings
+from result import Err
+
+from ableton_challenge.errors import ServiceUnavailable
+from user_management import idempotency
+from user_management.models.user import User
+from user_management.tests.factories.user import UserFactory
+
+
+class LocalMemoryStoreTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.store = idempotency.LocalMemoryStore()
+
+    def test_add(self):
+        self.assertTrue(self.store.add('key', idempotency.StoredResponse('a'), ttl=60))
+        self.assertFalse(self.store.add('key', idempotency.StoredResponse('b'), ttl=60))
+        self.assertEqual(self.store.get('key').fingerprint, 'a')
+
+    def test_wait(self):
+        self.store.add('key', idempotency.StoredResponse('a'), ttl=60)
+        stored = idempotency.StoredResponse('a', status_code=201, content=b'{}')
+
+        # Call the wait, while another thread finishes the request
+        timer = threading.Timer(0.05, self.store.set, args=('key', stored, 60))
+        timer.start()
+        self.addCleanup(timer.join)
+
+        self.assertEqual(self.store.wait('key', timeout=5), stored)
+
+    def test_wait_timeout(self):
+        self.store.add('key', idempotency.StoredResponse('a'), ttl=60)
+
+        self.assertTrue(self.store.wait('key', timeout=0.01).in_flight)
+
+    def test_max_entries(self):
+        store = idempotency.LocalMemoryStore(max_entries=10)
+        store.add('expired', idempotency.StoredResponse('a'), ttl=-1)
+        for index in range(15):
+            store.add(str(index), idempotency.StoredResponse('a'), ttl=60)
+
+        # Check if the expired entry, then the oldest ones are evicted
+        self.assertLessEqual(len(store._entries), 10)
+        self.assertIsNone(store.get('expired'))
+        self.assertIsNone(store.get('0'))
+        self.assertIsNotNone(store.get('14'))
+
+
+@override_settings(IDEMPOTENCY_STORE={'BACKEND': 'user_management.idempotency.LocalMemoryStore', 'WAIT_TIMEOUT': 0.01})
+class IdempotencyMiddlewareTestCase(TestCase):
+    signup_url = '/user-management/v1/users/signup/'
+    resend_url = '/user-management/v1/users/resend-email-confirmation'
+
+    def setUp(self):
+        idempotency.reset_idempotency_store(setting='IDEMPOTENCY_STORE')
+
+    def _post(self, url, data, key='5f0c1b7e-2a0e-4c1e-9a52-1f3e0c9b8d11'):
+        headers = {'Idempotency-Key': key} if key else {}
+        return self.client.post(url, data, content_type='application/json', headers=headers)
+
+    def test_signup_replayed(self):
+        data = {'email': 'user@test.com', 'password': 'testpassword'}
+        response = self._post(self.signup_url, data)
+
+        # Call the signup endpoint again, with the same key
+        replayed_response = self._post(self.signup_url, data)
+
+        # Check if the first response is replayed, without signing up again
+        self.assertEqual(replayed_response.status_code, 201)
+        self.assertEqual(replayed_response.content, response.content)
+        self.assertEqual(replayed_response[idempotency.REPLAYED_HEADER], 'true')
+        self.assertNotIn(idempotency.REPLAYED_HEADER, response)
+        self.assertEqual(User.objects.count(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+        stats = idempotency.get_idempotency_stats().stats()
+        self.assertEqual((stats['requests'], stats['replays'], stats['hit_rate']), (2, 1, 0.5))
+
+    async def test_signup_replayed_async(self):
+        data = {'email': 'user@test.com', 'password': 'testpassword'}
+        headers = {'Idempotency-Key': '5f0c1b7e-2a0e-4c1e-9a52-1f3e0c9b8d11'}
+        response = await self.async_client.post(self.signup_url, data, content_type='application/json', headers=headers)
+
+        # Call the signup endpoint again, with the same key, through the middleware in async mode
+        replayed_response = await self.async_client.post(
+            self.signup_url, data, content_type='application/json', headers=headers,
+        )
+
+        self.assertEqual(replayed_response.status_code, 201)
+        self.assertEqual(replayed_response.content, response.content)
+        self.assertEqual(replayed_response[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(await User.objects.acount(), 1)
+
+    def test_without_key(self):
+        data = {'email': 'user@test.com', 'password': 'testpassword'}
+        self._post(self.signup_url, data, key=None)
+
+        response = self._post(self.signup_url, data, key=None)
+
+        self.assertEqual(response.status_code, 422)
+
+    def test_resend_email_confirmation_replayed(self):
+        user = UserFactory()
+
+        for _ in range(2):
+            response = self._post(self.resend_url, {'email': user.email})
+            self.assertEqual(response.status_code, 200)
+
+        # Check if only one code is sent
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_key_reused_with_another_body(self):
+        self._post(self.signup_url, {'email': 'user@test.com', 'password': 'testpassword'})
+
+        response = self._post(self.signup_url, {'email': 'another@test.com', 'password': 'testpassword'})
+
+        # Check if the response of the other client is not replayed, the keys are scoped by the body
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn(idempotency.REPLAYED_HEADER, response)
+        self.assertTrue(User.objects.filter(email='another@test.com').exists())
+
+    def test_key_reused_by_an_authenticated_user(self):
+        self.client.force_login(UserFactory(is_active=True))
+        self._post(self.resend_url, {'email': 'user@test.com'})
+
+        response = self._post(self.resend_url, {'email': 'another@test.com'})
+
+        self.assertEqual(response.status_code, 422)
+
+    def test_login_not_stored(self):
+        user = UserFactory(password='testpassword', is_active=True)
+        data = {'email': user.email, 'password': 'testpassword'}
+
+        responses = [self._post('/user-management/v1/users/login/', data) for _ in range(2)]
+
+        # Check if the tokens are never stored, nor replayed
+        self.assertEqual([response.status_code for response in responses], [201, 201])
+        self.assertNotIn(idempotency.REPLAYED_HEADER, responses[1])
+        self.assertEqual(idempotency.get_idempotency_stats().stats()['requests'], 0)
+
+    def test_in_flight(self):
+        data = {'email': 'user@test.com', 'password': 'testpassword'}
+        request = self._request(data)
+        # The first request is still running (in another process)
+        idempotency.get_idempotency_store().add(
+            idempotency.store_key(request, 'in-flight'), idempotency.StoredResponse(idempotency.fingerprint(request)),
+            ttl=60,
+        )
+
+        response = self._post(self.signup_url, data, key='in-flight')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(User.objects.exists())
+
+    def test_retryable_response_not_stored(self):
+        data = {'email': 'user@test.com', 'password': 'testpassword'}
+        with mock.patch('user_management.views.v1.user.signup', return_value=Err(ServiceUnavailable())):
+            self.assertEqual(self._post(self.signup_url, data).status_code, 503)
+
+        # Check if the retry runs the view
+        response = self._post(self.signup_url, data)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn(idempotency.REPLAYED_HEADER, response)
+
+    def _request(self, data):
+        request = mock.Mock(method='POST', path=self.signup_url, user=AnonymousUser())
+        request.body = json.dumps(data).encode()
+        return request
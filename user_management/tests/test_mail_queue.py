@@ -0,0 +1,114 @@
+import socket
+import unittest
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from mailer.models import Message, MessageLog, make_message, PRIORITY_DEFERRED, PRIORITY_MEDIUM
+
+from user_management.mail_queue import MailQueueDrainer
+from user_management.models.mail_queue_claim import MailQueueClaim
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+
+def _queue_messages(count):
+    for i in range(count):
+        make_message(subject='Email Confirmation', body=f'code {i}', from_email='from@example.com',
+                     to=[f'email.{i}@test.com'], priority=PRIORITY_MEDIUM).save()
+
+
+@override_settings(MAILER_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class MailQueueDrainerTestCase(TestCase):
+
+    def test_drain(self):
+        _queue_messages(25)
+
+        stats = MailQueueDrainer(batch_size=10, workers=3).drain(once=True)
+
+        # Check if all the messages are sent, logged and removed from the queue
+        self.assertEqual(stats['sent'], 25)
+        self.assertEqual(len(mail.outbox), 25)
+        self.assertFalse(Message.objects.exists())
+        self.assertFalse(MailQueueClaim.objects.exists())
+        self.assertEqual(MessageLog.objects.count(), 25)
+
+    def test_claimed_messages_are_not_claimed_again(self):
+        _queue_messages(5)
+
+        first_batch = MailQueueDrainer(batch_size=3).claim_batch()
+        second_batch = MailQueueDrainer(batch_size=3).claim_batch()
+
+        # Check if the drainers running side by side claim different messages
+        self.assertEqual(len(first_batch), 3)
+        self.assertEqual(len(second_batch), 2)
+        self.assertFalse({message.id for message in first_batch} & {message.id for message in second_batch})
+
+    def test_expired_claims_are_taken_over(self):
+        _queue_messages(2)
+        MailQueueDrainer().claim_batch()
+
+        # Check if the messages claimed by a crashed drainer are claimed after the lease
+        self.assertEqual(MailQueueDrainer().claim_batch(), [])
+        self.assertEqual(len(MailQueueDrainer(lease_seconds=-1).claim_batch()), 2)
+
+    def test_failed_messages_are_deferred(self):
+        _queue_messages(3)
+        drainer = MailQueueDrainer()
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            sent, deferred = drainer.send_batch(drainer.claim_batch())
+
+        self.assertEqual((sent, deferred), (0, 3))
+        self.assertEqual(Message.objects.filter(priority=PRIORITY_DEFERRED).count(), 3)
+        self.assertFalse(MailQueueClaim.objects.exists())
+
+
+@unittest.skipIf(Controller is None, 'aiosmtpd is not installed')
+class MailQueueDrainerSMTPTestCase(TestCase):
+
+    def setUp(self):
+        self.received = []
+        self.connections = 0
+        test_case = self
+
+        class Handler:
+            async def handle_HELO(self, server, session, envelope, hostname):
+                test_case.connections += 1
+                session.host_name = hostname
+                return '250 OK'
+
+            async def handle_EHLO(self, server, session, envelope, hostname, responses):
+                test_case.connections += 1
+                session.host_name = hostname
+                return responses
+
+            async def handle_DATA(self, server, session, envelope):
+                test_case.received.append(envelope)
+                return '250 Message accepted for delivery'
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        self.controller = Controller(Handler(), hostname='127.0.0.1', port=port)
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+
+    def test_drain_over_smtp(self):
+        _queue_messages(20)
+
+        with self.settings(
+            MAILER_EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST=self.controller.hostname,
+            EMAIL_PORT=self.controller.port,
+        ):
+            call_command('drain_mail_queue', once=True, workers=2, batch_size=5, stdout=mock.MagicMock())
+
+        # Check if all the messages are delivered, over one connection per sending thread
+        self.assertEqual(len(self.received), 20)
+        self.assertLessEqual(self.connections, 2)
+        self.assertFalse(Message.objects.exists())
@@ -0,0 +1,79 @@
+import gzip
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from drf_yasg.generators import OpenAPISchemaGenerator
+
+from ableton_challenge import openapi
+
+
+class OpenAPISchemaTestCase(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(OPENAPI_SCHEMA_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_schema_is_generated_once(self):
+        with mock.patch.object(
+            openapi, 'generate_schema_artifact', wraps=openapi.generate_schema_artifact,
+        ) as generate_schema_artifact:
+            first_response = self.client.get('/swagger.json')
+            second_response = self.client.get('/swagger.json')
+
+        # Check if the schema is generated on the first request only, and written to the directory
+        self.assertEqual(generate_schema_artifact.call_count, 1)
+        self.assertEqual(first_response.status_code, 200)
+        self.assertEqual(first_response.content, second_response.content)
+        self.assertIn('/confirm-email', json.loads(first_response.content)['paths'])
+        self.assertEqual(len(list(self.directory.glob('openapi-*.json.gz'))), 1)
+
+    def test_schema_is_loaded_from_the_directory(self):
+        openapi.generate_schema_artifact()
+        openapi.reset_schema_artifact(setting='OPENAPI_SCHEMA_DIR')
+
+        with mock.patch.object(openapi, 'generate_schema_artifact') as generate_schema_artifact:
+            response = self.client.get('/swagger.json')
+
+        # Check if the pre-generated schema is served (i.e. by another process), without generating it
+        generate_schema_artifact.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag(self):
+        response = self.client.get('/swagger.json')
+
+        # Call the view with the ETag of the schema the client already has
+        not_modified_response = self.client.get('/swagger.json', HTTP_IF_NONE_MATCH=response['ETag'])
+
+        # Check if it is not sent again
+        self.assertTrue(response['ETag'])
+        self.assertEqual(not_modified_response.status_code, 304)
+        self.assertEqual(not_modified_response.content, b'')
+
+    def test_gzip(self):
+        response = self.client.get('/swagger.json', HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        # Check if the schema is sent compressed, as it is stored
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['info']['title'], 'Ableton challenge API')
+
+    def test_urlconf_fingerprint(self):
+        # Check if the fingerprint changes with the URL configuration, but not between the calls
+        self.assertEqual(openapi.urlconf_fingerprint(), openapi.urlconf_fingerprint())
+        self.assertNotEqual(openapi.urlconf_fingerprint(), openapi.urlconf_fingerprint('user_management.urls'))
+
+    def test_swagger_ui_loads_the_pregenerated_schema(self):
+        with mock.patch.object(OpenAPISchemaGenerator, 'get_schema') as get_schema:
+            responses = [self.client.get('/swagger/') for _ in range(3)]
+
+        # Check if the page is served without generating the schema, which it loads from the schema view
+        get_schema.assert_not_called()
+        self.assertEqual([response.status_code for response in responses], [200, 200, 200])
+        self.assertIn('/swagger.json', responses[0].content.decode())
+        self.assertIn('Ableton challenge API', responses[0].content.decode())
@@ -0,0 +1,136 @@
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from user_management import outbox
+from user_management.models.email_confirmation import EmailConfirmation
+from user_management.models.outbox_event import OutboxEvent
+from user_management.models.user import User
+from user_management.services.user import asignup, confirm_email, login, resend_email_confirmation, signup
+from user_management.services.user import signup_many
+from user_management.tests.factories.email_confirmation import EmailConfirmationFactory
+
+
+@override_settings(OUTBOX={'ENABLED': True})
+class OutboxServicesTestCase(TestCase):
+
+    def _event_types(self) -> list[str]:
+        return list(OutboxEvent.objects.order_by('id').values_list('event_type', flat=True))
+
+    def test_signup(self):
+        user = signup('user@test.com', 'testpassword').unwrap()
+
+        # Check if only the user and its events are written, the side effects are left to the workers
+        self.assertEqual(self._event_types(), [outbox.USER_SIGNED_UP, outbox.CONFIRMATION_REQUESTED])
+        self.assertEqual(OutboxEvent.objects.first().payload, {'user_id': user.id, 'email': 'user@test.com'})
+        self.assertFalse(EmailConfirmation.objects.exists())
+        self.assertEqual(mail.outbox, [])
+
+        # The login tells the user to confirm their email meanwhile
+        self.assertIn('confirmed you email', str(login('user@test.com', 'testpassword').err().detail))
+
+    def test_signup_is_atomic(self):
+        with mock.patch.object(outbox, 'publish', side_effect=RuntimeError('database is gone')):
+            with self.assertRaises(RuntimeError):
+                signup('user@test.com', 'testpassword')
+
+        self.assertFalse(User.objects.exists())
+
+    def test_signup_many(self):
+        signup_many([('first@test.com', 'testpassword'), ('second@test.com', 'testpassword')])
+
+        self.assertEqual(sorted(self._event_types()), [outbox.CONFIRMATION_REQUESTED] * 2 + [outbox.USER_SIGNED_UP] * 2)
+        self.assertFalse(EmailConfirmation.objects.exists())
+
+    def test_asignup(self):
+        async_to_sync(asignup)('user@test.com', 'testpassword').unwrap()
+
+        self.assertEqual(self._event_types(), [outbox.USER_SIGNED_UP, outbox.CONFIRMATION_REQUESTED])
+
+    def test_resend_and_confirm(self):
+        email_confirmation = EmailConfirmationFactory()
+        email = email_confirmation.user.email
+
+        resend_email_confirmation(email).unwrap()
+        confirm_email(email, email_confirmation.code).unwrap()
+
+        self.assertEqual(self._event_types(), [outbox.CONFIRMATION_REQUESTED, outbox.EMAIL_CONFIRMED])
+        # Already confirmed
+        self.assertTrue(resend_email_confirmation(email).is_err())
+
+
+@override_settings(OUTBOX={'ENABLED': True})
+class OutboxWorkerTestCase(TestCase):
+
+    def test_process(self):
+        signup('first@test.com', 'testpassword').unwrap()
+        signup('second@test.com', 'testpassword').unwrap()
+
+        # Call the worker, with batches smaller than the events
+        stats = outbox.OutboxWorker(batch_size=3).process(once=True)
+
+        # Check if the confirmation codes are generated and the emails are sent, and the events are deleted
+        self.assertEqual((stats['handled'], stats['failed']), (4, 0))
+        self.assertEqual(EmailConfirmation.objects.count(), 2)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['first@test.com', 'second@test.com'])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_failed_event_is_retried_later(self):
+        outbox.publish([('Failing', {}), ('Unhandled', {})])
+        failing_handler = mock.Mock(side_effect=ValueError('invalid'))
+
+        with mock.patch.dict(outbox._handlers, {'Failing': [failing_handler]}):
+            with self.assertLogs('user_management.outbox', 'ERROR'):
+                stats = outbox.OutboxWorker().process(once=True)
+
+        # Check if only the failed event is kept, and delayed
+        self.assertEqual((stats['handled'], stats['failed']), (1, 1))
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.event_type, event.attempts, event.claimed_by), ('Failing', 1, ''))
+        self.assertEqual(event.last_error, 'ValueError: invalid')
+        self.assertGreater(event.available_at, timezone.now())
+
+    def test_failed_event_is_dead_after_max_attempts(self):
+        outbox.publish([('Failing', {})])
+        OutboxEvent.objects.update(attempts=2)
+        failing_handler = mock.Mock(side_effect=ValueError('invalid'))
+
+        with mock.patch.dict(outbox._handlers, {'Failing': [failing_handler]}):
+            with self.assertLogs('user_management.outbox', 'ERROR'):
+                stats = outbox.OutboxWorker(max_attempts=3).process(once=True)
+
+            # Check if the dead event is kept, but not claimed anymore
+            event = OutboxEvent.objects.get()
+            self.assertEqual((stats['failed'], stats['dead'], event.attempts), (1, 1, 3))
+            self.assertIsNotNone(event.dead_at)
+            self.assertEqual(outbox.OutboxWorker().claim_batch('default'), [])
+
+            # Until it is retried
+            self.assertEqual(outbox.retry_dead(), 1)
+            self.assertEqual(len(outbox.OutboxWorker().claim_batch('default')), 1)
+
+    def test_claimed_events_are_skipped(self):
+        outbox.publish([(outbox.USER_SIGNED_UP, {})])
+        first_worker = outbox.OutboxWorker(lease_seconds=60)
+        second_worker = outbox.OutboxWorker(lease_seconds=60)
+
+        self.assertEqual(len(first_worker.claim_batch('default')), 1)
+        self.assertEqual(second_worker.claim_batch('default'), [])
+
+        # Until the lease of the first worker expires
+        later = timezone.now() + timezone.timedelta(minutes=2)
+        with mock.patch('user_management.outbox.timezone.now', return_value=later):
+            self.assertEqual(len(second_worker.claim_batch('default')), 1)
+
+    def test_command(self):
+        signup('user@test.com', 'testpassword').unwrap()
+        out = StringIO()
+
+        call_command('process_outbox', '--once', stdout=out)
+
+        self.assertIn('Handled 2, failed 0 (0 dead) events', out.getvalue())
@@ -0,0 +1,97 @@
+import os
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command, CommandError
+from django.test import TestCase, override_settings
+
+from user_management import profiling
+
+
+class ProfilingMiddlewareTestCase(TestCase):
+    login_url = '/user-management/v1/users/login/'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def _profiling(self, **config) -> override_settings:
+        return override_settings(REQUEST_PROFILING={'DIRECTORY': self.directory, 'MAX_FILES': 10, **config})
+
+    def _login(self, **headers):
+        return self.client.post(
+            self.login_url, {'email': 'user@test.com', 'password': 'testpassword'},
+            content_type='application/json', headers=headers,
+        )
+
+    def test_sampled(self):
+        with self._profiling(SAMPLE_RATE=1):
+            response = self._login()
+
+        # Check if the profile is dumped, tagged with the endpoint
+        paths = profiling.profile_paths(self.directory)
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(profiling.tag_of(paths[0]), 'user-management-v1-users-login')
+        self.assertEqual(response['X-Profile-Id'], paths[0].name)
+
+    def test_not_sampled(self):
+        with self._profiling(SAMPLE_RATE=0, HEADER_SECRET='secret'):
+            self._login()
+            self._login(**{profiling.HEADER: 'wrong'})
+
+        self.assertEqual(profiling.profile_paths(self.directory), [])
+
+    def test_header(self):
+        with self._profiling(SAMPLE_RATE=0, HEADER_SECRET='secret'):
+            self._login(**{profiling.HEADER: 'secret'})
+
+        self.assertEqual(len(profiling.profile_paths(self.directory)), 1)
+
+    async def test_sampled_async(self):
+        # Without the sync only WhiteNoise middleware, all the middlewares run in async mode
+        middleware = [name for name in settings.MIDDLEWARE if not name.startswith('whitenoise.')]
+        with self._profiling(SAMPLE_RATE=1), override_settings(MIDDLEWARE=middleware):
+            response = await self.async_client.post(
+                '/user-management/v1/async/users/login', {'email': 'user@test.com', 'password': 'testpassword'},
+                content_type='application/json',
+            )
+
+        paths = profiling.profile_paths(self.directory)
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(response['X-Profile-Id'], paths[0].name)
+
+    def test_rotation(self):
+        with self._profiling(SAMPLE_RATE=1, MAX_FILES=3):
+            for _ in range(5):
+                self._login()
+
+        self.assertEqual(len(profiling.profile_paths(self.directory)), 3)
+
+
+class ProfileReportCommandTestCase(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def test_report(self):
+        with override_settings(REQUEST_PROFILING={'DIRECTORY': self.directory, 'SAMPLE_RATE': 1}):
+            self.client.post('/user-management/v1/users/login/', {}, content_type='application/json')
+            self.client.post('/user-management/v1/users/signup/', {}, content_type='application/json')
+
+        out = StringIO()
+        call_command('profile_report', '--directory', self.directory, '--endpoint', 'login', '--top', 5, stdout=out)
+
+        # Check if only the login profile is merged, and the hot functions are listed
+        self.assertIn('1  user-management-v1-users-login', out.getvalue())
+        self.assertNotIn('signup', out.getvalue())
+        self.assertIn('cumtime', out.getvalue())
+        self.assertIn('middleware.py', out.getvalue())
+
+    def test_no_profiles(self):
+        with self.assertRaisesMessage(CommandError, 'No profiles found'):
+            call_command('profile_report', '--directory', os.fspath(self.directory))
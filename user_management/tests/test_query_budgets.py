@@ -0,0 +1,126 @@
+from asgiref.sync import iscoroutinefunction
+from django.test import TestCase, override_settings
+from django.urls import URLPattern
+from rest_framework.test import APIClient
+
+from user_management import confirmation_links, urls
+from user_management.email_filter import get_email_filter, reset_email_filter
+from user_management.models.user import User
+from user_management.query_budget import QueryBudgetTestMixin, get_budget
+from user_management.services import user as user_services
+from user_management.services.email_confirmation import send_email_confirmation_email
+from user_management.tests.factories.email_confirmation import EmailConfirmationFactory
+from user_management.tests.factories.user import UserFactory
+from user_management.throttling import reset_throttle_store
+from user_management.views import v1
+
+FAST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+# Measured with the email filter, whose refreshes count in the budgets
+@override_settings(EMAIL_EXISTENCE_FILTER={'ENABLED': True})
+class QueryBudgetsTestCase(QueryBudgetTestMixin, TestCase):
+
+    def setUp(self):
+        reset_throttle_store(setting='THROTTLE_STORE')
+        reset_email_filter(setting='EMAIL_EXISTENCE_FILTER')
+        self.client = APIClient()
+        self.password = 'testpassword'
+        self.email_confirmation = EmailConfirmationFactory(user__password=self.password)
+        self.user = self.email_confirmation.user
+        # Build the email filter outside the measurements
+        get_email_filter().might_exist(self.user.email)
+
+    def test_every_sync_view_has_a_budget(self):
+        for pattern in urls.urlpatterns:
+            # Skips the async views, whose queries run in other threads
+            if isinstance(pattern, URLPattern) and not iscoroutinefunction(pattern.callback):
+                self.assertIsNotNone(get_budget(pattern.callback)[1], f'{pattern} has no query budget')
+
+    def test_signup_budget(self):
+        with self.assertWithinQueryBudget(v1.SignupView.as_view({'post': 'create'})):
+            self.client.post('/user-management/v1/users/signup/', {'email': 'test@example.com', 'password': 'pass'})
+
+        with self.assertWithinQueryBudget(user_services.signup):
+            user_services.signup('other@example.com', 'pass')
+
+    @override_settings(EMAIL_BACKEND='mailer.backend.DbBackend', PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+    def test_bulk_signup_budget(self):
+        # More users than the backend inserts with one statement (i.e. SQLite's limit of the query parameters)
+        users = [{'email': f'test.{i}@example.com', 'password': 'pass'} for i in range(200)]
+        self.client.force_login(UserFactory(is_staff=True, is_active=True))
+        with self.assertWithinQueryBudget(v1.bulk_signup_view) as recorder:
+            response = self.client.post('/user-management/v1/users/signup/bulk', {'users': users}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(recorder.batches, 1)
+
+    @override_settings(EMAIL_BACKEND='mailer.backend.DbBackend', PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+    def test_signup_many_budget(self):
+        credentials = [(f'test.{i}@example.com', 'pass') for i in range(5)]
+
+        with self.assertWithinQueryBudget(user_services.signup_many) as recorder:
+            user_services.signup_many(credentials, batch_size=2)
+
+        # Check if the budget is the one of 3 batches
+        self.assertEqual(recorder.batches, 3)
+
+    def test_login_budget(self):
+        self.user.is_active = True
+        self.user.save()
+
+        with self.assertWithinQueryBudget(v1.LoginView.as_view({'post': 'create'})):
+            self.client.post('/user-management/v1/users/login/', {'email': self.user.email, 'password': self.password})
+
+        with self.assertWithinQueryBudget(user_services.login):
+            user_services.login(self.user.email, self.password)
+
+    def test_resend_email_confirmation_budget(self):
+        with self.assertWithinQueryBudget(v1.resend_email_confirmation_view):
+            self.client.post('/user-management/v1/users/resend-email-confirmation', {'email': self.user.email})
+
+        with self.assertWithinQueryBudget(send_email_confirmation_email):
+            send_email_confirmation_email(self.user.email, self.user.id)
+
+    def assertAtQueryBudget(self, budget_owner, call):
+        """Fails unless the call makes as many queries as the budget allows, so that one more exceeds it."""
+        _name, budget = get_budget(budget_owner)
+        with self.assertRaisesMessage(AssertionError, 'exceed the budget'):
+            with self.assertWithinQueryBudget(budget_owner) as recorder:
+                call()
+                queries = recorder.queries
+                # One query over the budget
+                User.objects.exists()
+
+        self.assertEqual(queries, budget.max_queries(recorder.batches))
+
+    def test_confirm_email_budget(self):
+        with self.assertWithinQueryBudget(v1.confirm_email_view):
+            self.client.post(
+                '/user-management/v1/users/confirm-email',
+                {'email': self.user.email, 'code': self.email_confirmation.code},
+            )
+
+    @override_settings(OUTBOX={'ENABLED': True})
+    def test_confirm_email_service_budget(self):
+        # The worst case, with the event of the confirmation
+        self.assertAtQueryBudget(
+            user_services.confirm_email,
+            lambda: user_services.confirm_email(self.user.email, self.email_confirmation.code).unwrap(),
+        )
+
+    def test_confirm_email_link_budget(self):
+        token = confirmation_links.make_token(
+            self.user.id, self.email_confirmation.code, self.email_confirmation.expires_at,
+        )
+
+        self.assertAtQueryBudget(v1.confirm_email_link_view, lambda: self.assertEqual(
+            self.client.post('/user-management/v1/users/confirm-email-link', {'token': token}).status_code, 200,
+        ))
+
+    def test_export_users_budget(self):
+        self.client.force_login(UserFactory(is_staff=True, is_active=True))
+
+        self.assertAtQueryBudget(v1.export_users_view, lambda: self.assertEqual(
+            self.client.get('/user-management/v1/users/export').status_code, 200,
+        ))
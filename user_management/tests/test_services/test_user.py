@@ -1,4 +1,8 @@
-from django.test import TestCase
+from unittest import mock
+
+from django.core import mail
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from rest_framework.authtoken.models import Token
 from rest_framework.exceptions import AuthenticationFailed
@@ -8,7 +12,9 @@ from user_management.models.user import User
 from user_management.tests.factories.user import UserFactory
 from user_management.tests.factories.email_confirmation import EmailConfirmationFactory
 from ableton_challenge.errors import UnprocessableContent
-from user_management.services.user import signup, login, confirm_email, resend_email_confirmation
+from user_management.services import user as user_services
+from user_management.services.user import signup, signup_many, login, confirm_email, resend_email_confirmation
+from user_management.services.user import aconfirm_email
 
 
 class SignupTestCase(TestCase):
@@ -41,6 +47,72 @@ class SignupTestCase(TestCase):
         self.assertEqual(result.err().detail, 'User with this email already exists')
 
 
+class SignupManyTestCase(TestCase):
+
+    def test_signup_many_success(self):
+        credentials = [(f'test.{i}@example.com', 'testpassword') for i in range(3)]
+
+        # Call the signup_many function
+        results = signup_many(credentials)
+
+        # Check if every signup was successful
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(result.is_ok() for result in results))
+
+        # Check if the users were created with their email confirmations
+        users = User.objects.filter(email__in=[email for email, _ in credentials])
+        self.assertEqual(users.count(), 3)
+        self.assertFalse(users.filter(is_active=True).exists())
+        self.assertTrue(users.first().check_password('testpassword'))
+        self.assertEqual(EmailConfirmation.objects.filter(user__in=users).count(), 3)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_signup_many_existing_and_duplicated_emails(self):
+        existing_user = UserFactory()
+
+        # Call the signup_many function with an existing email and a duplicated one
+        results = signup_many([
+            (existing_user.email, 'testpassword'),
+            ('test@example.com', 'testpassword'),
+            ('test@example.com', 'testpassword'),
+        ])
+
+        # Check if only the new email was signed up
+        self.assertTrue(results[0].is_err())
+        self.assertEqual(results[0].err().detail, 'User with this email already exists')
+        self.assertTrue(results[1].is_ok())
+        self.assertTrue(results[2].is_err())
+        self.assertEqual(User.objects.filter(email='test@example.com').count(), 1)
+
+    def test_signup_many_created_concurrently(self):
+        create_users = user_services._create_users
+
+        def create_users_after_concurrent_signup(users, batch_size, using):
+            # The first user is signed up by another request between the existence check and the insert
+            if not User.objects.filter(email='first@example.com').exists():
+                UserFactory(email='first@example.com')
+            create_users(users, batch_size, using)
+
+        # Call the signup_many function
+        with mock.patch.object(user_services, '_create_users', side_effect=create_users_after_concurrent_signup):
+            results = signup_many([('first@example.com', 'testpassword'), ('second@example.com', 'testpassword')])
+
+        # Check if only the concurrently created user failed, and the other one was still signed up
+        self.assertTrue(results[0].is_err())
+        self.assertEqual(results[0].err().detail, 'User with this email already exists')
+        self.assertTrue(results[1].is_ok())
+        self.assertTrue(User.objects.filter(email='second@example.com').exists())
+        self.assertEqual(EmailConfirmation.objects.filter(user__email='second@example.com').count(), 1)
+
+    def test_signup_many_query_count(self):
+        credentials = [(f'test.{i}@example.com', 'testpassword') for i in range(5)]
+
+        # Existence check, users insert and email confirmations insert (plus their savepoints),
+        # no matter how many users are signed up
+        with self.assertNumQueries(7):
+            signup_many(credentials)
+
+
 class LoginTestCase(TestCase):
 
     def setUp(self):
@@ -62,6 +134,19 @@ class LoginTestCase(TestCase):
         self.assertEqual(result.value, self.user)
         self.assertTrue(Token.objects.filter(user=self.user).exists())
 
+    @override_settings(PASSWORD_HASHING_EXECUTOR={'BACKEND': 'user_management.hashing.InlineHashingExecutor'})
+    def test_login_rehashes_with_calibrated_parameters(self):
+        # Recalibrate the hasher, after the password was hashed
+        with override_settings(PASSWORD_HASHER_PARAMETERS={'pbkdf2_sha256': {'iterations': 1000}}):
+            # Call the login function
+            result = login(self.email, self.password)
+
+        # Check if the password is re-hashed with the calibrated parameters
+        self.assertTrue(result.is_ok())
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(self.user.check_password(self.password))
+
     def test_login_invalid_credentials(self):
         # Call the login function with invalid credentials
         result = login('test@example.com', 'wrongpassword')
@@ -156,6 +241,42 @@ class ConfirmEmailTestCase(TestCase):
         self.assertTrue(result.is_err())
         self.assertEqual(result.err().detail, 'Could not confirm email')
 
+    def test_confirm_email_expired(self):
+        self.email_confirmation.expires_at = timezone.now() - timezone.timedelta(seconds=1)
+        self.email_confirmation.save()
+
+        # Call the confirm_email function with an expired code
+        result = confirm_email(self.email_confirmation.user.email, self.email_confirmation.code)
+        self.email_confirmation.refresh_from_db()
+
+        # Check if the confirmation failed as expected, and nothing is changed
+        self.assertTrue(result.is_err())
+        self.assertEqual(result.err().detail, 'Could not confirm email')
+        self.assertIsNone(self.email_confirmation.confirmed_at)
+        self.assertFalse(self.email_confirmation.user.is_active)
+
+    def test_confirm_email_num_queries(self):
+        # User select, then the conditional update and the user activation (plus their savepoints)
+        with self.assertNumQueries(5):
+            result = confirm_email(self.email_confirmation.user.email, self.email_confirmation.code)
+
+        self.assertTrue(result.is_ok())
+
+    async def test_aconfirm_email_activation_failed(self):
+        email = self.email_confirmation.user.email
+        code = self.email_confirmation.code
+
+        # Call the aconfirm_email function, with the activation of the user failing
+        with mock.patch.object(User, 'save', side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            await aconfirm_email(email, code)
+
+        # Check if the confirmation was rolled back with the activation, so the code can be used again
+        await self.email_confirmation.arefresh_from_db()
+        self.assertIsNone(self.email_confirmation.confirmed_at)
+        result = await aconfirm_email(email, code)
+        self.assertTrue(result.is_ok())
+        self.assertTrue(result.value.is_active)
+
 
 class ResendEmailConfirmationTestCase(TestCase):
 
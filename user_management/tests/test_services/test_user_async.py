@@ -0,0 +1,166 @@
+from asgiref.sync import sync_to_async
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from user_management.models.email_confirmation import EmailConfirmation
+from user_management.models.user import User
+from user_management.tests.factories.user import UserFactory
+from user_management.tests.factories.email_confirmation import EmailConfirmationFactory
+from ableton_challenge.errors import UnprocessableContent
+from user_management.services.user import asignup, alogin, aconfirm_email, aresend_email_confirmation
+
+
+class ASignupTestCase(TestCase):
+
+    async def test_asignup_success(self):
+        email = 'test@example.com'
+        password = 'testpassword'
+
+        # Call the asignup function
+        result = await asignup(email, password)
+
+        # Check if the signup was successful
+        self.assertTrue(result.is_ok())
+
+        # Check if email confirmation was sent
+        user = await User.objects.aget(email=email)
+        self.assertFalse(user.is_active)
+        self.assertTrue(await sync_to_async(user.check_password)(password))
+        self.assertTrue(await EmailConfirmation.objects.filter(user=user).aexists())
+
+    async def test_asignup_existing_user(self):
+        existing_user = await sync_to_async(UserFactory)()
+
+        # Call the asignup function with the same email
+        result = await asignup(existing_user.email, 'testpassword')
+
+        # Check if the signup failed as expected
+        self.assertTrue(result.is_err())
+        self.assertIsInstance(result.value, UnprocessableContent)
+        self.assertEqual(result.err().detail, 'User with this email already exists')
+
+
+class ALoginTestCase(TestCase):
+
+    def setUp(self):
+        self.password = 'testpassword'
+        self.email = 'test@example.com'
+        self.user = UserFactory(email=self.email, password=self.password, is_active=True)
+
+    async def test_alogin_success(self):
+        # Call the alogin function
+        result = await alogin(self.email, self.password)
+
+        # Check if the login was successful, and the token is available without a query
+        self.assertTrue(result.is_ok())
+        self.assertEqual(result.value, self.user)
+        self.assertEqual(result.value.auth_token, await Token.objects.aget(user=self.user))
+
+    async def test_alogin_invalid_credentials(self):
+        # Call the alogin function with invalid credentials
+        result = await alogin(self.email, 'wrongpassword')
+
+        # Check if the login failed as expected
+        self.assertTrue(result.is_err())
+        self.assertIsInstance(result.value, AuthenticationFailed)
+        self.assertEqual(result.err().detail, 'Unable to log in with provided credentials.')
+
+    async def test_alogin_inactive_user_unconfirmed_email(self):
+        self.user.is_active = False
+        await self.user.asave()
+        await sync_to_async(EmailConfirmationFactory)(user=self.user)
+
+        # Call the alogin function with inactive user and unconfirmed email
+        result = await alogin(self.email, self.password)
+
+        # Check if the login failed as expected
+        self.assertTrue(result.is_err())
+        self.assertEqual(
+            result.err().detail,
+            'User is not active. please make sure that you have confirmed you email'
+        )
+
+
+class AConfirmEmailTestCase(TestCase):
+
+    def setUp(self):
+        self.email_confirmation = EmailConfirmationFactory()
+        self.user = self.email_confirmation.user
+
+    async def test_aconfirm_email_success(self):
+        # Call the aconfirm_email function
+        result = await aconfirm_email(self.user.email, self.email_confirmation.code)
+
+        # Check if the email confirmation was successful
+        self.assertTrue(result.is_ok())
+        await self.email_confirmation.arefresh_from_db()
+        await self.user.arefresh_from_db()
+        self.assertTrue(self.user.is_active)
+        self.assertIsNotNone(self.email_confirmation.confirmed_at)
+
+    async def test_aconfirm_email_invalid_code(self):
+        # Call the aconfirm_email function with invalid code
+        result = await aconfirm_email(self.user.email, 'invalidcode')
+
+        # Check if the confirmation failed as expected
+        self.assertTrue(result.is_err())
+        self.assertEqual(result.err().detail, 'Could not confirm email')
+
+    async def test_aconfirm_email_already_confirmed(self):
+        self.email_confirmation.confirmed_at = timezone.now()
+        await self.email_confirmation.asave()
+
+        # Call the aconfirm_email function for an already confirmed email
+        result = await aconfirm_email(self.user.email, self.email_confirmation.code)
+
+        # Check if the confirmation failed as expected
+        self.assertTrue(result.is_err())
+        self.assertEqual(result.err().detail, 'Email already confirmed')
+
+    async def test_aconfirm_email_expired(self):
+        self.email_confirmation.expires_at = timezone.now() - timezone.timedelta(seconds=1)
+        await self.email_confirmation.asave()
+
+        # Call the aconfirm_email function with an expired code
+        result = await aconfirm_email(self.user.email, self.email_confirmation.code)
+
+        # Check if the confirmation failed as expected
+        self.assertTrue(result.is_err())
+        self.assertEqual(result.err().detail, 'Could not confirm email')
+
+
+class AResendEmailConfirmationTestCase(TestCase):
+
+    def setUp(self):
+        self.user = UserFactory()
+
+    async def test_aresend_email_confirmation_success(self):
+        # Call the aresend_email_confirmation function twice, to create and then update the code
+        first_result = await aresend_email_confirmation(self.user.email)
+        second_result = await aresend_email_confirmation(self.user.email)
+
+        # Check if the email confirmation resend was successful
+        self.assertTrue(first_result.is_ok())
+        self.assertTrue(second_result.is_ok())
+        email_confirmation = await EmailConfirmation.objects.aget(user=self.user)
+        self.assertEqual(email_confirmation.code, second_result.value.code)
+
+    async def test_aresend_email_confirmation_already_confirmed(self):
+        await sync_to_async(EmailConfirmationFactory)(user=self.user, confirmed_at=timezone.now())
+
+        # Call the aresend_email_confirmation function for an already confirmed email
+        result = await aresend_email_confirmation(self.user.email)
+
+        # Check if the resend failed as expected
+        self.assertTrue(result.is_err())
+        self.assertEqual(result.err().detail, 'Email is already confirmed for this user')
+
+    async def test_aresend_email_confirmation_non_existing_email(self):
+        # Call the aresend_email_confirmation function with non-existing email
+        result = await aresend_email_confirmation('nonexisting@example.com')
+
+        # Check if the resend did nothing
+        self.assertTrue(result.is_ok())
+        self.assertIsNone(result.value)
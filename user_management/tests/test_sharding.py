@@ -0,0 +1,212 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import connections
+from django.db.utils import load_backend
+from django.test import TransactionTestCase, SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from user_management import email_filter
+from user_management.authentication import CachedTokenAuthentication, get_token_cache
+from user_management.models.email_confirmation import EmailConfirmation
+from user_management.models.user import User
+from user_management.services.user import signup, signup_many, login, confirm_email, resend_email_confirmation
+from user_management.sharding import choose_shard, shard_for_email, IdAllocator
+from user_management.signup_reaper import StaleSignupReaper
+from user_management.tests.factories.email_confirmation import EmailConfirmationFactory
+from user_management.user_export import iter_rows
+from user_management.user_import import UserImporter
+
+SHARDS = ['users_0', 'users_1']
+
+
+def _register_database(alias: str, name: str):
+    settings_dict = {**connections['default'].settings_dict, 'NAME': name}
+    connections[alias] = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias)
+
+
+def _unregister_database(alias: str):
+    connections[alias].close()
+    del connections[alias]
+
+
+class ChooseShardTestCase(SimpleTestCase):
+
+    def test_stable(self):
+        self.assertEqual(choose_shard('user@test.com', SHARDS), choose_shard('user@test.com', list(reversed(SHARDS))))
+
+    def test_adding_a_shard_only_moves_users_to_it(self):
+        emails = [f'email.{index}@test.com' for index in range(2000)]
+        shards = ['users_0', 'users_1', 'users_2']
+
+        moved = [email for email in emails if choose_shard(email, shards) != choose_shard(email, shards + ['users_3'])]
+
+        # Check if the moved users all go to the new shard, and they are about 1/4 of the users
+        self.assertTrue(all(choose_shard(email, shards + ['users_3']) == 'users_3' for email in moved))
+        self.assertAlmostEqual(len(moved) / len(emails), 1 / 4, delta=0.05)
+
+    def test_not_sharded(self):
+        self.assertIsNone(shard_for_email('user@test.com'))
+
+
+class ShardingTestCase(TransactionTestCase):
+    """Runs against two more SQLite files as the shards, copied from a migrated template."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.template_directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.template_directory.cleanup)
+        cls.template = os.path.join(cls.template_directory.name, 'template.sqlite3')
+        _register_database('shard_template', cls.template)
+        try:
+            call_command('migrate', database='shard_template', verbosity=0)
+        finally:
+            _unregister_database('shard_template')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for alias in SHARDS:
+            name = os.path.join(directory.name, f'{alias}.sqlite3')
+            shutil.copy(self.template, name)
+            _register_database(alias, name)
+            self.addCleanup(_unregister_database, alias)
+
+        settings_override = override_settings(
+            USER_SHARDING={'SHARDS': SHARDS, 'ID_BLOCK_SIZE': 10},
+            EMAIL_EXISTENCE_FILTER={'ENABLED': True},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_token_cache().clear()
+
+    def _emails_per_shard(self) -> dict:
+        emails = [f'email.{index}@test.com' for index in range(6)]
+        emails_per_shard = {
+            shard: [email for email in emails if choose_shard(email, SHARDS) == shard] for shard in SHARDS
+        }
+        # Check if the test emails are spread over both shards
+        self.assertTrue(all(emails_per_shard.values()))
+        return emails_per_shard
+
+    def test_signup(self):
+        for shard, emails in self._emails_per_shard().items():
+            for email in emails:
+                signup(email, 'testpassword').unwrap()
+
+            # Check if the users and their email confirmations are on their shard
+            self.assertCountEqual(User.objects.using(shard).values_list('email', flat=True), emails)
+            self.assertEqual(EmailConfirmation.objects.using(shard).count(), len(emails))
+        self.assertFalse(User.objects.exists())
+
+        # Check if the ids are unique over the shards
+        ids = [user_id for shard in SHARDS for user_id in User.objects.using(shard).values_list('id', flat=True)]
+        self.assertEqual(len(set(ids)), 6)
+
+        # Check if the existing users are found on their shard
+        email = self._emails_per_shard()['users_1'][0]
+        self.assertTrue(signup(email, 'testpassword').is_err())
+
+    def test_signup_many(self):
+        emails_per_shard = self._emails_per_shard()
+        emails = [email for emails in emails_per_shard.values() for email in emails]
+
+        results = signup_many([(email, 'testpassword') for email in emails])
+
+        self.assertTrue(all(result.is_ok() for result in results))
+        self.assertEqual(len({result.unwrap().id for result in results}), len(emails))
+        for shard, shard_emails in emails_per_shard.items():
+            self.assertCountEqual(User.objects.using(shard).values_list('email', flat=True), shard_emails)
+            self.assertEqual(EmailConfirmation.objects.using(shard).count(), len(shard_emails))
+        self.assertEqual(len(mail.outbox), len(emails))
+
+    def test_confirm_email_login_and_authenticate(self):
+        email = self._emails_per_shard()['users_1'][0]
+        signup(email, 'testpassword').unwrap()
+        resend_email_confirmation(email).unwrap()
+        code = EmailConfirmation.objects.using('users_1').get(user__email=email).code
+
+        # Call the confirm email and login services
+        confirm_email(email, code).unwrap()
+        user = login(email, 'testpassword').unwrap()
+
+        # Check if the token is on the user's shard, and authenticates
+        token = Token.objects.using('users_1').get(user=user)
+        authenticated_user, authenticated_token = CachedTokenAuthentication().authenticate_credentials(token.key)
+        self.assertEqual(authenticated_user.email, email)
+        self.assertEqual(authenticated_token.key, token.key)
+
+    def test_id_allocator_starts_after_the_existing_users(self):
+        user = EmailConfirmationFactory().user
+
+        allocator = IdAllocator('test', block_size=3)
+        ids = allocator.allocate(2) + allocator.allocate(4)
+
+        self.assertEqual(ids, list(range(user.id + 1, user.id + 7)))
+
+    def test_batch_jobs_go_over_the_shards(self):
+        emails_per_shard = self._emails_per_shard()
+        for emails in emails_per_shard.values():
+            for email in emails:
+                signup(email, 'testpassword').unwrap()
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as file:
+            file.write('email,password\nimported@test.com,\n')
+            file.flush()
+            UserImporter(file.name).run()
+
+        # Check if all the users are exported
+        exported_emails = [row[1] for row in iter_rows()]
+        self.assertCountEqual(exported_emails, [email for emails in emails_per_shard.values() for email in emails] + [
+            'imported@test.com',
+        ])
+
+        # Check if the stale signups of all the shards are reaped
+        expired_at = timezone.now() - timezone.timedelta(days=1)
+        for shard in SHARDS:
+            EmailConfirmation.objects.using(shard).update(expires_at=expired_at)
+        stats = StaleSignupReaper(expired_before=timezone.now()).reap()
+        self.assertEqual(stats['deleted'], len(exported_emails) - 1)
+        self.assertEqual(
+            [email for shard in SHARDS for email in User.objects.using(shard).values_list('email', flat=True)],
+            ['imported@test.com'],
+        )
+
+    def test_email_filter_disabled(self):
+        self.assertIsNone(email_filter.get_email_filter())
+
+    def test_reshard_users(self):
+        # Users created before sharding, on the default database
+        email_confirmations = [EmailConfirmationFactory() for _ in range(5)]
+        for email_confirmation in email_confirmations:
+            Token.objects.create(user=email_confirmation.user)
+
+        out = StringIO()
+        call_command('reshard_users', '--from', 'default', '--batch-size', '2', stdout=out)
+
+        self.assertIn('default: moved 5 of 5 users', out.getvalue())
+        self.assertFalse(User.objects.exists())
+        for email_confirmation in email_confirmations:
+            shard = shard_for_email(email_confirmation.user.email)
+            user = User.objects.using(shard).get(id=email_confirmation.user.id)
+            self.assertEqual(user.emailconfirmation.code, str(email_confirmation.code))
+            self.assertTrue(Token.objects.using(shard).filter(user=user).exists())
+
+        # Check if running it again moves nothing
+        out = StringIO()
+        call_command('reshard_users', '--from', 'default', stdout=out)
+        self.assertNotIn('moved 1', out.getvalue())
+
+    def test_reshard_users_dry_run(self):
+        EmailConfirmationFactory()
+
+        out = StringIO()
+        call_command('reshard_users', '--from', 'default', '--dry-run', stdout=out)
+
+        self.assertIn('default: 1 of 1 users to move (dry run)', out.getvalue())
+        self.assertEqual(User.objects.count(), 1)
@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from user_management import signed_tokens
+from user_management.authentication import SignedTokenAuthentication
+from user_management.tests.factories.email_confirmation import EmailConfirmationFactory
+from user_management.tests.factories.user import UserFactory
+
+
+@override_settings(SIGNED_TOKENS={'ENABLED': True, 'TTL': 3600, 'STATE_CACHE': 'default', 'STATE_CACHE_TTL': 60})
+class SignedTokensTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory(is_active=True)
+        self.authentication = SignedTokenAuthentication()
+
+    def _authenticate(self, key: str):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {key}')
+        return self.authentication.authenticate(request)
+
+    def test_parse_token(self):
+        token = signed_tokens.issue_token(self.user)
+
+        self.assertEqual(signed_tokens.parse_token(token.key), token)
+
+    def test_parse_token_tampered(self):
+        token = signed_tokens.issue_token(self.user)
+        _user_id, rest = token.key.split(':', 1)
+
+        self.assertIsNone(signed_tokens.parse_token(f'{self.user.id + 1}:{rest}'))
+        self.assertIsNone(signed_tokens.parse_token('invalid'))
+
+    def test_parse_token_expired(self):
+        token = signed_tokens.issue_token(self.user)
+
+        with mock.patch('user_management.signed_tokens.time.time', return_value=token.expires_at):
+            self.assertIsNone(signed_tokens.parse_token(token.key))
+
+    def test_authenticate(self):
+        token = signed_tokens.issue_token(self.user)
+
+        # The first request queries the state of the user
+        with self.assertNumQueries(1):
+            user, authenticated_token = self._authenticate(token.key)
+
+        # The next ones are served by the cache
+        with self.assertNumQueries(0):
+            user, authenticated_token = self._authenticate(token.key)
+            self.assertTrue(user.is_authenticated)
+            self.assertEqual(user.pk, self.user.pk)
+
+        self.assertEqual(authenticated_token, token)
+        # Check if the other attributes load the user
+        self.assertEqual(user.email, self.user.email)
+
+    def test_authenticate_revoked(self):
+        token = signed_tokens.issue_token(self.user)
+        self._authenticate(token.key)
+
+        signed_tokens.revoke_tokens(self.user)
+
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate(token.key)
+        # Check if the new tokens are valid
+        user, _token = self._authenticate(signed_tokens.issue_token(self.user).key)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_authenticate_deactivated_user(self):
+        token = signed_tokens.issue_token(self.user)
+        self._authenticate(token.key)
+
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'User inactive or deleted.'):
+            self._authenticate(token.key)
+
+    def test_authenticate_deleted_user(self):
+        token = signed_tokens.issue_token(self.user)
+        self.user.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate(token.key)
+
+    def test_login(self):
+        email_confirmation = EmailConfirmationFactory(
+            user__password='testpassword', user__is_active=True, confirmed_at='2024-01-01T00:00:00Z',
+        )
+
+        # Call the login endpoint
+        response = self.client.post(
+            '/user-management/v1/users/login/',
+            {'email': email_confirmation.user.email, 'password': 'testpassword'},
+            content_type='application/json',
+        )
+
+        # Check if the signed token is returned, and no authtoken token is created
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(response.json()), {'email', 'token', 'expires_at'})
+        self.assertIsNotNone(signed_tokens.parse_token(response.json()['token']))
+        self.assertFalse(Token.objects.exists())
@@ -0,0 +1,91 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from user_management.models.email_confirmation import EmailConfirmation
+from user_management.models.user import User
+from user_management.signup_reaper import StaleSignupReaper
+from user_management.tests.factories.email_confirmation import EmailConfirmationFactory
+from user_management.tests.factories.user import UserFactory
+
+
+class StaleSignupReaperTestCase(TestCase):
+
+    def setUp(self):
+        self.expired_at = timezone.now() - timezone.timedelta(days=10)
+        self.stale = [
+            EmailConfirmationFactory(expires_at=self.expired_at).user
+            for _ in range(5)
+        ]
+        self.not_expired = EmailConfirmationFactory().user
+        self.confirmed = EmailConfirmationFactory(
+            expires_at=self.expired_at, confirmed_at=self.expired_at, user=UserFactory(is_active=True),
+        ).user
+        # Deactivated by an admin, after confirming
+        self.deactivated = EmailConfirmationFactory(expires_at=self.expired_at, confirmed_at=self.expired_at).user
+
+    def test_reap(self):
+        # Call the reaper, with chunks smaller than the number of stale signups
+        stats = StaleSignupReaper(expired_before=timezone.now(), chunk_size=2).reap()
+
+        # Check if only the stale signups are deleted, with their email confirmations
+        self.assertEqual(stats['found'], 5)
+        self.assertEqual(stats['deleted'], 5)
+        self.assertFalse(User.objects.filter(id__in=[user.id for user in self.stale]).exists())
+        self.assertEqual(
+            set(User.objects.values_list('id', flat=True)),
+            {self.not_expired.id, self.confirmed.id, self.deactivated.id},
+        )
+        self.assertEqual(EmailConfirmation.objects.count(), 3)
+
+    def test_chunks_with_the_same_expiration_are_not_skipped(self):
+        # Call the reaper in dry run, so the keyset pagination goes through all the rows (nothing is deleted)
+        reaper = StaleSignupReaper(expired_before=timezone.now(), chunk_size=2, dry_run=True)
+        chunks = list(reaper.chunks())
+
+        # Check if every stale signup is found exactly once
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(sorted(sum(chunks, [])), sorted(user.id for user in self.stale))
+
+    def test_user_confirmed_meanwhile_is_not_deleted(self):
+        reaper = StaleSignupReaper(expired_before=timezone.now())
+        user_ids = next(reaper.chunks())
+        EmailConfirmation.objects.filter(user=self.stale[0]).update(confirmed_at=timezone.now())
+
+        # Check if the chunk is filtered again when it is deleted
+        self.assertEqual(reaper.delete_chunk(user_ids), 4)
+        self.assertTrue(User.objects.filter(id=self.stale[0].id).exists())
+
+    def test_grace_period(self):
+        # Call the reaper with the expiration cutoff before the expiration of the stale signups
+        stats = StaleSignupReaper(expired_before=self.expired_at - timezone.timedelta(seconds=1)).reap()
+
+        # Check if nothing is deleted
+        self.assertEqual(stats['deleted'], 0)
+        self.assertEqual(User.objects.count(), 8)
+
+    def test_rate_limit(self):
+        with mock.patch('user_management.signup_reaper.time.sleep') as sleep:
+            StaleSignupReaper(expired_before=timezone.now(), chunk_size=2, max_rows_per_second=1).reap()
+
+        # Check if the reaper sleeps after every chunk, to keep the rate under 1 row/s
+        self.assertEqual(sleep.call_count, 3)
+        self.assertGreater(sleep.call_args_list[0].args[0], 1)
+
+    def test_command_dry_run(self):
+        stdout = StringIO()
+
+        call_command('reap_stale_signups', '--dry-run', stdout=stdout)
+
+        # Check if the stale signups are only counted
+        self.assertIn('Found 5 stale signups', stdout.getvalue())
+        self.assertEqual(User.objects.count(), 8)
+
+    def test_command(self):
+        call_command('reap_stale_signups', '--grace-hours', '1', stdout=StringIO())
+
+        # Check if the stale signups are deleted
+        self.assertEqual(User.objects.count(), 3)
@@ -0,0 +1,55 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+from ableton_challenge.sqlite3.base import DatabaseWrapper
+
+
+class SQLiteBackendTestCase(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.database = {**settings.DATABASES['default'], 'NAME': os.path.join(directory.name, 'test.sqlite3')}
+
+    def _connect(self, **options):
+        connection = DatabaseWrapper({**self.database, 'OPTIONS': options}, 'sqlite_backend_test')
+        connections[connection.alias] = connection
+        self.addCleanup(connections.__delitem__, connection.alias)
+        self.addCleanup(connection.close)
+        return connection
+
+    def _pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_init_command(self):
+        connection = self._connect(**settings.DATABASES['default']['OPTIONS'])
+
+        # Check if the pragmas of the production profile are applied to the new connection
+        self.assertEqual(self._pragma(connection, 'journal_mode'), 'wal')
+        self.assertEqual(self._pragma(connection, 'synchronous'), 1)  # NORMAL
+        self.assertEqual(self._pragma(connection, 'cache_size'), -65536)
+        self.assertEqual(self._pragma(connection, 'busy_timeout'), 20000)
+
+    def test_transaction_mode(self):
+        connection = self._connect(transaction_mode='IMMEDIATE')
+
+        with CaptureQueriesContext(connection) as context:
+            with transaction.atomic(using=connection.alias, durable=True):
+                pass
+
+        # Check if the transaction takes the write lock when it begins
+        self.assertEqual(context.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_invalid_transaction_mode(self):
+        connection = self._connect(transaction_mode='LATER')
+
+        with self.assertRaises(ImproperlyConfigured):
+            connection.ensure_connection()
@@ -0,0 +1,98 @@
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from user_management.throttling import LocalMemoryStore, LoginEmailThrottle, LoginIPThrottle, reset_throttle_store
+from user_management.views.v1 import LoginView
+
+THROTTLE_RATES = {
+    'login_ip': '100/min',
+    'login_email': '3/min',
+}
+
+
+class LocalMemoryStoreTestCase(TestCase):
+
+    def test_incr(self):
+        store = LocalMemoryStore()
+
+        self.assertEqual(store.incr('key', ttl=60), 1)
+        self.assertEqual(store.incr('key', ttl=60), 2)
+        self.assertEqual(store.get_many(['key', 'other']), {'key': 2})
+
+    def test_expired_counter(self):
+        store = LocalMemoryStore()
+        store.incr('key', ttl=-1)
+
+        self.assertEqual(store.get_many(['key']), {})
+        self.assertEqual(store.incr('key', ttl=60), 1)
+
+
+@override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': THROTTLE_RATES})
+class SlidingWindowThrottleTestCase(TestCase):
+
+    def setUp(self):
+        reset_throttle_store(setting='THROTTLE_STORE')
+        self.factory = APIRequestFactory()
+        self.view = LoginView.as_view({'post': 'create'})
+
+    def _login(self, email):
+        request = self.factory.post('/', {'email': email, 'password': 'wrongpassword'}, format='json')
+        return self.view(request)
+
+    @mock.patch('user_management.views.v1.user.login')
+    def test_login_throttled_by_email(self, login_mock):
+        login_mock.side_effect = lambda email, password: mock.Mock(is_err=lambda: False, value=None)
+
+        with mock.patch.object(LoginEmailThrottle, 'timer', return_value=60.0):
+            responses = [self._login('test@example.com') for _ in range(4)]
+            other_email_response = self._login('other@example.com')
+
+        # Check if the over-limit request is rejected before calling the service
+        self.assertEqual([response.status_code for response in responses], [201, 201, 201, 429])
+        self.assertIn('Retry-After', responses[-1])
+        self.assertEqual(other_email_response.status_code, 201)
+        self.assertEqual(login_mock.call_count, 4)
+
+    def test_sliding_window(self):
+        throttle = LoginEmailThrottle()
+        request = mock.Mock(data={'email': 'test@example.com'})
+
+        # 3 requests at the end of a window
+        with mock.patch.object(LoginEmailThrottle, 'timer', return_value=119.0):
+            self.assertTrue(all(throttle.allow_request(request, None) for _ in range(3)))
+
+        # Early in the next window, the previous one still weights almost fully
+        with mock.patch.object(LoginEmailThrottle, 'timer', return_value=121.0):
+            self.assertFalse(throttle.allow_request(request, None))
+
+        # Later in the next window, it weights less
+        with mock.patch.object(LoginEmailThrottle, 'timer', return_value=170.0):
+            self.assertTrue(throttle.allow_request(request, None))
+
+    def test_body_not_an_object(self):
+        request = self.factory.post('/', [1, 2], format='json')
+
+        response = self.view(request)
+
+        # Check if it is rejected by the serializer, rather than failing in the throttle
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'login_ip': '2/min'}})
+class IPThrottleTestCase(TestCase):
+
+    def setUp(self):
+        reset_throttle_store(setting='THROTTLE_STORE')
+        self.factory = APIRequestFactory()
+
+    def test_forwarded_for_not_trusted(self):
+        throttle = LoginIPThrottle()
+        requests = [
+            self.factory.post('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'192.168.0.{i}') for i in range(3)
+        ]
+
+        # Check if the client can not get around the limit by changing the header
+        self.assertEqual([throttle.allow_request(request, None) for request in requests], [True, True, False])
@@ -0,0 +1,153 @@
+import json
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from user_management import tracing
+from user_management.services.user import signup, login
+from user_management.tests.factories.email_confirmation import EmailConfirmationFactory
+
+
+class TracingTestCase(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'traces.jsonl'
+
+        settings_override = override_settings(TRACING={
+            'ENABLED': True,
+            'EXPORTER': 'user_management.tracing.JSONLinesExporter',
+            'OPTIONS': {'path': self.path},
+            'BATCH_SIZE': 1,
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _traces(self) -> list[dict]:
+        # The traces are exported by a background thread, wait for it
+        tracing.get_tracer().flush()
+        return [json.loads(line) for line in self.path.read_text().splitlines()]
+
+    def test_signup(self):
+        signup('user@test.com', 'testpassword').unwrap()
+
+        # Check if the trace has the span of the service, and the child spans of its work
+        [trace] = self._traces()
+        root, *children = trace['spans']
+        self.assertEqual((trace['name'], root['name'], root['parent_id']), ('signup', 'signup', None))
+        names = [span['name'] for span in children]
+        self.assertIn('password.hash', names)
+        self.assertIn('db.query', names)
+        self.assertIn('send_email_confirmation_email', names)
+        self.assertIn('mail.enqueue', names)
+
+        # The nested service is a child span, not another trace
+        send_span = next(span for span in children if span['name'] == 'send_email_confirmation_email')
+        self.assertEqual(send_span['parent_id'], root['span_id'])
+        mail_span = next(span for span in children if span['name'] == 'mail.enqueue')
+        self.assertEqual(mail_span['parent_id'], send_span['span_id'])
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            with tracing.span('failing'):
+                raise ValueError('invalid')
+
+        [trace] = self._traces()
+        self.assertEqual(trace['spans'][0]['error'], 'ValueError: invalid')
+
+    def test_batches(self):
+        email_confirmation = EmailConfirmationFactory(user__password='testpassword')
+        self.path = self.path.with_name('batches.jsonl')
+        with override_settings(TRACING={
+            'ENABLED': True, 'OPTIONS': {'path': self.path}, 'BATCH_SIZE': 3, 'FLUSH_INTERVAL': 60,
+        }):
+            for _ in range(2):
+                login(email_confirmation.user.email, 'testpassword')
+
+            # Check if the traces are buffered until the batch is full
+            self.assertFalse(self.path.exists())
+            login(email_confirmation.user.email, 'testpassword')
+            self.assertEqual([trace['name'] for trace in self._traces()], ['login'] * 3)
+
+    def test_export_does_not_block_the_request(self):
+        started = threading.Event()
+        release = threading.Event()
+        finished = threading.Event()
+
+        def slow_export(traces):
+            started.set()
+            release.wait(5)
+            finished.set()
+
+        tracer = tracing.get_tracer()
+        with mock.patch.object(tracer.exporter, 'export', side_effect=slow_export):
+            with tracing.span('request'):
+                pass
+
+            # Check if the request returned while its trace is still being exported
+            self.assertTrue(started.wait(5))
+            self.assertFalse(finished.is_set())
+            release.set()
+            tracer.flush()
+
+        self.assertTrue(finished.is_set())
+
+    def test_queue_full(self):
+        tracer = tracing.Tracer(mock.Mock(), max_queue_size=1)
+        tracer._start_thread = mock.Mock()
+
+        for name in ('first', 'second'):
+            root = tracing.Span(name)
+            root.end_ns = root.start_ns
+            tracer.record(root)
+
+        # Check if the trace beyond the queue size is dropped, instead of waiting
+        self.assertEqual(tracer.dropped, 1)
+
+    def test_disabled(self):
+        with override_settings(TRACING={'ENABLED': False, 'OPTIONS': {'path': self.path}}):
+            signup('user@test.com', 'testpassword').unwrap()
+            self.assertIs(tracing.span('noop'), tracing.span('noop'))
+
+        self.assertFalse(self.path.exists())
+
+
+class JSONLinesExporterTestCase(SimpleTestCase):
+
+    def test_rotation(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / 'traces.jsonl'
+        exporter = tracing.JSONLinesExporter(path, max_bytes=100, backup_count=2)
+
+        for index in range(5):
+            exporter.export([{'trace_id': str(index), 'padding': 'x' * 50}])
+
+        # Check if only the newest files are kept
+        self.assertEqual(sorted(file.name for file in path.parent.iterdir()), [
+            'traces.jsonl', 'traces.jsonl.1', 'traces.jsonl.2',
+        ])
+        self.assertEqual(json.loads(path.read_text())['trace_id'], '4')
+
+
+class OTLPExporterTestCase(SimpleTestCase):
+
+    def test_to_otlp(self):
+        traces = [{'trace_id': 'a' * 32, 'name': 'login', 'spans': [
+            {'span_id': 'b' * 16, 'parent_id': None, 'name': 'login', 'start_ns': 10, 'duration_ns': 5,
+             'attributes': {}, 'error': None},
+            {'span_id': 'c' * 16, 'parent_id': 'b' * 16, 'name': 'db.query', 'start_ns': 11, 'duration_ns': 1,
+             'attributes': {'alias': 'default'}, 'error': 'OperationalError: locked'},
+        ]}]
+
+        payload = tracing.OTLPExporter().to_otlp(traces)
+
+        root, query = payload['resourceSpans'][0]['scopeSpans'][0]['spans']
+        self.assertEqual((root['traceId'], root['parentSpanId'], root['endTimeUnixNano']), ('a' * 32, '', '15'))
+        self.assertEqual(query['parentSpanId'], 'b' * 16)
+        self.assertEqual(query['attributes'], [{'key': 'alias', 'value': {'stringValue': 'default'}}])
+        self.assertEqual(query['status'], {'code': 2, 'message': 'OperationalError: locked'})
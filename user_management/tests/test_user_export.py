@@ -0,0 +1,97 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from user_management.tests.factories.email_confirmation import EmailConfirmationFactory
+from user_management.tests.factories.user import UserFactory
+from user_management.user_export import FIELDS, encode, iter_rows
+
+
+class UserExportTestCase(TestCase):
+
+    def setUp(self):
+        self.confirmed_at = timezone.now()
+        self.confirmation = EmailConfirmationFactory(confirmed_at=self.confirmed_at)
+        # Without an email confirmation, i.e. a superuser
+        self.user = UserFactory()
+
+    def test_iter_rows(self):
+        rows = list(iter_rows(chunk_size=1))
+
+        # Check if the users are joined with their email confirmations, in the order of their ids
+        self.assertEqual([row[0] for row in rows], [self.confirmation.user.id, self.user.id])
+        self.assertEqual(dict(zip(FIELDS, rows[0]))['confirmed_at'], self.confirmed_at)
+        self.assertEqual(rows[1][-2:], (None, None))
+
+        # Check the watermarks
+        self.assertEqual([row[0] for row in iter_rows(since_id=self.confirmation.user.id)], [self.user.id])
+        self.assertEqual(list(iter_rows(since_date_joined=self.user.date_joined)), [])
+
+    def test_encode_csv(self):
+        content = b''.join(encode(iter_rows(), 'csv')).decode()
+
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([row['email'] for row in rows], [self.confirmation.user.email, self.user.email])
+        self.assertEqual(rows[0]['confirmed_at'], self.confirmed_at.isoformat())
+        self.assertEqual(rows[1]['confirmed_at'], '')
+
+    def test_encode_jsonl_gzip(self):
+        UserFactory.create_batch(3)
+
+        # Check if the stream is a valid gzip file, also when it is compressed in several batches
+        chunks = list(encode(iter_rows(), 'jsonl.gz'))
+        rows = [json.loads(line) for line in gzip.decompress(b''.join(chunks)).decode().splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['confirmed_at'], self.confirmed_at.isoformat())
+        self.assertEqual(list(rows[0]), list(FIELDS))
+
+    def test_command_with_watermark_file(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        output = Path(directory.name) / 'users.csv'
+        watermark_file = Path(directory.name) / 'watermark.json'
+
+        call_command('export_users', f'--output={output}', f'--watermark-file={watermark_file}', stderr=io.StringIO())
+        self.assertEqual(len(output.read_text().splitlines()), 3)
+        self.assertEqual(json.loads(watermark_file.read_text())['id'], self.user.id)
+
+        # Check if the next export only has the users created since
+        new_user = UserFactory()
+        call_command('export_users', f'--output={output}', f'--watermark-file={watermark_file}', stderr=io.StringIO())
+        self.assertEqual(list(csv.DictReader(output.open()))[0]['id'], str(new_user.id))
+
+
+class ExportUsersViewTestCase(TestCase):
+
+    def test_export(self):
+        EmailConfirmationFactory.create_batch(2)
+        self.client.force_login(UserFactory(is_staff=True, is_active=True))
+
+        response = self.client.get('/user-management/v1/users/export', {'output_format': 'jsonl.gz'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).splitlines()
+        self.assertEqual(len(lines), 3)
+
+    def test_staff_only(self):
+        self.client.force_login(UserFactory(is_active=True))
+
+        response = self.client.get('/user-management/v1/users/export')
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_invalid_watermark(self):
+        self.client.force_login(UserFactory(is_staff=True, is_active=True))
+
+        response = self.client.get('/user-management/v1/users/export', {'since_id': 'x'})
+
+        self.assertEqual(response.status_code, 400)
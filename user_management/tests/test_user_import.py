@@ -0,0 +1,100 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import TestCase
+
+from user_management.models.email_confirmation import EmailConfirmation
+from user_management.models.user import User
+from user_management.tests.factories.user import UserFactory
+from user_management.user_import import UserImporter
+
+
+class UserImporterTestCase(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.password_hash = make_password('legacy-password')
+
+    def _write_csv(self, rows: list[str]) -> str:
+        path = self.directory / 'users.csv'
+        path.write_text('\n'.join(['email,password,confirmed_at,first_name'] + rows) + '\n')
+        return str(path)
+
+    def test_import_csv(self):
+        UserFactory(email='existing@test.com')
+        path = self._write_csv([
+            f'confirmed@test.com,{self.password_hash},2020-01-02T03:04:05+00:00,Jane',
+            f'unconfirmed@TEST.com,{self.password_hash},,',
+            f'existing@test.com,{self.password_hash},,',
+            f'confirmed@test.com,{self.password_hash},,',
+            'invalid-email,,,',
+            'hash@test.com,plain-password,,',
+            'unusable@test.com,,,',
+        ])
+
+        # Call the importer, with chunks smaller than the file
+        with self.assertLogs('user_management.user_import', 'WARNING') as logs:
+            stats = UserImporter(path, chunk_size=2).run()
+
+        # Check if only the valid new users are inserted, with their hashes as they are
+        self.assertEqual((stats['read'], stats['imported'], stats['confirmed']), (7, 3, 1))
+        self.assertEqual((stats['duplicates'], stats['invalid']), (2, 2))
+        self.assertIn('Skipped line 6', logs.output[0])
+        confirmed = User.objects.get(email='confirmed@test.com')
+        self.assertEqual((confirmed.first_name, confirmed.is_active), ('Jane', True))
+        self.assertTrue(confirmed.check_password('legacy-password'))
+        self.assertEqual(EmailConfirmation.objects.get(user=confirmed).confirmed_at.year, 2020)
+
+        unconfirmed = User.objects.get(email='unconfirmed@test.com')
+        self.assertFalse(unconfirmed.is_active)
+        self.assertFalse(EmailConfirmation.objects.filter(user=unconfirmed).exists())
+        self.assertFalse(User.objects.get(email='unusable@test.com').has_usable_password())
+
+    def test_import_jsonl(self):
+        path = self.directory / 'users.jsonl'
+        path.write_text('\n'.join([
+            json.dumps({'email': 'first@test.com', 'password': self.password_hash, 'is_active': True}),
+            '{not json',
+            '',
+            json.dumps({'email': 'second@test.com', 'password': self.password_hash}),
+        ]))
+
+        with self.assertLogs('user_management.user_import', 'WARNING'):
+            stats = UserImporter(str(path)).run()
+
+        self.assertEqual((stats['imported'], stats['invalid']), (2, 1))
+        self.assertTrue(User.objects.get(email='first@test.com').is_active)
+
+    def test_resume_from_checkpoint(self):
+        path = self._write_csv([f'user{index}@test.com,{self.password_hash},,' for index in range(5)])
+        checkpoint_path = self.directory / 'users.csv.checkpoint'
+        # As if the import was interrupted after its first chunk
+        checkpoint_path.write_text(json.dumps({'rows': 2}))
+
+        stats = UserImporter(path, chunk_size=2, checkpoint_path=str(checkpoint_path)).run()
+
+        # Check if the import starts after the rows done, and records its progress
+        self.assertEqual((stats['resumed_after'], stats['read'], stats['imported']), (2, 3, 3))
+        self.assertEqual(
+            set(User.objects.values_list('email', flat=True)), {f'user{index}@test.com' for index in (2, 3, 4)},
+        )
+        self.assertEqual(json.loads(checkpoint_path.read_text())['rows'], 5)
+
+    def test_command(self):
+        path = self._write_csv([f'user{index}@test.com,{self.password_hash},,' for index in range(3)])
+        out = StringIO()
+
+        call_command('import_users', path, '--chunk-size=2', stdout=out)
+        call_command('import_users', path, stdout=out)
+
+        # Check if the second run resumes after the whole file
+        self.assertEqual(User.objects.count(), 3)
+        self.assertIn('Imported 3 of 3 users', out.getvalue())
+        self.assertIn('Resumed after the first 3 rows', out.getvalue())
+        self.assertTrue(Path(f'{path}.checkpoint').exists())
@@ -0,0 +1,95 @@
+import json
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from user_management.models.user import User
+from user_management.tests.factories.email_confirmation import EmailConfirmationFactory
+from user_management.throttling import reset_throttle_store
+
+THROTTLE_RATES = {
+    'login_ip': '100/min',
+    'login_email': '2/min',
+    'resend_email_confirmation_ip': '100/min',
+    'resend_email_confirmation_email': '100/min',
+}
+
+
+@override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': THROTTLE_RATES})
+class AsyncViewsTestCase(TestCase):
+
+    def setUp(self):
+        reset_throttle_store(setting='THROTTLE_STORE')
+        self.confirmed = EmailConfirmationFactory(
+            user__is_active=True, user__password='testpassword', confirmed_at=timezone.now(),
+        )
+        self.unconfirmed = EmailConfirmationFactory(user__password='testpassword')
+
+    async def _post(self, path: str, data):
+        return await self.async_client.post(
+            f'/user-management/v1/async/users/{path}', json.dumps(data), content_type='application/json',
+        )
+
+    async def test_signup(self):
+        response = await self._post('signup', {'email': 'user@test.com', 'password': 'testpassword'})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await User.objects.filter(email='user@test.com').aexists())
+
+    async def test_signup_existing_email(self):
+        response = await self._post('signup', {'email': self.confirmed.user.email, 'password': 'testpassword'})
+
+        self.assertEqual(response.status_code, 422)
+
+    async def test_signup_existing_email_not_normalized(self):
+        local_part, domain = self.confirmed.user.email.split('@')
+
+        response = await self._post('signup', {'email': f'{local_part}@{domain.upper()}', 'password': 'testpassword'})
+
+        self.assertEqual(response.status_code, 422)
+
+    async def test_signup_created_concurrently(self):
+        # The user is created by another request between the existence check and the insert
+        with mock.patch('django.db.models.QuerySet.aexists', new_callable=mock.AsyncMock, return_value=False):
+            response = await self._post('signup', {'email': self.confirmed.user.email, 'password': 'testpassword'})
+
+        self.assertEqual(response.status_code, 422)
+
+    async def test_login(self):
+        response = await self._post('login', {'email': self.confirmed.user.email, 'password': 'testpassword'})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('token', response.json())
+
+    async def test_login_throttled_by_email(self):
+        data = {'email': self.confirmed.user.email, 'password': 'wrongpassword'}
+
+        responses = [await self._post('login', data) for _ in range(3)]
+
+        # Check if the body is still readable by the view after the throttles parsed it
+        self.assertEqual([response.status_code for response in responses], [401, 401, 429])
+        self.assertIn('Retry-After', responses[-1])
+
+    async def test_login_invalid_body(self):
+        response = await self._post('login', [1, 2])
+        not_json_response = await self.async_client.post(
+            '/user-management/v1/async/users/login', '{not json', content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(not_json_response.status_code, 400)
+
+    async def test_resend_email_confirmation(self):
+        response = await self._post('resend-email-confirmation', {'email': self.unconfirmed.user.email})
+
+        self.assertEqual(response.status_code, 200)
+
+    async def test_confirm_email(self):
+        response = await self._post(
+            'confirm-email', {'email': self.unconfirmed.user.email, 'code': str(self.unconfirmed.code)},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        await self.unconfirmed.user.arefresh_from_db()
+        self.assertTrue(self.unconfirmed.user.is_active)
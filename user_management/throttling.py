@@ -0,0 +1,194 @@
+"""
+Sliding window throttles, to reject (i.e. brute-force) requests with 429 before any database or hashing work.
+
+The counters live in a pluggable store, configured by the `THROTTLE_STORE` setting, i.e.:
+
+    # A single process
+    THROTTLE_STORE = {'BACKEND': 'user_management.throttling.LocalMemoryStore'}
+    # Multiple processes, sharing a Django cache (use `DatabaseCache` backend to keep them in the database)
+    THROTTLE_STORE = {'BACKEND': 'user_management.throttling.CacheStore', 'OPTIONS': {'cache': 'default'}}
+
+The rates are configured by `REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']`, the same as DRF throttles.
+"""
+import threading
+import time
+from collections.abc import Mapping
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import ParseError
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LocalMemoryStore:
+    """Keeps the counters in the memory of the current process."""
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, ttl: float) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expires_at, count = self._counters.get(key, (0, 0))
+            if expires_at <= now:
+                count = 0
+                expires_at = now + ttl
+            self._counters[key] = (expires_at, count + 1)
+
+            if len(self._counters) > self.max_entries:
+                self._purge(now)
+            return count + 1
+
+    def get_many(self, keys: list[str]) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key: count for key, (expires_at, count) in
+                ((key, self._counters.get(key, (0, 0))) for key in keys)
+                if expires_at > now
+            }
+
+    def _purge(self, now: float):
+        self._counters = {key: entry for key, entry in self._counters.items() if entry[0] > now}
+
+
+class CacheStore:
+    """Keeps the counters in a Django cache, shared between the processes."""
+
+    def __init__(self, cache: str = 'default'):
+        self.cache = caches[cache]
+
+    def incr(self, key: str, ttl: float) -> int:
+        self.cache.add(key, 0, timeout=ttl)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Expired between add and incr
+            self.cache.set(key, 1, timeout=ttl)
+            return 1
+
+    def get_many(self, keys: list[str]) -> dict:
+        return self.cache.get_many(keys)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_throttle_store():
+    """Returns the (per process) throttle store, configured by `THROTTLE_STORE` setting."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = getattr(settings, 'THROTTLE_STORE', {})
+                backend = import_string(config.get('BACKEND', 'user_management.throttling.LocalMemoryStore'))
+                _store = backend(**config.get('OPTIONS', {}))
+    return _store
+
+
+@receiver(setting_changed)
+def reset_throttle_store(setting, **kwargs):
+    global _store
+    if setting in ('THROTTLE_STORE', 'CACHES'):
+        _store = None
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Throttles by a sliding window counter: the count of the current fixed window plus the count of the previous
+    window weighted by how much of it still overlaps the sliding window.
+
+    The rejected requests are counted as well, so a client which keeps retrying stays throttled.
+    """
+
+    timer = time.time
+
+    def get_rate(self):
+        # Read from the (reloadable) settings, instead of the class attribute bound at import time
+        self.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+        return super().get_rate()
+
+    def get_ident_value(self, request) -> Optional[str]:
+        raise NotImplementedError('.get_ident_value() must be overridden')
+
+    def get_cache_key(self, request, view):
+        ident = self.get_ident_value(request)
+        if not ident:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        self.now = self.timer()
+        window, self.elapsed = divmod(self.now, self.duration)
+        current_key, previous_key = f'{key}:{int(window)}', f'{key}:{int(window) - 1}'
+
+        store = get_throttle_store()
+        current_count = store.incr(current_key, ttl=2 * self.duration)
+        previous_count = store.get_many([previous_key]).get(previous_key, 0)
+        self.previous_count, self.current_count = previous_count, current_count
+
+        return self._estimated_count() <= self.num_requests
+
+    def wait(self):
+        # The previous window's weight drops linearly, find when the estimate is back under the limit
+        if self.current_count > self.num_requests:
+            return self.duration - self.elapsed
+        if not self.previous_count:
+            return None
+        overlap = (self.num_requests - self.current_count) / self.previous_count
+        return max(self.duration * (1 - overlap) - self.elapsed, 0)
+
+    def _estimated_count(self) -> float:
+        return self.previous_count * (1 - self.elapsed / self.duration) + self.current_count
+
+
+class IPThrottle(SlidingWindowThrottle):
+
+    def get_ident_value(self, request):
+        return self.get_ident(request)
+
+
+class EmailThrottle(SlidingWindowThrottle):
+
+    def get_ident_value(self, request):
+        try:
+            data = request.data
+        except ParseError:
+            # Invalid body, left for the serializer to reject
+            return None
+        if not isinstance(data, Mapping):
+            # i.e. a JSON list, also left for the serializer to reject
+            return None
+        email = data.get('email')
+        return email.strip().lower() if isinstance(email, str) else None
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = 'login_ip'
+
+
+class LoginEmailThrottle(EmailThrottle):
+    scope = 'login_email'
+
+
+class ResendEmailConfirmationIPThrottle(IPThrottle):
+    scope = 'resend_email_confirmation_ip'
+
+
+class ResendEmailConfirmationEmailThrottle(EmailThrottle):
+    scope = 'resend_email_confirmation_email'
@@ -0,0 +1,375 @@
+"""
+Lightweight tracing of the services: each call of a `traced` service is a trace, made of its span and the child
+spans of its SQL queries, password hashing and email enqueueing (and of the other `span` blocks it runs).
+Configured by the `TRACING` setting, i.e.:
+
+    TRACING = {
+        'ENABLED': True,
+        # Rotated JSON lines file, one trace per line
+        'EXPORTER': 'user_management.tracing.JSONLinesExporter',
+        'OPTIONS': {'path': BASE_DIR / 'traces' / 'traces.jsonl', 'max_bytes': 10 * 1024 * 1024, 'backup_count': 5},
+        # Or an OpenTelemetry collector, by OTLP/HTTP (JSON)
+        # 'EXPORTER': 'user_management.tracing.OTLPExporter',
+        # 'OPTIONS': {'endpoint': 'http://localhost:4318/v1/traces'},
+        'BATCH_SIZE': 100,  # Traces buffered in memory before they are exported
+        'FLUSH_INTERVAL': 5,  # Seconds, the buffered traces are exported sooner when this has passed
+        'MAX_QUEUE_SIZE': 10000,  # Traces waiting for the export, beyond that the new ones are dropped
+    }
+
+The traces are exported by a background (daemon) thread of each process, so the requests never wait for the
+exporter (i.e. the POST to the collector), and a slow or unreachable collector only makes traces be dropped.
+
+When it is disabled, a `traced` service only checks a module variable before calling the service,
+and `span` returns a shared no-op context manager, see `benchmarks/tracing.py` for their overhead.
+The buffer is also flushed at the exit of the process.
+"""
+import atexit
+import contextlib
+import functools
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    __slots__ = (
+        'trace_id', 'span_id', 'parent_id', 'root', 'name', 'attributes', 'start_ns', 'end_ns', 'error', 'children',
+    )
+
+    def __init__(self, name: str, parent: Optional['Span'] = None, attributes: Optional[dict] = None):
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.root = parent.root if parent is not None else self
+        self.name = name
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        # All the other spans of the trace, kept by its root span
+        self.children = []
+
+    def to_dict(self) -> dict:
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_ns': self.start_ns,
+            'duration_ns': self.end_ns - self.start_ns,
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar('tracing_current_span', default=None)
+
+
+class JSONLinesExporter:
+    """Appends the traces to a JSON lines file, which is rotated (`path.1`, `path.2`, ...) beyond `max_bytes`."""
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+
+    def export(self, traces: list[dict]):
+        lines = ''.join(json.dumps(trace, default=str) + '\n' for trace in traces)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.path.exists() and self.path.stat().st_size + len(lines) > self.max_bytes:
+                self._rotate()
+            with open(self.path, 'a') as file:
+                file.write(lines)
+
+    def _rotate(self):
+        for index in range(self.backup_count - 1, 0, -1):
+            source = self.path.with_name(f'{self.path.name}.{index}')
+            if source.exists():
+                os.replace(source, self.path.with_name(f'{self.path.name}.{index + 1}'))
+        if self.backup_count:
+            os.replace(self.path, self.path.with_name(f'{self.path.name}.1'))
+        else:
+            self.path.unlink()
+
+
+class OTLPExporter:
+    """Posts the traces to an OpenTelemetry collector, by OTLP/HTTP with the JSON encoding."""
+
+    def __init__(self, endpoint: str = 'http://localhost:4318/v1/traces', service_name: str = 'ableton_challenge',
+                 timeout: float = 5):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def export(self, traces: list[dict]):
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(self.to_otlp(traces)).encode(), method='POST',
+            headers={'Content-Type': 'application/json'},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+    def to_otlp(self, traces: list[dict]) -> dict:
+        spans = [
+            {
+                'traceId': trace['trace_id'],
+                'spanId': span['span_id'],
+                'parentSpanId': span['parent_id'] or '',
+                'name': span['name'],
+                'kind': 1,  # Internal
+                'startTimeUnixNano': str(span['start_ns']),
+                'endTimeUnixNano': str(span['start_ns'] + span['duration_ns']),
+                'attributes': [
+                    {'key': key, 'value': {'stringValue': str(value)}} for key, value in span['attributes'].items()
+                ],
+                'status': {'code': 2, 'message': span['error']} if span['error'] else {'code': 1},
+            }
+            for trace in traces for span in trace['spans']
+        ]
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]},
+            'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}],
+        }]}
+
+
+class _Flush:
+    """Queued by `Tracer.flush`, the export thread sets its event once it has exported the traces queued before."""
+
+    def __init__(self, stop: bool = False):
+        self.stop = stop
+        self.done = threading.Event()
+
+
+class Tracer:
+    """Queues the completed traces, and exports them in batches, from a background thread."""
+
+    def __init__(self, exporter, batch_size: int = 100, flush_interval: float = 5, max_queue_size: int = 10000):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+
+    def record(self, root: Span):
+        trace = {
+            'trace_id': root.trace_id,
+            'name': root.name,
+            'spans': [root.to_dict()] + [span.to_dict() for span in root.children],
+        }
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            # The exporter does not keep up (i.e. the collector is down), tracing must never slow down the requests
+            with self._lock:
+                self.dropped += 1
+            return
+        self._start_thread()
+
+    def flush(self, timeout: float = 10):
+        """Exports the traces recorded so far, waiting up to `timeout` seconds for the export thread."""
+        self._request_flush(_Flush(), timeout)
+
+    def shutdown(self, timeout: float = 10):
+        """Same as `flush`, then stops the export thread."""
+        self._request_flush(_Flush(stop=True), timeout)
+
+    def _request_flush(self, flush: _Flush, timeout: float):
+        if not self._is_thread_alive():
+            # Never started (or stopped), the traces are exported by the caller
+            self._export(self._drain())
+            return
+        try:
+            self._queue.put(flush, timeout=timeout)
+        except queue.Full:
+            return
+        flush.done.wait(timeout)
+
+    def _is_thread_alive(self) -> bool:
+        # After a fork, the thread of the parent process is not running in the child
+        return self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive()
+
+    def _start_thread(self):
+        if self._is_thread_alive():
+            return
+        with self._lock:
+            if not self._is_thread_alive():
+                self._thread = threading.Thread(target=self._run, name='tracing-export', daemon=True)
+                self._thread_pid = os.getpid()
+                self._thread.start()
+
+    def _run(self):
+        batch = []
+        flush_at = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(flush_at - time.monotonic(), 0))
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, _Flush):
+                self._export(batch)
+                batch = []
+                flush_at = time.monotonic() + self.flush_interval
+                item.done.set()
+                if item.stop:
+                    return
+                continue
+
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size or time.monotonic() >= flush_at:
+                self._export(batch)
+                batch = []
+                flush_at = time.monotonic() + self.flush_interval
+
+    def _drain(self) -> list[dict]:
+        traces = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return traces
+            if isinstance(item, _Flush):
+                item.done.set()
+            else:
+                traces.append(item)
+
+    def _export(self, traces: list[dict]):
+        for start in range(0, len(traces), self.batch_size):
+            batch = traces[start:start + self.batch_size]
+            try:
+                self.exporter.export(batch)
+            except Exception:
+                # Tracing must never fail the traced services, the batch is dropped
+                logger.exception(f'Could not export {len(batch)} traces')
+
+
+_UNSET = object()
+_tracer = _UNSET
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Returns the (per process) tracer, or None if tracing is disabled by `TRACING` setting."""
+    global _tracer
+    if _tracer is _UNSET:
+        with _tracer_lock:
+            if _tracer is _UNSET:
+                config = getattr(settings, 'TRACING', {})
+                if not config.get('ENABLED', False):
+                    _tracer = None
+                else:
+                    exporter = import_string(config.get('EXPORTER', 'user_management.tracing.JSONLinesExporter'))
+                    _tracer = Tracer(
+                        exporter(**config.get('OPTIONS', {})),
+                        batch_size=config.get('BATCH_SIZE', 100),
+                        flush_interval=config.get('FLUSH_INTERVAL', 5),
+                        max_queue_size=config.get('MAX_QUEUE_SIZE', 10000),
+                    )
+    return _tracer
+
+
+@receiver(setting_changed)
+def reset_tracer(setting, **kwargs):
+    global _tracer
+    if setting == 'TRACING':
+        if isinstance(_tracer, Tracer):
+            _tracer.shutdown()
+        _tracer = _UNSET
+
+
+@atexit.register
+def _flush_at_exit():
+    if isinstance(_tracer, Tracer):
+        _tracer.shutdown()
+
+
+class _QuerySpans:
+    """Records a child span of the current span for every SQL query, while it is entered."""
+
+    def __call__(self, execute, sql, params, many, context):
+        with span('db.query', alias=context['connection'].alias, sql=sql[:200]):
+            return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = contextlib.ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+
+@contextlib.contextmanager
+def _span(name: str, attributes: dict):
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    token = _current_span.set(current)
+    try:
+        if parent is None:
+            with _QuerySpans():
+                yield current
+        else:
+            yield current
+    except BaseException as error:
+        current.error = f'{type(error).__name__}: {error}'
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        if parent is None:
+            get_tracer().record(current)
+        else:
+            current.root.children.append(current)
+
+
+_NOOP = contextlib.nullcontext()
+
+
+def span(name: str, **attributes):
+    """
+    Returns a context manager timing the block as a span, the child of the current span (if any).
+    A block outside of any span is the root span of a new trace.
+    """
+    if get_tracer() is None:
+        return _NOOP
+    return _span(name, attributes)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Runs every call of the (sync) function in a span, named after the function by default."""
+
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -8,6 +8,16 @@ router.register('v1/users/signup', v1.SignupView)
 router.register('v1/users/login', v1.LoginView)
 urlpatterns = router.urls
 urlpatterns += [
+    path('v1/users/signup/bulk', v1.bulk_signup_view),
     path('v1/users/resend-email-confirmation', v1.resend_email_confirmation_view),
     path('v1/users/confirm-email', v1.confirm_email_view),
+    path('v1/users/confirm-email-link', v1.confirm_email_link_view),
+    path('v1/users/export', v1.export_users_view),
+
+    # Async views, for running under ASGI
+    path('v1/async/users/signup', v1.asignup_view),
+    path('v1/async/users/login', v1.alogin_view),
+    path('v1/async/users/resend-email-confirmation', v1.aresend_email_confirmation_view),
+    path('v1/async/users/confirm-email', v1.aconfirm_email_view),
+    path('v1/async/users/confirm-email-link', v1.aconfirm_email_link_view),
 ]
@@ -0,0 +1,97 @@
+"""
+Export of the users with the status of their email confirmation (see `export_users` command and
+`export_users_view`), as CSV or as gzipped JSON lines, with the columns of `FIELDS`.
+
+The rows are read by `iterator(chunk_size=...)` (a server-side cursor where the database has them, i.e. PostgreSQL),
+as tuples rather than model instances, and encoded as they come, so the memory does not grow with the table.
+
+For the incremental exports, only the users after a watermark are exported: the last exported id (`since_id`)
+and/or the last `date_joined` (`since_date_joined`). The rows are ordered by id, so the last row of an export is
+the watermark of the next one.
+
+Caveat: When the users are sharded (see `user_management.sharding`), the shards are exported one after the other,
+each ordered by id, and since the ids are reserved in blocks, a user created later may get a lower id than the
+watermark. In that case, export since a watermark some blocks (USER_SHARDING["ID_BLOCK_SIZE"]) behind, and drop
+the rows exported twice by their id.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from user_management.models.user import User
+from user_management.sharding import get_shards
+
+FIELDS = ('id', 'email', 'first_name', 'last_name', 'is_active', 'date_joined', 'confirmed_at', 'expires_at')
+FORMATS = ('csv', 'jsonl.gz')
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl.gz': 'application/gzip'}
+
+
+def iter_rows(since_id: Optional[int] = None, since_date_joined: Optional[datetime] = None,
+              chunk_size: int = 2000) -> Iterator[tuple]:
+    """Yields the rows (tuples of `FIELDS`) of the users after the watermark, of each shard."""
+    for db in get_shards() or [None]:
+        queryset = User.objects.using(db).order_by('id')
+        if since_id is not None:
+            queryset = queryset.filter(id__gt=since_id)
+        if since_date_joined is not None:
+            queryset = queryset.filter(date_joined__gt=since_date_joined)
+        yield from queryset.values_list(
+            'id', 'email', 'first_name', 'last_name', 'is_active', 'date_joined',
+            'emailconfirmation__confirmed_at', 'emailconfirmation__expires_at',
+        ).iterator(chunk_size=chunk_size)
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_csv(rows: Iterable[tuple], batch_size: int = 500) -> Iterator[bytes]:
+    """Yields the CSV of the rows (with a header), `batch_size` rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(['' if value is None else _value(value) for value in row])
+        if count % batch_size == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def encode_jsonl_gzip(rows: Iterable[tuple], batch_size: int = 500) -> Iterator[bytes]:
+    """Yields the gzip stream of the rows as JSON lines, compressed `batch_size` rows at a time."""
+    compressor = zlib.compressobj(wbits=31)  # gzip header and trailer
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(FIELDS, map(_value, row)))) + '\n')
+        if len(lines) == batch_size:
+            compressed = compressor.compress(''.join(lines).encode())
+            lines = []
+            if compressed:
+                yield compressed
+    yield compressor.compress(''.join(lines).encode()) + compressor.flush()
+
+
+def encode(rows: Iterable[tuple], file_format: str) -> Iterator[bytes]:
+    return encode_csv(rows) if file_format == 'csv' else encode_jsonl_gzip(rows)
+
+
+class Watermark:
+    """Keeps the last id and `date_joined` of the rows going through it."""
+
+    def __init__(self, rows: Iterable[tuple]):
+        self.rows = rows
+        self.id = None
+        self.date_joined = None
+        self.count = 0
+
+    def __iter__(self) -> Iterator[tuple]:
+        for row in self.rows:
+            self.count += 1
+            self.id = row[0] if self.id is None else max(self.id, row[0])
+            self.date_joined = row[5] if self.date_joined is None else max(self.date_joined, row[5])
+            yield row
@@ -0,0 +1,239 @@
+"""
+Bulk import of the users of another system (see `import_users` command), from a CSV file (with a header row)
+or a JSON lines file, with the columns:
+
+    email           Required, normalized as by `UserManager`
+    password        The hash, in Django's format (i.e. `pbkdf2_sha256$<iterations>$<salt>$<hash>`, or the other
+                    installed hashers, see PASSWORD_HASHERS setting), it is stored as is. Empty for an unusable one
+    confirmed_at    Optional ISO 8601 datetime, the users with one get a confirmed `EmailConfirmation`
+    is_active       Optional, by default the users are active when their email is confirmed
+    date_joined, first_name, last_name
+                    Optional
+
+The file is streamed, and the users are inserted by `bulk_create` in chunks, each in its own transaction, so the
+memory does not grow with the file, and no password is hashed again. The rows with an email which already exists
+(or appears earlier in the file) are skipped, as are the invalid ones (logged with their line).
+
+After each chunk, the number of rows done is written to the checkpoint file, and a later import of the same file
+starts after them, so an interrupted import can be run again.
+
+Caveat: The imported users get no `post_save` signal, so they are not in the email existence filters of the
+running processes until their next refresh (see `email_filter` module).
+"""
+import csv
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from user_management.models.email_confirmation import EmailConfirmation
+from user_management.models.user import User
+from user_management.services.email_confirmation import generate_code
+from user_management.sharding import allocate_user_ids, is_sharded, shard_for_email
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+TRUE_VALUES = ('1', 'true', 'yes', 't', 'y')
+
+
+def detect_format(path: str) -> str:
+    return 'jsonl' if Path(path).suffix.lower() in ('.jsonl', '.ndjson', '.json') else 'csv'
+
+
+def read_rows(path: str, file_format: str) -> Iterator[tuple[int, dict]]:
+    """Yields the (line number, row) pairs of the file, one at a time."""
+    with open(path, newline='' if file_format == 'csv' else None, encoding='utf-8') as file:
+        if file_format == 'csv':
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError:
+                    yield line_number, None
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def _parse_datetime(value) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise InvalidRow(f'Invalid datetime: {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def build_user(row: dict) -> User:
+    """Returns the (unsaved) user of the row, with its `confirmed_at`, or raises `InvalidRow`."""
+    if not isinstance(row, dict):
+        raise InvalidRow('Not a JSON object')
+    email = User.objects.normalize_email((row.get('email') or '').strip())
+    try:
+        validate_email(email)
+    except ValidationError:
+        raise InvalidRow(f'Invalid email: {email!r}')
+
+    password = row.get('password') or ''
+    if password:
+        try:
+            identify_hasher(password)
+        except ValueError:
+            raise InvalidRow(f'Unknown password hash format for {email}')
+    else:
+        password = make_password(None)
+
+    confirmed_at = _parse_datetime(row.get('confirmed_at'))
+    is_active = row.get('is_active')
+    user = User(
+        email=email,
+        password=password,
+        first_name=row.get('first_name') or '',
+        last_name=row.get('last_name') or '',
+        is_staff=False,
+        is_superuser=False,
+        is_active=confirmed_at is not None if is_active in (None, '') else _parse_bool(is_active),
+        date_joined=_parse_datetime(row.get('date_joined')) or timezone.now(),
+    )
+    user.confirmed_at = confirmed_at
+    return user
+
+
+class Checkpoint:
+    """The number of rows of the file which are done, kept in a small JSON file."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = Path(path) if path else None
+
+    def load(self) -> int:
+        if self.path is None or not self.path.exists():
+            return 0
+        return json.loads(self.path.read_text())['rows']
+
+    def save(self, rows: int, stats: dict):
+        if self.path is None:
+            return
+        # Written aside and renamed, so an interruption never leaves a partial checkpoint
+        temporary_path = self.path.with_name(f'{self.path.name}.tmp')
+        temporary_path.write_text(json.dumps({'rows': rows, **stats}))
+        os.replace(temporary_path, self.path)
+
+
+class UserImporter:
+
+    def __init__(self, path: str, file_format: Optional[str] = None, chunk_size: int = 1000,
+                 checkpoint_path: Optional[str] = None):
+        self.path = path
+        self.file_format = file_format or detect_format(path)
+        self.chunk_size = chunk_size
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.read = 0
+        self.imported = 0
+        self.confirmed = 0
+        self.duplicates = 0
+        self.invalid = 0
+
+    def chunks(self, skip: int = 0) -> Iterator[list[User]]:
+        """Yields the valid users of the rows after the first `skip` ones, `chunk_size` rows at a time."""
+        users = []
+        for row_number, (line_number, row) in enumerate(read_rows(self.path, self.file_format), start=1):
+            if row_number <= skip:
+                continue
+            self.read += 1
+            try:
+                users.append(build_user(row))
+            except InvalidRow as error:
+                self.invalid += 1
+                logger.warning('Skipped line %d of %s: %s', line_number, self.path, error)
+
+            if self.read % self.chunk_size == 0:
+                yield users
+                users = []
+        if self.read % self.chunk_size:
+            yield users
+
+    def import_chunk(self, users: list[User]):
+        """Inserts the users of the chunk whose email is new, with their email confirmations, per shard."""
+        users_by_email = {}
+        for user in users:
+            if user.email in users_by_email:
+                self.duplicates += 1
+            else:
+                users_by_email[user.email] = user
+
+        emails_by_db = {}
+        for email in users_by_email:
+            emails_by_db.setdefault(shard_for_email(email), []).append(email)
+        for db, emails in emails_by_db.items():
+            for email in User.objects.using(db).filter(email__in=emails).values_list('email', flat=True):
+                del users_by_email[email]
+                self.duplicates += 1
+
+        new_users = list(users_by_email.values())
+        if is_sharded():
+            for user, user_id in zip(new_users, allocate_user_ids(len(new_users))):
+                user.id = user_id
+
+        new_users_by_db = {}
+        for user in new_users:
+            new_users_by_db.setdefault(shard_for_email(user.email), []).append(user)
+
+        for db, db_users in new_users_by_db.items():
+            with transaction.atomic(using=db):
+                User.objects.using(db).bulk_create(db_users, batch_size=self.chunk_size)
+                email_confirmations = [
+                    EmailConfirmation(
+                        user=user, code=generate_code(), expires_at=user.confirmed_at,
+                        confirmed_at=user.confirmed_at,
+                    )
+                    for user in db_users if user.confirmed_at is not None
+                ]
+                EmailConfirmation.objects.using(db).bulk_create(email_confirmations, batch_size=self.chunk_size)
+            self.imported += len(db_users)
+            self.confirmed += len(email_confirmations)
+
+    def run(self) -> dict:
+        started_at = time.perf_counter()
+        skipped = self.checkpoint.load()
+        for users in self.chunks(skip=skipped):
+            self.import_chunk(users)
+            self.checkpoint.save(skipped + self.read, self.stats(time.perf_counter() - started_at))
+            logger.debug('Imported %d of %d rows so far', self.imported, self.read)
+
+        return {'resumed_after': skipped, **self.stats(time.perf_counter() - started_at)}
+
+    def stats(self, seconds: float) -> dict:
+        return {
+            'read': self.read,
+            'imported': self.imported,
+            'confirmed': self.confirmed,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'seconds': seconds,
+            'rows_per_second': self.read / seconds if seconds else 0.0,
+        }
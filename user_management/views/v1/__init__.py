@@ -1 +1,4 @@
-from .user import SignupView, LoginView, resend_email_confirmation_view, confirm_email_view
+from .user import SignupView, LoginView, resend_email_confirmation_view, confirm_email_view, confirm_email_link_view
+from .user import bulk_signup_view, export_users_view
+from .user_async import asignup_view, alogin_view, aresend_email_confirmation_view, aconfirm_email_view
+from .user_async import aconfirm_email_link_view
@@ -1,14 +1,25 @@
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.mixins import CreateModelMixin
-from rest_framework.decorators import api_view, permission_classes
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.permissions import IsAdminUser
 from drf_yasg.utils import swagger_auto_schema
 
+from user_management.idempotency import idempotent
 from user_management.models.user import User
-from user_management.serializers.v1.user import SignupSerializer, LoginSerializer
+from user_management.query_budget import QueryBudget, view_query_budget
+from user_management.serializers.v1.user import SignupSerializer, LoginSerializer, get_login_serializer_class
 from user_management.serializers.v1.user import ResendEmailConfirmationSerializer, ConfirmEmailSerializer
-from user_management.services.user import signup, login, resend_email_confirmation, confirm_email
+from user_management.serializers.v1.user import ConfirmEmailLinkSerializer
+from user_management.serializers.v1.user import BulkSignupSerializer, BulkSignupResultSerializer
+from user_management.serializers.v1.user import ExportUsersQuerySerializer
+from user_management.services.user import signup, signup_many, login, resend_email_confirmation, confirm_email
+from user_management.services.user import confirm_email_link
+from user_management.throttling import LoginIPThrottle, LoginEmailThrottle
+from user_management.throttling import ResendEmailConfirmationIPThrottle, ResendEmailConfirmationEmailThrottle
+from user_management.user_export import CONTENT_TYPES, encode, iter_rows
 
 
 class SignupView(GenericViewSet, CreateModelMixin):
@@ -16,6 +27,9 @@ class SignupView(GenericViewSet, CreateModelMixin):
     permission_classes = []
     authentication_classes = []
     serializer_class = SignupSerializer
+    query_budget = QueryBudget(queries=10)
+    # The retries get the first response replayed, see `user_management.idempotency`
+    idempotent = True
 
     def perform_create(self, serializer):
         email = serializer.validated_data['email']
@@ -27,11 +41,43 @@ class SignupView(GenericViewSet, CreateModelMixin):
         serializer.instance = result.value
 
 
+# The budget of `signup_many`, and the authentication
+@view_query_budget(queries=10, per_batch=3)
+@swagger_auto_schema(
+    methods=['POST'],
+    request_body=BulkSignupSerializer,
+    responses={200: BulkSignupResultSerializer(many=True)}
+)
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_signup_view(request):
+    serializer = BulkSignupSerializer(data=request.data)
+    if serializer.is_valid(raise_exception=True):
+        users = serializer.validated_data['users']
+        results = signup_many([(user['email'], user['password']) for user in users])
+
+        response_data = []
+        for user, result in zip(users, results):
+            if result.is_ok():
+                response_data.append({'email': result.value.email, 'created': True})
+            else:
+                response_data.append({'email': user['email'], 'created': False, 'detail': result.err().detail})
+
+        return Response(BulkSignupResultSerializer(response_data, many=True).data, status=status.HTTP_200_OK)
+
+
 class LoginView(GenericViewSet, CreateModelMixin):
     queryset = User.objects
     permission_classes = []
     authentication_classes = []
+    # Rejects the brute-force requests before any database or password hashing work
+    throttle_classes = [LoginIPThrottle, LoginEmailThrottle]
     serializer_class = LoginSerializer
+    query_budget = QueryBudget(queries=6)
+    # Not idempotent, the responses (with the tokens) must not be stored
+
+    def get_serializer_class(self):
+        return get_login_serializer_class()
 
     def perform_create(self, serializer):
         email = serializer.validated_data['email']
@@ -43,6 +89,8 @@ class LoginView(GenericViewSet, CreateModelMixin):
         serializer.instance = result.value
 
 
+@idempotent
+@view_query_budget(queries=7)
 @swagger_auto_schema(
     methods=['POST'],
     request_body=ResendEmailConfirmationSerializer,
@@ -50,6 +98,7 @@ class LoginView(GenericViewSet, CreateModelMixin):
 )
 @api_view(['POST'])
 @permission_classes([])
+@throttle_classes([ResendEmailConfirmationIPThrottle, ResendEmailConfirmationEmailThrottle])
 def resend_email_confirmation_view(request):
     serializer = ResendEmailConfirmationSerializer(data=request.data)
     if serializer.is_valid(raise_exception=True):
@@ -61,6 +110,7 @@ def resend_email_confirmation_view(request):
         return Response(status=status.HTTP_200_OK)
 
 
+@view_query_budget(queries=6)
 @swagger_auto_schema(
     methods=['POST'],
     request_body=ConfirmEmailSerializer,
@@ -78,3 +128,46 @@ def confirm_email_view(request):
             raise result.err()
 
         return Response(status=status.HTTP_200_OK)
+
+
+@view_query_budget(queries=4)
+@swagger_auto_schema(
+    methods=['POST'],
+    request_body=ConfirmEmailLinkSerializer,
+    responses={200: None}
+)
+@api_view(['POST'])
+@permission_classes([])
+def confirm_email_link_view(request):
+    serializer = ConfirmEmailLinkSerializer(data=request.data)
+    if serializer.is_valid(raise_exception=True):
+        result = confirm_email_link(serializer.validated_data['token'])
+        if result.is_err():
+            raise result.err()
+
+        return Response(status=status.HTTP_200_OK)
+
+
+# Only the authentication (at most the session and its user), the rows are queried while the response is streamed
+# (after the middlewares)
+@view_query_budget(queries=2)
+@swagger_auto_schema(
+    methods=['GET'],
+    query_serializer=ExportUsersQuerySerializer,
+    responses={200: 'The users as CSV or gzipped JSON lines, see `user_management.user_export`'}
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_users_view(request):
+    """Streams the users (after the watermark, if given) with the status of their email confirmation."""
+    serializer = ExportUsersQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    output_format = serializer.validated_data['output_format']
+    rows = iter_rows(
+        since_id=serializer.validated_data.get('since_id'),
+        since_date_joined=serializer.validated_data.get('since_date_joined'),
+    )
+
+    response = StreamingHttpResponse(encode(rows, output_format), content_type=CONTENT_TYPES[output_format])
+    response['Content-Disposition'] = f'attachment; filename="users.{output_format}"'
+    return response
@@ -0,0 +1,138 @@
+"""
+Async (native coroutine) versions of the user views, served without a thread hop when running under ASGI.
+
+DRF views are synchronous, so these are plain Django views which reuse the DRF serializers for validation
+and render the errors the same way DRF does.
+"""
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError, Throttled
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+
+from user_management.serializers.v1.user import SignupSerializer, LoginSerializer, get_login_serializer_class
+from user_management.serializers.v1.user import ResendEmailConfirmationSerializer, ConfirmEmailSerializer
+from user_management.serializers.v1.user import ConfirmEmailLinkSerializer
+from user_management.services.user import asignup, alogin, aresend_email_confirmation, aconfirm_email
+from user_management.services.user import aconfirm_email_link
+from user_management.throttling import LoginIPThrottle, LoginEmailThrottle
+from user_management.throttling import ResendEmailConfirmationIPThrottle, ResendEmailConfirmationEmailThrottle
+
+
+def _error_response(exc: APIException) -> JsonResponse:
+    detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = JsonResponse(detail, status=exc.status_code, safe=False)
+    if isinstance(exc, Throttled) and exc.wait is not None:
+        response['Retry-After'] = str(math.ceil(exc.wait))
+    return response
+
+
+@sync_to_async
+def _check_throttles(request, throttle_classes):
+    # The throttle stores might do (synchronous) IO, i.e. a database cache
+    # Reading the body first buffers it (the request's stream is replaced by a copy of it), so the throttles
+    # parse the copy, and `_validated_data` can still read `request.body` afterwards
+    request.body
+    drf_request = Request(request, parsers=[JSONParser()])
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(drf_request, None):
+            raise Throttled(wait=throttle.wait())
+
+
+def _validated_data(request, serializer_class) -> dict:
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError as exc:
+        raise ParseError(detail=f'JSON parse error - {exc}')
+
+    serializer = serializer_class(data=data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+@csrf_exempt
+@require_POST
+async def asignup_view(request):
+    try:
+        data = _validated_data(request, SignupSerializer)
+        result = await asignup(data['email'], data['password'])
+    except APIException as exc:
+        # Validation errors, or the service is not available (i.e. the password hashing queue is full)
+        return _error_response(exc)
+
+    if result.is_err():
+        return _error_response(result.err())
+
+    return JsonResponse(SignupSerializer(result.value).data, status=status.HTTP_201_CREATED)
+
+
+@csrf_exempt
+@require_POST
+async def alogin_view(request):
+    try:
+        await _check_throttles(request, [LoginIPThrottle, LoginEmailThrottle])
+        data = _validated_data(request, LoginSerializer)
+        result = await alogin(data['email'], data['password'])
+    except APIException as exc:
+        # Throttled or validation errors, or the service is not available (i.e. the password hashing queue is full)
+        return _error_response(exc)
+
+    if result.is_err():
+        return _error_response(result.err())
+
+    return JsonResponse(get_login_serializer_class()(result.value).data, status=status.HTTP_201_CREATED)
+
+
+@csrf_exempt
+@require_POST
+async def aresend_email_confirmation_view(request):
+    try:
+        await _check_throttles(request, [ResendEmailConfirmationIPThrottle, ResendEmailConfirmationEmailThrottle])
+        data = _validated_data(request, ResendEmailConfirmationSerializer)
+        result = await aresend_email_confirmation(data['email'])
+    except APIException as exc:
+        # Throttled or validation errors, or the service is not available (i.e. the password hashing queue is full)
+        return _error_response(exc)
+
+    if result.is_err():
+        return _error_response(result.err())
+
+    return HttpResponse(status=status.HTTP_200_OK)
+
+
+@csrf_exempt
+@require_POST
+async def aconfirm_email_view(request):
+    try:
+        data = _validated_data(request, ConfirmEmailSerializer)
+        result = await aconfirm_email(data['email'], data['code'])
+    except APIException as exc:
+        # Validation errors, or the service is not available (i.e. the password hashing queue is full)
+        return _error_response(exc)
+
+    if result.is_err():
+        return _error_response(result.err())
+
+    return HttpResponse(status=status.HTTP_200_OK)
+
+
+@csrf_exempt
+@require_POST
+async def aconfirm_email_link_view(request):
+    try:
+        data = _validated_data(request, ConfirmEmailLinkSerializer)
+        result = await aconfirm_email_link(data['token'])
+    except APIException as exc:
+        return _error_response(exc)
+
+    if result.is_err():
+        return _error_response(result.err())
+
+    return HttpResponse(status=status.HTTP_200_OK)